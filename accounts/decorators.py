@@ -1,8 +1,7 @@
 from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
-from django.core.exceptions import PermissionDenied
-from .models import Company, CompanyMember
+from .middleware import resolve_current_company
 
 
 def company_admin_required(view_func):
@@ -14,27 +13,18 @@ def company_admin_required(view_func):
         if not request.user.is_authenticated:
             return redirect('accounts:login')
         
-        # Obter empresa atual da sessão ou primeira empresa do usuário
-        current_company_id = request.session.get('current_company_id')
-        if current_company_id:
-            try:
-                company = Company.objects.get(id=current_company_id)
-            except Company.DoesNotExist:
-                company = request.user.companies.first()
-        else:
-            company = request.user.companies.first()
+        # Empresa atual e papel já resolvidos pelo CurrentCompanyMiddleware
+        company = resolve_current_company(request)
         
         if not company:
             messages.error(request, 'Você precisa estar associado a uma empresa.')
             return redirect('accounts:company_setup')
         
         # Verificar se o usuário é admin ou owner
-        if not request.user.is_company_admin(company):
+        if request.company_role not in ['owner', 'admin']:
             messages.error(request, 'Você não tem permissão para acessar esta página.')
             return redirect('core:dashboard')
         
-        # Adicionar a empresa ao request para uso na view
-        request.current_company = company
         return view_func(request, *args, **kwargs)
     
     return _wrapped_view
@@ -49,26 +39,17 @@ def can_manage_users_required(view_func):
         if not request.user.is_authenticated:
             return redirect('accounts:login')
         
-        # Obter empresa atual
-        current_company_id = request.session.get('current_company_id')
-        if current_company_id:
-            try:
-                company = Company.objects.get(id=current_company_id)
-            except Company.DoesNotExist:
-                company = request.user.companies.first()
-        else:
-            company = request.user.companies.first()
+        company = resolve_current_company(request)
         
         if not company:
             messages.error(request, 'Você precisa estar associado a uma empresa.')
             return redirect('accounts:company_setup')
         
         # Verificar se o usuário pode gerenciar usuários
-        if not request.user.can_manage_users(company):
+        if request.company_role not in ['owner', 'admin']:
             messages.error(request, 'Você não tem permissão para gerenciar usuários.')
             return redirect('core:dashboard')
         
-        request.current_company = company
         return view_func(request, *args, **kwargs)
     
     return _wrapped_view
@@ -84,28 +65,10 @@ def company_member_required(view_func):
             return redirect('accounts:login')
         
         # Verificar se o usuário tem pelo menos uma empresa
-        if not request.user.companies.exists():
+        if not resolve_current_company(request):
             messages.info(request, 'Você precisa configurar uma empresa primeiro.')
             return redirect('accounts:company_setup')
         
-        # Obter empresa atual
-        current_company_id = request.session.get('current_company_id')
-        if current_company_id:
-            try:
-                company = Company.objects.get(id=current_company_id)
-                # Verificar se o usuário é membro desta empresa
-                if not CompanyMember.objects.filter(
-                    user=request.user, 
-                    company=company, 
-                    is_active=True
-                ).exists():
-                    company = request.user.companies.first()
-            except Company.DoesNotExist:
-                company = request.user.companies.first()
-        else:
-            company = request.user.companies.first()
-        
-        request.current_company = company
         return view_func(request, *args, **kwargs)
     
     return _wrapped_view
@@ -123,29 +86,20 @@ def role_required(required_roles):
             if not request.user.is_authenticated:
                 return redirect('accounts:login')
             
-            # Obter empresa atual
-            current_company_id = request.session.get('current_company_id')
-            if current_company_id:
-                try:
-                    company = Company.objects.get(id=current_company_id)
-                except Company.DoesNotExist:
-                    company = request.user.companies.first()
-            else:
-                company = request.user.companies.first()
+            company = resolve_current_company(request)
             
             if not company:
                 messages.error(request, 'Você precisa estar associado a uma empresa.')
                 return redirect('accounts:company_setup')
             
             # Verificar o papel do usuário
-            user_role = request.user.get_company_role(company)
+            user_role = request.company_role
             if user_role not in required_roles:
                 messages.error(request, f'Você precisa ter um dos seguintes papéis: {", ".join(required_roles)}.')
                 return redirect('core:dashboard')
             
-            request.current_company = company
             request.user_role = user_role
             return view_func(request, *args, **kwargs)
         
         return _wrapped_view
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,60 @@
+from .models import CompanyMember
+
+
+def resolve_current_company(request):
+    """
+    Resolve a empresa atual e o papel do usuário uma única vez por requisição
+    
+    Todas as participações ativas do usuário vêm em uma consulta; a empresa
+    atual é a salva na sessão (se o usuário ainda for membro) ou a primeira
+    por nome. O resultado fica em request.current_company,
+    request.company_role e request.company_memberships.
+    """
+    if getattr(request, '_company_resolved', False):
+        return request.current_company
+    
+    request._company_resolved = True
+    request.current_company = None
+    request.company_role = None
+    request.company_memberships = []
+    
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    
+    memberships = list(
+        CompanyMember.objects.filter(
+            user=user,
+            is_active=True
+        ).select_related('company').order_by('company__name', 'company_id')
+    )
+    
+    session_company_id = request.session.get('current_company_id')
+    current = next(
+        (membership for membership in memberships if membership.company_id == session_company_id),
+        memberships[0] if memberships else None
+    )
+    
+    request.company_memberships = memberships
+    # Aproveita a consulta para memorizar o mapa de papéis do usuário
+    user._company_roles = {membership.company_id: membership.role for membership in memberships}
+    if current:
+        request.current_company = current.company
+        request.company_role = current.role
+        if session_company_id != current.company_id:
+            request.session['current_company_id'] = current.company_id
+    elif session_company_id:
+        del request.session['current_company_id']
+    
+    return request.current_company
+
+
+class CurrentCompanyMiddleware:
+    """Disponibiliza a empresa atual e o papel do usuário no request"""
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        resolve_current_company(request)
+        return self.get_response(request)
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, Group, Permission
+from django.core.cache import cache
 from django.db import models
 
 
@@ -19,13 +21,40 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.first_name} {self.last_name}" if self.first_name else self.username
     
+    @staticmethod
+    def company_roles_cache_key(user_id):
+        return f'user:{user_id}:company_roles'
+    
+    @property
+    def company_roles(self):
+        """
+        Mapa company_id -> papel das participações ativas do usuário
+        
+        Memorizado na instância (uma vez por requisição) e guardado no cache
+        entre requisições; invalidado quando um CompanyMember do usuário é
+        salvo ou removido (ver accounts.signals).
+        """
+        roles = getattr(self, '_company_roles', None)
+        if roles is None:
+            key = self.company_roles_cache_key(self.pk)
+            roles = cache.get(key)
+            if roles is None:
+                roles = dict(
+                    CompanyMember.objects.filter(
+                        user_id=self.pk,
+                        is_active=True
+                    ).values_list('company_id', 'role')
+                )
+                cache.set(key, roles, getattr(settings, 'COMPANY_CACHE_TIMEOUT', 3600))
+            self._company_roles = roles
+        return roles
+    
     def get_company_role(self, company):
         """Retorna o papel do usuário na empresa especificada"""
-        try:
-            member = self.companymember_set.get(company=company, is_active=True)
-            return member.role
-        except CompanyMember.DoesNotExist:
+        if company is None:
             return None
+        company_id = company if isinstance(company, int) else company.pk
+        return self.company_roles.get(company_id)
     
     def is_company_admin(self, company):
         """Verifica se o usuário é admin ou owner da empresa"""
@@ -0,0 +1,19 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import CompanyMember, User
+
+
+@receiver(post_save, sender=CompanyMember)
+@receiver(post_delete, sender=CompanyMember)
+def company_member_changed(sender, instance, **kwargs):
+    """Invalida o mapa de papéis do usuário após o commit"""
+    key = User.company_roles_cache_key(instance.user_id)
+    
+    # Descarta também o mapa memorizado na instância do usuário já carregada
+    user = instance._state.fields_cache.get('user')
+    if user is not None:
+        user.__dict__.pop('_company_roles', None)
+    
+    transaction.on_commit(lambda: cache.delete(key))
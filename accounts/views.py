@@ -6,7 +6,7 @@ from django.contrib import messages
 from django.db import transaction
 from django.urls import reverse_lazy
 from django.views.decorators.http import require_POST
-from django.http import JsonResponse
+from django.http import JsonResponse, Http404
 from django.core.exceptions import PermissionDenied
 from .forms import (
     CustomUserCreationForm, CustomAuthenticationForm, CompanyCreationForm, 
@@ -56,7 +56,7 @@ def register_view(request):
 def company_setup_view(request):
     """View para configuração inicial da empresa"""
     # Verificar se o usuário já tem uma empresa
-    if request.user.companies.exists():
+    if request.current_company:
         return redirect('core:dashboard')
     
     if request.method == 'POST':
@@ -107,24 +107,12 @@ def profile_view(request):
     if password_form is None:
         password_form = ChangePasswordForm(request.user)
     
-    # Obter empresas do usuário
-    user_companies = CompanyMember.objects.filter(user=request.user, is_active=True)
-    current_company_id = request.session.get('current_company_id')
-    current_company = None
-    
-    if current_company_id:
-        try:
-            current_company = Company.objects.get(id=current_company_id)
-        except Company.DoesNotExist:
-            current_company = user_companies.first().company if user_companies else None
-    else:
-        current_company = user_companies.first().company if user_companies else None
-    
+    # Empresas do usuário (já resolvidas pelo CurrentCompanyMiddleware)
     return render(request, 'accounts/profile.html', {
         'profile_form': profile_form,
         'password_form': password_form,
-        'user_companies': user_companies,
-        'current_company': current_company
+        'user_companies': request.company_memberships,
+        'current_company': request.current_company
     })
 
 
@@ -162,9 +150,9 @@ def change_password_view(request):
 def company_settings_view(request):
     """View para configurações da empresa"""
     company = request.current_company
-    user_role = request.user.get_company_role(company)
+    user_role = request.company_role
     can_edit_company = user_role in ['owner', 'admin']
-    can_manage_users = request.user.can_manage_users(company)
+    can_manage_users = user_role in ['owner', 'admin']
     
     company_form = None
     
@@ -261,7 +249,7 @@ def edit_user_view(request, user_id):
     member = get_object_or_404(CompanyMember, user=user_to_edit, company=company)
     
     # Não permitir edição do próprio usuário ou do owner (se não for owner)
-    current_user_role = request.user.get_company_role(company)
+    current_user_role = request.company_role
     if user_to_edit == request.user or (member.role == 'owner' and current_user_role != 'owner'):
         messages.error(request, 'Você não tem permissão para editar este usuário.')
         return redirect('accounts:company_settings')
@@ -302,7 +290,7 @@ def remove_member_view(request, member_id):
     member = get_object_or_404(CompanyMember, id=member_id, company=company)
     
     # Não permitir remoção do próprio usuário ou do owner
-    current_user_role = request.user.get_company_role(company)
+    current_user_role = request.company_role
     if member.user == request.user or (member.role == 'owner' and current_user_role != 'owner'):
         messages.error(request, 'Você não tem permissão para remover este usuário.')
         return redirect('accounts:company_settings')
@@ -343,12 +331,17 @@ def get_user_form(request):
 @login_required
 def switch_company_view(request, company_id):
     """View para trocar de empresa"""
-    company = get_object_or_404(Company, id=company_id)
-    
-    # Verificar se o usuário é membro da empresa
-    if not CompanyMember.objects.filter(user=request.user, company=company, is_active=True).exists():
+    # Verificar se o usuário é membro da empresa (participações já carregadas)
+    membership = next(
+        (m for m in request.company_memberships if m.company_id == company_id),
+        None
+    )
+    if membership is None:
+        if not Company.objects.filter(id=company_id).exists():
+            raise Http404('Empresa não encontrada')
         messages.error(request, 'Você não tem acesso a essa empresa.')
         return redirect('core:dashboard')
+    company = membership.company
     
     # Salvar a empresa atual na sessão
     request.session['current_company_id'] = company.id
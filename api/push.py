@@ -0,0 +1,210 @@
+"""
+Entrega de notificações push em paralelo
+
+As subscrições são enviadas por um pool limitado de threads, com uma
+sessão HTTP (e seu pool de conexões) por host do serviço de push e a
+chave VAPID carregada uma única vez. Os logs são criados e atualizados
+em lote, antes e depois do envio.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.utils import timezone
+from py_vapid import Vapid
+from pywebpush import webpush, WebPushException
+
+from core.models import PushSubscription, PushNotificationLog
+
+logger = logging.getLogger(__name__)
+
+
+class PushDelivery:
+    """
+    Envia uma notificação para muitas subscrições reutilizando conexões
+
+    Exemplo:
+        delivery = PushDelivery(title='Olá', body='Mensagem')
+        results = delivery.send(PushSubscription.objects.filter(is_active=True))
+        delivery.close()
+    """
+
+    def __init__(self, title, body, url='', icon='/static/icons/icon-192x192.png', max_workers=None, timeout=None):
+        self.title = title
+        self.body = body
+        self.url = url
+        self.icon = icon
+        self.max_workers = max_workers or getattr(settings, 'PUSH_MAX_WORKERS', 16)
+        self.timeout = timeout or getattr(settings, 'PUSH_TIMEOUT', 10)
+
+        self.data = json.dumps({
+            'title': title,
+            'body': body,
+            'icon': icon,
+            'badge': '/static/icons/icon-72x72.png',
+            'url': url,
+        })
+        self.admin_email = getattr(settings, 'VAPID_ADMIN_EMAIL', 'admin@cashflow.com')
+
+        private_key = getattr(settings, 'VAPID_PRIVATE_KEY', None)
+        self.vapid_key = Vapid.from_string(private_key=private_key) if private_key else None
+
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def _session_for(self, endpoint):
+        """Sessão HTTP compartilhada pelas subscrições do mesmo host"""
+        host = urlparse(endpoint).netloc
+        with self._sessions_lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=self.max_workers
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+            return session
+
+    def _send_one(self, subscription):
+        """
+        Envia para uma subscrição
+
+        Returns:
+            tupla (status do log, mensagem de erro)
+        """
+        try:
+            # O webpush altera as claims (aud/exp), então cada envio usa uma cópia
+            webpush(
+                subscription_info={
+                    'endpoint': subscription.endpoint,
+                    'keys': {
+                        'p256dh': subscription.p256dh,
+                        'auth': subscription.auth,
+                    }
+                },
+                data=self.data,
+                vapid_private_key=self.vapid_key,
+                vapid_claims={'sub': f'mailto:{self.admin_email}'},
+                timeout=self.timeout,
+                requests_session=self._session_for(subscription.endpoint),
+            )
+            return 'sent', ''
+
+        except WebPushException as e:
+            logger.error(f"Erro ao enviar push para {subscription.id}: {str(e)}")
+
+            # Subscrição expirada ou removida pelo navegador (404/410)
+            if e.response is not None and e.response.status_code in (404, 410):
+                return 'expired', str(e)
+            return 'failed', str(e)
+
+        except Exception as e:
+            logger.error(f"Erro inesperado ao enviar push: {str(e)}")
+            return 'failed', str(e)
+
+    def close(self):
+        """Fecha as sessões HTTP abertas"""
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def send(self, subscriptions):
+        """
+        Envia a notificação para as subscrições informadas
+
+        Args:
+            subscriptions: queryset ou lista de PushSubscription
+
+        Returns:
+            dict com 'sent', 'failed', 'total' e 'user_ids' (usuários que receberam)
+        """
+        subscriptions = list(subscriptions)
+        results = {
+            'sent': 0,
+            'failed': 0,
+            'total': len(subscriptions),
+            'user_ids': set(),
+        }
+        if not subscriptions:
+            return results
+
+        logs = PushNotificationLog.objects.bulk_create([
+            PushNotificationLog(
+                subscription=subscription,
+                title=self.title,
+                body=self.body,
+                icon=self.icon,
+                url=self.url,
+                status='pending'
+            )
+            for subscription in subscriptions
+        ])
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            outcomes = list(executor.map(self._send_one, subscriptions))
+
+        now = timezone.now()
+        used_ids = []
+        expired_ids = []
+        for subscription, log, (status, error_message) in zip(subscriptions, logs, outcomes):
+            log.status = status
+            log.error_message = error_message
+            if status == 'sent':
+                log.sent_at = now
+                used_ids.append(subscription.pk)
+                results['sent'] += 1
+                results['user_ids'].add(subscription.user_id)
+            else:
+                if status == 'expired':
+                    expired_ids.append(subscription.pk)
+                results['failed'] += 1
+
+        PushNotificationLog.objects.bulk_update(logs, ['status', 'error_message', 'sent_at'], batch_size=1000)
+        if used_ids:
+            PushSubscription.objects.filter(pk__in=used_ids).update(last_used=now)
+        if expired_ids:
+            PushSubscription.objects.filter(pk__in=expired_ids).update(is_active=False)
+
+        return results
+
+
+def broadcast(title, body, url='', icon='/static/icons/icon-192x192.png', subscriptions=None, chunk_size=1000):
+    """
+    Envia uma notificação para todas as subscrições ativas, em lotes
+
+    Returns:
+        dict com 'sent', 'failed', 'total' e 'user_ids'
+    """
+    if subscriptions is None:
+        subscriptions = PushSubscription.objects.filter(is_active=True)
+
+    delivery = PushDelivery(title=title, body=body, url=url, icon=icon)
+    totals = {'sent': 0, 'failed': 0, 'total': 0, 'user_ids': set()}
+
+    # Keyset por pk mantém cada lote pequeno sem OFFSET
+    last_pk = 0
+    try:
+        while True:
+            chunk = list(subscriptions.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            results = delivery.send(chunk)
+            totals['sent'] += results['sent']
+            totals['failed'] += results['failed']
+            totals['total'] += results['total']
+            totals['user_ids'] |= results['user_ids']
+    finally:
+        delivery.close()
+
+    return totals
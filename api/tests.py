@@ -0,0 +1,180 @@
+"""
+Testes da entrega de push (api.push) contra um serviço de push local
+
+Um servidor HTTP em 127.0.0.1 faz o papel do serviço de push: o status da
+resposta vem do caminho do endpoint (/push/201/..., /push/410/...).
+"""
+import base64
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from core.models import PushSubscription, PushNotificationLog
+from .push import PushDelivery, broadcast
+
+User = get_user_model()
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+def _vapid_private_key():
+    """Chave VAPID de teste (DER em base64url, formato aceito por Vapid.from_string)"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    return _b64(key.private_bytes(
+        encoding=serialization.Encoding.DER,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    ))
+
+
+def _browser_keys():
+    """Chaves p256dh/auth de uma subscrição de navegador"""
+    key = ec.generate_private_key(ec.SECP256R1())
+    public = key.public_key().public_bytes(
+        encoding=serialization.Encoding.X962,
+        format=serialization.PublicFormat.UncompressedPoint
+    )
+    return _b64(public), _b64(b'0123456789abcdef')
+
+
+class _PushServiceHandler(BaseHTTPRequestHandler):
+    """Responde com o status indicado no caminho (/push/<status>/<id>)"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.received.append(self.path)
+        status = int(self.path.split('/')[2])
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(VAPID_PRIVATE_KEY=_vapid_private_key(), PUSH_MAX_WORKERS=4, PUSH_TIMEOUT=5)
+class PushDeliveryTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _PushServiceHandler)
+        cls.server.received = []
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.received.clear()
+        self.user = User.objects.create_user(
+            username='push', email='push@example.com', password='senha-teste',
+            first_name='Push', last_name='Teste'
+        )
+        self.p256dh, self.auth = _browser_keys()
+
+    def _subscription(self, status, name):
+        return PushSubscription.objects.create(
+            user=self.user,
+            endpoint=f'{self.base_url}/push/{status}/{name}',
+            p256dh=self.p256dh,
+            auth=self.auth
+        )
+
+    def _send(self, subscriptions):
+        delivery = PushDelivery(title='Título', body='Mensagem', url='https://example.com/')
+        try:
+            return delivery.send(subscriptions)
+        finally:
+            delivery.close()
+
+    def test_created_marks_sent(self):
+        subscription = self._subscription(201, 'ok')
+
+        results = self._send([subscription])
+
+        self.assertEqual(results['sent'], 1)
+        self.assertEqual(results['failed'], 0)
+        self.assertEqual(results['user_ids'], {self.user.pk})
+        log = PushNotificationLog.objects.get(subscription=subscription)
+        self.assertEqual(log.status, 'sent')
+        self.assertIsNotNone(log.sent_at)
+        subscription.refresh_from_db()
+        self.assertTrue(subscription.is_active)
+        self.assertIsNotNone(subscription.last_used)
+
+    def test_gone_and_not_found_expire_subscription(self):
+        gone = self._subscription(410, 'gone')
+        not_found = self._subscription(404, 'not-found')
+
+        results = self._send([gone, not_found])
+
+        self.assertEqual(results['sent'], 0)
+        self.assertEqual(results['failed'], 2)
+        for subscription in (gone, not_found):
+            log = PushNotificationLog.objects.get(subscription=subscription)
+            self.assertEqual(log.status, 'expired')
+            self.assertNotEqual(log.error_message, '')
+            subscription.refresh_from_db()
+            self.assertFalse(subscription.is_active)
+
+    def test_server_error_marks_failed(self):
+        subscription = self._subscription(500, 'error')
+
+        results = self._send([subscription])
+
+        self.assertEqual(results['failed'], 1)
+        log = PushNotificationLog.objects.get(subscription=subscription)
+        self.assertEqual(log.status, 'failed')
+        self.assertIsNone(log.sent_at)
+        subscription.refresh_from_db()
+        self.assertTrue(subscription.is_active)
+
+    def test_send_logs_every_subscription_in_bulk(self):
+        subscriptions = [self._subscription(201, f'ok-{index}') for index in range(3)]
+        subscriptions.append(self._subscription(503, 'unavailable'))
+
+        # Logs inseridos e atualizados em lote, mais o last_used das enviadas
+        with self.assertNumQueries(3):
+            results = self._send(subscriptions)
+
+        self.assertEqual((results['sent'], results['failed'], results['total']), (3, 1, 4))
+        self.assertEqual(len(self.server.received), 4)
+        statuses = dict(PushNotificationLog.objects.values_list('subscription_id', 'status'))
+        self.assertEqual(statuses, {
+            **{subscription.pk: 'sent' for subscription in subscriptions[:3]},
+            subscriptions[3].pk: 'failed',
+        })
+        self.assertFalse(PushNotificationLog.objects.filter(status='pending').exists())
+        self.assertEqual(set(PushNotificationLog.objects.values_list('title', flat=True)), {'Título'})
+
+    def test_broadcast_sends_active_subscriptions_in_chunks(self):
+        active = [self._subscription(201, f'ok-{index}') for index in range(5)]
+        expired = self._subscription(410, 'gone')
+        inactive = self._subscription(201, 'inactive')
+        PushSubscription.objects.filter(pk=inactive.pk).update(is_active=False)
+
+        results = broadcast('Título', 'Mensagem', chunk_size=2)
+
+        self.assertEqual(results['total'], 6)
+        self.assertEqual(results['sent'], 5)
+        self.assertEqual(results['failed'], 1)
+        self.assertEqual(results['user_ids'], {self.user.pk})
+        self.assertNotIn('/push/201/inactive', self.server.received)
+        self.assertEqual(
+            PushNotificationLog.objects.filter(subscription__in=active, status='sent').count(), 5
+        )
+        expired.refresh_from_db()
+        self.assertFalse(expired.is_active)
+        self.assertFalse(PushNotificationLog.objects.filter(subscription=inactive).exists())
@@ -2,8 +2,8 @@ from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.decorators import login_required
-from core.models import PushSubscription, PushNotificationLog
-from pywebpush import webpush, WebPushException
+from core.models import PushSubscription
+from .push import PushDelivery
 from django.conf import settings
 import json
 import logging
@@ -108,85 +108,17 @@ def send_push_notification(user, title, body, url='', icon='/static/icons/icon-1
     """
     subscriptions = PushSubscription.objects.filter(user=user, is_active=True)
     
-    results = {
-        'sent': 0,
-        'failed': 0,
-        'total': subscriptions.count()
-    }
-    
-    # Dados da notificação
-    notification_data = {
-        'title': title,
-        'body': body,
-        'icon': icon,
-        'badge': '/static/icons/icon-72x72.png',
-        'url': url,
-    }
+    delivery = PushDelivery(title=title, body=body, url=url, icon=icon)
+    try:
+        results = delivery.send(subscriptions)
+    finally:
+        delivery.close()
     
-    # VAPID keys - você precisará gerar essas chaves
-    vapid_claims = {
-        "sub": f"mailto:{getattr(settings, 'VAPID_ADMIN_EMAIL', 'admin@cashflow.com')}"
+    return {
+        'sent': results['sent'],
+        'failed': results['failed'],
+        'total': results['total'],
     }
-    
-    for subscription in subscriptions:
-        try:
-            # Log da tentativa
-            log = PushNotificationLog.objects.create(
-                subscription=subscription,
-                title=title,
-                body=body,
-                icon=icon,
-                url=url,
-                status='pending'
-            )
-            
-            # Preparar dados para webpush
-            subscription_info = {
-                "endpoint": subscription.endpoint,
-                "keys": {
-                    "p256dh": subscription.p256dh,
-                    "auth": subscription.auth
-                }
-            }
-            
-            # Enviar notificação
-            webpush(
-                subscription_info=subscription_info,
-                data=json.dumps(notification_data),
-                vapid_private_key=getattr(settings, 'VAPID_PRIVATE_KEY', None),
-                vapid_claims=vapid_claims
-            )
-            
-            # Atualizar log como enviado
-            log.status = 'sent'
-            log.save()
-            
-            subscription.mark_used()
-            results['sent'] += 1
-            
-        except WebPushException as e:
-            logger.error(f"Erro ao enviar push para {subscription.id}: {str(e)}")
-            
-            # Se a subscrição expirou (410 Gone), desativar
-            if e.response and e.response.status_code == 410:
-                subscription.is_active = False
-                subscription.save()
-                log.status = 'expired'
-            else:
-                log.status = 'failed'
-            
-            log.error_message = str(e)
-            log.save()
-            results['failed'] += 1
-            
-        except Exception as e:
-            logger.error(f"Erro inesperado ao enviar push: {str(e)}")
-            log.status = 'failed'
-            log.error_message = str(e)
-            log.save()
-            results['failed'] += 1
-    
-    return results
 
 
 @login_required
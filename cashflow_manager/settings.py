@@ -84,6 +84,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.middleware.CurrentCompanyMiddleware',  # Empresa atual e papel do usuário
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -133,6 +134,39 @@ else:
     }
 
 
+# Cache
+# Os payloads do dashboard/insights são invalidados por versão de dados da
+# empresa (core.caching). LocMem serve para desenvolvimento e testes; com
+# vários workers use um backend compartilhado, como arquivo ou banco:
+#   CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+#   CACHE_BACKEND=django.core.cache.backends.db.DatabaseCache (requer createcachetable)
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': config(
+            'CACHE_LOCATION',
+            default='cashflow-cache' if DEBUG else str(BASE_DIR / '.cache')
+        ),
+    }
+}
+
+# Tempo máximo (segundos) de um payload em cache; a invalidação normal é por versão
+COMPANY_CACHE_TIMEOUT = config('COMPANY_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Horizonte (em dias) das ocorrências geradas para transações recorrentes
+# (transactions.recurrence; renovado pelo comando materialize_recurrences)
+RECURRENCE_HORIZON_DAYS = config('RECURRENCE_HORIZON_DAYS', default=90, cast=int)
+
+# Geração de relatórios em segundo plano (comando process_reports): processos
+# do pool e horas até os arquivos gerados serem removidos
+REPORT_WORKERS = config('REPORT_WORKERS', default=2, cast=int)
+REPORT_TTL_HOURS = config('REPORT_TTL_HOURS', default=72, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -251,3 +285,7 @@ AUTHENTICATION_BACKENDS = [
 VAPID_PRIVATE_KEY = config('VAPID_PRIVATE_KEY', default=None)
 VAPID_PUBLIC_KEY = config('VAPID_PUBLIC_KEY', default=None)
 VAPID_ADMIN_EMAIL = config('VAPID_ADMIN_EMAIL', default='admin@cashflow.com')
+
+# Envio em paralelo (api.push): threads simultâneas e timeout por requisição
+PUSH_MAX_WORKERS = config('PUSH_MAX_WORKERS', default=16, cast=int)
+PUSH_TIMEOUT = config('PUSH_TIMEOUT', default=10, cast=int)
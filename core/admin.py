@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PushSubscription, PushNotificationLog, ScheduledNotification, WebAuthnCredential
+from .models import PushSubscription, PushNotificationLog, ScheduledNotification, WebAuthnCredential, AlertEvaluation, CompanyDataVersion
 
 
 @admin.register(PushSubscription)
@@ -124,3 +124,24 @@ class WebAuthnCredentialAdmin(admin.ModelAdmin):
         # Credenciais são criadas via API/WebAuthn
         return False
 
+
+@admin.register(AlertEvaluation)
+class AlertEvaluationAdmin(admin.ModelAdmin):
+    list_display = ['company', 'last_evaluated_at']
+    search_fields = ['company__name']
+    readonly_fields = ['company', 'last_evaluated_at']
+    
+    def has_add_permission(self, request):
+        # Registros são mantidos pelo agendador de alertas
+        return False
+
+
+@admin.register(CompanyDataVersion)
+class CompanyDataVersionAdmin(admin.ModelAdmin):
+    list_display = ['company', 'version', 'changed_at']
+    search_fields = ['company__name']
+    readonly_fields = ['company', 'version', 'changed_at']
+    
+    def has_add_permission(self, request):
+        # Versões são trocadas pelas escritas (core.caching.bump_data_version)
+        return False
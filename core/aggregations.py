@@ -0,0 +1,242 @@
+"""
+Agregações de receitas e despesas em séries temporais
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Sum, Count, DecimalField, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, TruncWeek, TruncMonth
+
+from transactions.models import DailyRollup, TransactionTag
+
+
+GRAINS = ('day', 'week', 'month')
+
+
+def _truncate(value, grain):
+    """Retorna o início do período (dia, semana ou mês) que contém a data"""
+    if grain == 'week':
+        return value - timedelta(days=value.weekday())
+    if grain == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def _next_period(value, grain):
+    """Retorna o início do período seguinte"""
+    if grain == 'week':
+        return value + timedelta(days=7)
+    if grain == 'month':
+        return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return value + timedelta(days=1)
+
+
+def period_starts(start_date, end_date, grain='day'):
+    """Lista o início de cada período entre as datas, inclusive"""
+    periods = []
+    current = _truncate(start_date, grain)
+    while current <= end_date:
+        periods.append(current)
+        current = _next_period(current, grain)
+    return periods
+
+
+def income_expense_series(company, start_date, end_date, grain='day', status='completed'):
+    """
+    Gera a série de receitas e despesas por dia, semana ou mês.
+
+    Os totais vêm de uma única consulta agrupada sobre os consolidados
+    diários; os períodos sem movimentação são preenchidos com zero em Python.
+
+    Args:
+        company: Empresa das transações
+        start_date: Data inicial (inclusive)
+        end_date: Data final (inclusive)
+        grain: 'day', 'week' ou 'month'
+        status: Status das transações consideradas (None para todos)
+
+    Returns:
+        lista de dicts com 'period', 'income' e 'expense' (Decimal)
+    """
+    if grain not in GRAINS:
+        raise ValueError(f'Granularidade inválida: {grain}')
+
+    rollups = DailyRollup.objects.filter(
+        company=company,
+        transaction_type__in=['income', 'expense'],
+        date__range=[start_date, end_date]
+    )
+    if status:
+        rollups = rollups.filter(status=status)
+
+    # Diário agrupa direto pela data; semana/mês truncam no banco
+    period_field = 'period'
+    if grain == 'week':
+        rollups = rollups.annotate(period=TruncWeek('date'))
+    elif grain == 'month':
+        rollups = rollups.annotate(period=TruncMonth('date'))
+    else:
+        period_field = 'date'
+
+    rows = rollups.values(period_field).annotate(
+        income=Sum('total_amount', filter=Q(transaction_type='income')),
+        expense=Sum('total_amount', filter=Q(transaction_type='expense')),
+    ).order_by(period_field)
+
+    totals = {
+        _truncate(row[period_field], grain): (row['income'] or Decimal('0'), row['expense'] or Decimal('0'))
+        for row in rows
+    }
+
+    series = []
+    for period in period_starts(start_date, end_date, grain):
+        income, expense = totals.get(period, (Decimal('0'), Decimal('0')))
+        series.append({
+            'period': period,
+            'income': income,
+            'expense': expense,
+        })
+
+    return series
+
+
+def income_expense_totals(company, start_date, end_date, status='completed'):
+    """
+    Soma receitas e despesas do período a partir dos consolidados diários
+
+    Returns:
+        tupla (receitas, despesas) em Decimal
+    """
+    rollups = DailyRollup.objects.filter(
+        company=company,
+        date__range=[start_date, end_date]
+    )
+    if status:
+        rollups = rollups.filter(status=status)
+
+    totals = rollups.aggregate(
+        income=Sum('total_amount', filter=Q(transaction_type='income')),
+        expense=Sum('total_amount', filter=Q(transaction_type='expense')),
+    )
+    return totals['income'] or Decimal('0'), totals['expense'] or Decimal('0')
+
+
+def category_totals(company, start_date, end_date, status='completed', transaction_types=('income', 'expense'),
+                    rollup_parents=False):
+    """
+    Totais por categoria e tipo no período em uma única consulta agrupada
+
+    Args:
+        company: Empresa das transações
+        start_date: Data inicial (inclusive)
+        end_date: Data final (inclusive)
+        status: Status das transações consideradas (None para todos)
+        transaction_types: Tipos considerados
+        rollup_parents: Somar as subcategorias na categoria pai (Category.parent)
+
+    Returns:
+        lista de dicts com 'category_id', 'name', 'color', 'transaction_type',
+        'total' e 'count', do maior total para o menor; transações sem
+        categoria vêm com category_id None e nome 'Sem categoria'
+    """
+    rollups = DailyRollup.objects.filter(
+        company=company,
+        transaction_type__in=transaction_types,
+        date__range=[start_date, end_date]
+    )
+    if status:
+        rollups = rollups.filter(status=status)
+
+    if rollup_parents:
+        rollups = rollups.annotate(
+            group_id=Coalesce('category__parent_id', 'category_id'),
+            group_name=Coalesce('category__parent__name', 'category__name'),
+            group_color=Coalesce('category__parent__color', 'category__color'),
+        )
+    else:
+        rollups = rollups.annotate(
+            group_id=F('category_id'),
+            group_name=F('category__name'),
+            group_color=F('category__color'),
+        )
+
+    rows = rollups.values('group_id', 'group_name', 'group_color', 'transaction_type').annotate(
+        total=Sum('total_amount'),
+        count=Sum('transaction_count'),
+    ).order_by('-total', 'group_name')
+
+    return [
+        {
+            'category_id': row['group_id'],
+            'name': row['group_name'] or 'Sem categoria',
+            'color': row['group_color'] or '#6c757d',
+            'transaction_type': row['transaction_type'],
+            'total': row['total'] or Decimal('0'),
+            'count': row['count'] or 0,
+        }
+        for row in rows
+    ]
+
+
+def category_tree_totals(company, start_date, end_date, transaction_type='expense', status='completed'):
+    """
+    Totais de cada categoria e da sua subárvore em uma única consulta
+
+    A subárvore vem do caminho materializado (Category.path): cada categoria
+    soma os consolidados cujas categorias têm caminho com o mesmo prefixo,
+    sem percorrer a árvore nível a nível.
+
+    Returns:
+        categorias na ordem da árvore, anotadas com 'total' (só a categoria)
+        e 'subtree_total' (categoria e descendentes)
+    """
+    from transactions.models import Category
+
+    rollups = DailyRollup.objects.filter(
+        company=company,
+        transaction_type=transaction_type,
+        date__range=[start_date, end_date]
+    )
+    if status:
+        rollups = rollups.filter(status=status)
+
+    def total_of(queryset):
+        subquery = queryset.order_by().values('company_id').annotate(total=Sum('total_amount')).values('total')
+        return Coalesce(Subquery(subquery), Value(Decimal('0')), output_field=DecimalField(max_digits=17, decimal_places=2))
+
+    return Category.objects.filter(company=company).annotate(
+        total=total_of(rollups.filter(category_id=OuterRef('pk'))),
+        subtree_total=total_of(rollups.filter(category__path__startswith=OuterRef('path'))),
+    ).order_by('path')
+
+
+def tag_totals(company, start_date, end_date, transaction_type='expense', status='completed'):
+    """
+    Totais por tag no período em uma única consulta agrupada
+
+    Uma transação com várias tags conta em cada uma delas.
+
+    Returns:
+        lista de dicts com 'tag_id', 'name', 'total' e 'count', do maior total para o menor
+    """
+    links = TransactionTag.objects.filter(
+        tag__company=company,
+        transaction__transaction_type=transaction_type,
+        transaction__transaction_date__range=[start_date, end_date]
+    )
+    if status:
+        links = links.filter(transaction__status=status)
+
+    rows = links.values('tag_id', 'tag__name').annotate(
+        total=Sum('transaction__amount'),
+        count=Count('transaction_id'),
+    ).order_by('-total', 'tag__name')
+
+    return [
+        {
+            'tag_id': row['tag_id'],
+            'name': row['tag__name'],
+            'total': row['total'] or Decimal('0'),
+            'count': row['count'],
+        }
+        for row in rows
+    ]
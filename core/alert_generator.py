@@ -16,7 +16,7 @@ def generate_dynamic_alerts(company, user=None):
     Gera alertas dinâmicos baseados no comportamento atual dos dados
     """
     if not user:
-        user = company.users.first()
+        user = company.owner
     
     # Limpar alertas antigos (mais de 30 dias)
     old_alerts = Alert.objects.filter(
@@ -27,6 +27,9 @@ def generate_dynamic_alerts(company, user=None):
     
     alerts_created = []
     
+    # Um único analisador (e uma única leitura em lote) para todas as verificações
+    analyzer = FinancialAnalyzer(company)
+    
     # 1. Verificar contas com saldo baixo
     alerts_created.extend(_check_low_balance_alerts(company, user))
     
@@ -37,10 +40,10 @@ def generate_dynamic_alerts(company, user=None):
     alerts_created.extend(_check_goal_deadlines(company, user))
     
     # 4. Verificar padrões de gastos anômalos
-    alerts_created.extend(_check_spending_anomalies(company, user))
+    alerts_created.extend(_check_spending_anomalies(company, user, analyzer))
     
     # 5. Verificar fluxo de caixa
-    alerts_created.extend(_check_cash_flow_risks(company, user))
+    alerts_created.extend(_check_cash_flow_risks(company, user, analyzer))
     
     # 6. Enviar notificações push para novos alertas críticos
     _send_push_for_critical_alerts(alerts_created)
@@ -217,12 +220,11 @@ def _check_goal_deadlines(company, user):
     return alerts
 
 
-def _check_spending_anomalies(company, user):
+def _check_spending_anomalies(company, user, analyzer):
     """Verifica anomalias nos gastos usando FinancialAnalyzer"""
     alerts = []
     
     try:
-        analyzer = FinancialAnalyzer(company)
         spending_spikes = analyzer.detect_spending_spikes()
         
         for spike in spending_spikes:
@@ -255,12 +257,11 @@ def _check_spending_anomalies(company, user):
     return alerts
 
 
-def _check_cash_flow_risks(company, user):
+def _check_cash_flow_risks(company, user, analyzer):
     """Verifica riscos no fluxo de caixa"""
     alerts = []
     
     try:
-        analyzer = FinancialAnalyzer(company)
         balance_risks = analyzer.check_low_balance_risk()
         
         for risk in balance_risks:
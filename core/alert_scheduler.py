@@ -0,0 +1,50 @@
+"""
+Agendamento da avaliação de alertas dinâmicos fora do ciclo de requisição
+
+As escritas apenas trocam a versão dos dados da empresa
+(core.models.CompanyDataVersion); o comando evaluate_alerts processa em
+lotes as empresas alteradas desde a última avaliação e as que não são
+avaliadas há mais de max_age.
+"""
+from datetime import timedelta
+from django.db.models import Q, F
+from django.utils import timezone
+
+from accounts.models import Company
+from .models import AlertEvaluation
+from .alert_generator import generate_dynamic_alerts, auto_resolve_outdated_alerts
+
+
+def due_companies(max_age=timedelta(hours=1)):
+    """
+    Empresas cujos alertas precisam ser reavaliados
+
+    Inclui as nunca avaliadas, as alteradas desde a última avaliação e as
+    avaliadas há mais de max_age (alertas como vencimentos dependem da data).
+    """
+    stale_before = timezone.now() - max_age
+    return Company.objects.filter(is_active=True).filter(
+        Q(alert_evaluation__isnull=True) |
+        Q(alert_evaluation__last_evaluated_at__isnull=True) |
+        Q(data_version__changed_at__gt=F('alert_evaluation__last_evaluated_at')) |
+        Q(alert_evaluation__last_evaluated_at__lt=stale_before)
+    ).order_by(F('alert_evaluation__last_evaluated_at').asc(nulls_first=True), 'pk')
+
+
+def evaluate_company(company):
+    """
+    Resolve alertas desatualizados e gera os novos para a empresa
+
+    Returns:
+        lista de alertas criados
+    """
+    # Alterações feitas durante a avaliação continuam pendentes
+    started_at = timezone.now()
+    try:
+        auto_resolve_outdated_alerts(company)
+        return generate_dynamic_alerts(company)
+    finally:
+        AlertEvaluation.objects.update_or_create(
+            company=company,
+            defaults={'last_evaluated_at': started_at}
+        )
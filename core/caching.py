@@ -0,0 +1,58 @@
+"""
+Cache versionado por empresa para os dados do dashboard e dos insights
+
+As chaves dos payloads incluem a versão dos dados da empresa
+(core.models.CompanyDataVersion), então trocá-la (bump_data_version)
+invalida de uma vez tudo o que foi calculado para a empresa, sem depender
+de expiração. A mesma versão marca as previsões gravadas e a fila de
+avaliação de alertas como desatualizadas.
+"""
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import cache
+
+from .commit_queue import CommitQueue
+from .models import CompanyDataVersion
+
+
+def data_version(company_id):
+    """Retorna a versão atual dos dados da empresa"""
+    return CompanyDataVersion.current([company_id])[company_id]
+
+
+def bump_data_version(company_id):
+    """
+    Troca a versão dos dados da empresa após o commit da escrita
+
+    Trocar a versão só depois do commit evita que uma leitura concorrente
+    grave dados antigos sob a versão nova. Várias escritas no mesmo commit
+    geram uma única troca por empresa; escritas desfeitas não trocam nada.
+    """
+    if company_id:
+        _queue.add(company_id)
+
+
+_queue = CommitQueue(CompanyDataVersion.bump)
+
+
+def payload_key(company_id, name, params=None):
+    """Monta a chave do payload a partir da empresa, versão e parâmetros"""
+    digest = hashlib.md5(
+        json.dumps(params or {}, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f'company:{company_id}:v{data_version(company_id)}:{name}:{digest}'
+
+
+def cached_payload(company, name, params, builder):
+    """
+    Retorna o payload do cache ou o calcula com builder()
+
+    Args:
+        company: Empresa dona dos dados
+        name: Nome do payload (ex.: 'dashboard')
+        params: dict com período e filtros que definem o payload
+        builder: função sem argumentos que calcula o payload
+    """
+    timeout = getattr(settings, 'COMPANY_CACHE_TIMEOUT', 3600)
+    return cache.get_or_set(payload_key(company.pk, name, params), builder, timeout=timeout)
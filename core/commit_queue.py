@@ -0,0 +1,65 @@
+"""
+Fila por thread de itens processados uma única vez após o commit
+
+As escritas apenas acumulam itens (empresas, metas, orçamentos...); o
+primeiro item de um lote registra um único callback transaction.on_commit,
+que processa o lote inteiro quando a transação do banco é confirmada. Fora
+de um bloco atômico o callback roda na hora.
+
+Um rollback descarta o callback registrado, mas não o estado da thread. O
+lote guarda só uma referência fraca ao seu callback, que pertence à fila de
+on_commit da conexão: quando o rollback o descarta, a referência morre e os
+itens das escritas desfeitas são abandonados em vez de irem para o próximo
+commit.
+"""
+import threading
+import weakref
+from django.db import transaction
+
+
+class CommitQueue:
+    """
+    Itens acumulados na thread atual e processados uma vez por commit
+
+    Exemplo:
+        queue = CommitQueue(lambda company_ids: ...)
+        queue.add(company_id)
+    """
+
+    def __init__(self, process):
+        """
+        Args:
+            process: função chamada no commit com o set de itens do lote
+        """
+        self.process = process
+        self._local = threading.local()
+
+    def _pending(self):
+        """Itens do lote aberto na thread atual, ou None"""
+        batch = getattr(self._local, 'batch', None)
+        if batch is None:
+            return None
+        items, hook = batch
+        if hook() is None:
+            # Callback descartado por um rollback
+            self._local.batch = None
+            return None
+        return items
+
+    def add(self, item):
+        """Acumula o item no lote atual, abrindo um lote se necessário"""
+        items = self._pending()
+        if items is not None:
+            items.add(item)
+            return
+
+        items = {item}
+
+        def hook():
+            batch = getattr(self._local, 'batch', None)
+            if batch is not None and batch[0] is items:
+                self._local.batch = None
+            self.process(items)
+
+        self._local.batch = (items, weakref.ref(hook))
+        transaction.on_commit(hook)
@@ -1,36 +1,96 @@
 from decimal import Decimal
-from datetime import datetime, timedelta
+from datetime import timedelta
 from django.utils import timezone
-from django.db.models import Sum, Avg, Count
-from transactions.models import Transaction, Account, Category
-from accounts.models import Company
+from transactions.models import Transaction, Account
+from reports.models import Forecast
 
 
 class FinancialAnalyzer:
-    """Analisador financeiro inteligente para alertas e insights"""
+    """
+    Analisador financeiro inteligente para alertas e insights
+    
+    As transações concluídas da janela de análise são lidas uma única vez
+    em colunas (listas paralelas); cada insight é calculado em memória
+    com uma varredura linear, sem consultas por categoria ou por conta.
+    """
+    
+    # Janela coberta pela leitura em lote (maior período usado pelos insights)
+    WINDOW_DAYS = 90
+    
+    COLUMNS = ('id', 'transaction_date', 'transaction_type', 'category_id',
+               'category__name', 'description', 'amount')
     
     def __init__(self, company):
         self.company = company
         self.today = timezone.now().date()
+        self._columns = None
+        self._accounts = None
+        self._projections = {}
+    
+    @property
+    def columns(self):
+        """Transações concluídas da janela em colunas, carregadas sob demanda"""
+        if self._columns is None:
+            rows = Transaction.objects.filter(
+                company=self.company,
+                status='completed',
+                transaction_date__gte=self.today - timedelta(days=self.WINDOW_DAYS)
+            ).order_by().values_list(*self.COLUMNS)
+            
+            columns = {name: [] for name in self.COLUMNS}
+            for row in rows:
+                for name, value in zip(self.COLUMNS, row):
+                    columns[name].append(value)
+            self._columns = columns
+        return self._columns
+    
+    @property
+    def accounts(self):
+        """Contas ativas da empresa, carregadas uma vez"""
+        if self._accounts is None:
+            self._accounts = list(Account.objects.filter(company=self.company, is_active=True))
+        return self._accounts
+    
+    def projection(self, days=30):
+        """
+        Projeção diária de saldos (core.projection)
+        
+        Lida da previsão gravada em reports.Forecast enquanto os dados da
+        empresa não mudam; caso contrário calculada sem gravar, com o
+        recálculo da previsão deixado para o worker.
+        """
+        if days not in self._projections:
+            self._projections[days] = Forecast.cash_flow(self.company, days=days)
+        return self._projections[days]
+    
+    def _sum(self, transaction_type=None, start=None, end=None):
+        """
+        Soma e quantidade das transações do tipo em [start, end)
+        
+        Returns:
+            tupla (total, quantidade)
+        """
+        columns = self.columns
+        total = Decimal('0')
+        count = 0
+        for date, kind, amount in zip(columns['transaction_date'], columns['transaction_type'], columns['amount']):
+            if transaction_type and kind != transaction_type:
+                continue
+            if start and date < start:
+                continue
+            if end and date >= end:
+                continue
+            total += amount
+            count += 1
+        return total, count
     
     def get_cash_flow_health_score(self):
         """Calcula score de saúde do fluxo de caixa (0-100)"""
         # Últimos 30 dias
         start_date = self.today - timedelta(days=30)
         
-        income = Transaction.objects.filter(
-            company=self.company,
-            transaction_type='income',
-            transaction_date__gte=start_date,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        expense = Transaction.objects.filter(
-            company=self.company,
-            transaction_type='expense',
-            transaction_date__gte=start_date,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        income, _ = self._sum('income', start=start_date)
+        expense, _ = self._sum('expense', start=start_date)
         
         if expense == 0:
             return 100 if income > 0 else 50
@@ -59,30 +119,30 @@ class FinancialAnalyzer:
         ninety_days_ago = self.today - timedelta(days=90)
         seven_days_ago = self.today - timedelta(days=7)
         
-        avg_expense = Transaction.objects.filter(
-            company=self.company,
-            transaction_type='expense',
-            transaction_date__gte=ninety_days_ago,
-            transaction_date__lt=seven_days_ago,
-            status='completed'
-        ).aggregate(avg=Avg('amount'))['avg'] or Decimal('0')
+        total, count = self._sum('expense', start=ninety_days_ago, end=seven_days_ago)
+        avg_expense = total / count if count else Decimal('0')
+        threshold = avg_expense * Decimal('2')  # 200% acima da média
         
         # Gastos da última semana
-        recent_expenses = Transaction.objects.filter(
-            company=self.company,
-            transaction_type='expense',
-            transaction_date__gte=seven_days_ago,
-            status='completed'
-        )
-        
-        for expense in recent_expenses:
-            if expense.amount > avg_expense * Decimal('2'):  # 200% acima da média
+        columns = self.columns
+        for index, date in enumerate(columns['transaction_date']):
+            if columns['transaction_type'][index] != 'expense' or date < seven_days_ago:
+                continue
+            
+            amount = columns['amount'][index]
+            if amount > threshold:
+                category_name = columns['category__name'][index] or 'categoria não definida'
                 alerts.append({
                     'type': 'spending_spike',
                     'severity': 'high',
                     'title': 'Gasto Anômalo Detectado',
-                    'message': f'Despesa de R$ {expense.amount} em {expense.category.name if expense.category else "categoria não definida"} está 200% acima da média histórica',
-                    'transaction': expense,
+                    'message': f'Despesa de R$ {amount} em {category_name} está 200% acima da média histórica',
+                    'transaction': {
+                        'id': columns['id'][index],
+                        'description': columns['description'][index],
+                        'amount': amount,
+                        'date': date,
+                    },
                     'recommendation': 'Verifique se este gasto está dentro do planejado'
                 })
         
@@ -92,20 +152,13 @@ class FinancialAnalyzer:
         """Verifica risco de saldo baixo"""
         alerts = []
         
-        # Projeção baseada na média de gastos dos últimos 30 dias
-        thirty_days_ago = self.today - timedelta(days=30)
-        
-        avg_daily_expense = Transaction.objects.filter(
-            company=self.company,
-            transaction_type='expense',
-            transaction_date__gte=thirty_days_ago,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
-        avg_daily_expense = avg_daily_expense / 30
-        
-        for account in Account.objects.filter(company=self.company, is_active=True):
-            days_remaining = float(account.current_balance / avg_daily_expense) if avg_daily_expense > 0 else 999
+        # Dia em que cada conta fica negativa na projeção diária de 30 dias
+        accounts = {account.pk: account for account in self.accounts}
+        for series in self.projection()['accounts']:
+            account = accounts.get(series['id'])
+            if account is None or series['negative_on'] is None:
+                continue
+            days_remaining = (series['negative_on'] - self.today).days
             
             if days_remaining < 7:
                 alerts.append({
@@ -135,25 +188,24 @@ class FinancialAnalyzer:
         # Comparar últimos 30 dias com 30 dias anteriores
         current_period_start = self.today - timedelta(days=30)
         previous_period_start = self.today - timedelta(days=60)
-        previous_period_end = self.today - timedelta(days=30)
         
-        categories = Category.objects.filter(company=self.company)
+        # Uma varredura acumula os dois períodos de todas as categorias
+        current_totals = {}
+        previous_totals = {}
+        names = {}
+        columns = self.columns
+        for date, category_id, name, amount in zip(columns['transaction_date'], columns['category_id'],
+                                                   columns['category__name'], columns['amount']):
+            if category_id is None or date < previous_period_start:
+                continue
+            names[category_id] = name
+            totals = current_totals if date >= current_period_start else previous_totals
+            totals[category_id] = totals.get(category_id, Decimal('0')) + amount
         
-        for category in categories:
-            current_total = Transaction.objects.filter(
-                company=self.company,
-                category=category,
-                transaction_date__gte=current_period_start,
-                status='completed'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
-            previous_total = Transaction.objects.filter(
-                company=self.company,
-                category=category,
-                transaction_date__gte=previous_period_start,
-                transaction_date__lt=previous_period_end,
-                status='completed'
-            ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+        for category_id in sorted(previous_totals, key=lambda pk: names[pk]):
+            previous_total = previous_totals[category_id]
+            current_total = current_totals.get(category_id, Decimal('0'))
+            name = names[category_id]
             
             if previous_total > 0:
                 change_percent = ((current_total - previous_total) / previous_total) * 100
@@ -162,55 +214,24 @@ class FinancialAnalyzer:
                     trend = 'aumento' if change_percent > 0 else 'redução'
                     insights.append({
                         'type': 'category_trend',
-                        'category': category.name,
+                        'category': name,
                         'change_percent': float(change_percent),
                         'trend': trend,
                         'current_total': current_total,
                         'previous_total': previous_total,
-                        'message': f'{trend.capitalize()} de {abs(change_percent):.1f}% em {category.name}'
+                        'message': f'{trend.capitalize()} de {abs(change_percent):.1f}% em {name}'
                     })
         
         return insights
     
     def generate_financial_forecast(self, days=30):
-        """Gera previsão financeira baseada em tendências"""
-        # Média de receitas e despesas dos últimos 60 dias
-        sixty_days_ago = self.today - timedelta(days=60)
-        
-        avg_daily_income = Transaction.objects.filter(
-            company=self.company,
-            transaction_type='income',
-            transaction_date__gte=sixty_days_ago,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        avg_daily_income = avg_daily_income / 60
-        
-        avg_daily_expense = Transaction.objects.filter(
-            company=self.company,
-            transaction_type='expense',
-            transaction_date__gte=sixty_days_ago,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        avg_daily_expense = avg_daily_expense / 60
-        
-        # Saldo atual total
-        current_balance = sum(account.current_balance for account in Account.objects.filter(company=self.company, is_active=True))
-        
-        # Projeção
-        projected_income = avg_daily_income * days
-        projected_expense = avg_daily_expense * days
-        projected_balance = current_balance + projected_income - projected_expense
-        
-        return {
-            'current_balance': current_balance,
-            'projected_income': projected_income,
-            'projected_expense': projected_expense,
-            'projected_balance': projected_balance,
-            'net_flow': projected_income - projected_expense,
-            'avg_daily_income': avg_daily_income,
-            'avg_daily_expense': avg_daily_expense,
-            'forecast_days': days
-        }
+        """
+        Gera previsão financeira com saldo diário projetado
+        
+        Considera saldos atuais, transações pendentes (inclusive recorrentes)
+        e a média recente das movimentações não recorrentes.
+        """
+        return self.projection(days)
     
     def get_all_insights(self):
         """Retorna todos os insights e alertas"""
@@ -223,4 +244,19 @@ class FinancialAnalyzer:
             'generated_at': timezone.now()
         }
         
-        return insights
\ No newline at end of file
+        return insights
+
+
+def company_insights(company):
+    """
+    Insights completos da empresa, reaproveitados do cache quando possível
+
+    Compartilhados por dashboard, página de insights e relatórios; o cache é
+    invalidado junto com a versão dos dados da empresa.
+    """
+    from .caching import cached_payload
+
+    return cached_payload(
+        company, 'all_insights', {'today': timezone.now().date()},
+        lambda: FinancialAnalyzer(company).get_all_insights()
+    )
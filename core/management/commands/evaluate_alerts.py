@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from accounts.models import Company
+from core.alert_scheduler import due_companies, evaluate_company
+
+
+class Command(BaseCommand):
+    help = 'Avalia os alertas dinâmicos das empresas com dados alterados ou avaliação vencida'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='ID de uma empresa a avaliar imediatamente'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Empresas processadas por lote (padrão: 50)'
+        )
+        parser.add_argument(
+            '--max-age',
+            type=int,
+            default=60,
+            help='Minutos após os quais uma empresa sem alterações é reavaliada (padrão: 60)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Executa continuamente, verificando empresas pendentes a cada --interval segundos'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Segundos entre as verificações no modo --loop (padrão: 60)'
+        )
+
+    def handle(self, *args, **options):
+        if options.get('company'):
+            company = Company.objects.filter(pk=options['company']).first()
+            if not company:
+                self.stdout.write(self.style.ERROR(f"Empresa {options['company']} não encontrada."))
+                return
+            self._evaluate(company)
+            return
+
+        max_age = timedelta(minutes=options['max_age'])
+
+        while True:
+            evaluated = self._run_pending(options['batch_size'], max_age)
+            if evaluated:
+                self.stdout.write(self.style.SUCCESS(f'{evaluated} empresas avaliadas.'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _run_pending(self, batch_size, max_age):
+        """Processa em lotes todas as empresas pendentes no momento"""
+        evaluated = 0
+        seen = set()
+
+        while True:
+            batch = list(due_companies(max_age).exclude(pk__in=seen)[:batch_size])
+            if not batch:
+                return evaluated
+
+            for company in batch:
+                seen.add(company.pk)
+                self._evaluate(company)
+                evaluated += 1
+
+    def _evaluate(self, company):
+        try:
+            alerts = evaluate_company(company)
+            if alerts:
+                self.stdout.write(f'Empresa "{company.name}": {len(alerts)} novos alertas')
+        except Exception as e:
+            self.stderr.write(f'Erro ao avaliar alertas da empresa "{company.name}": {e}')
@@ -1,10 +1,6 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from django.contrib.auth import get_user_model
 from core.models import ScheduledNotification
-from api.views import send_push_notification
-
-User = get_user_model()
+from api.push import broadcast
 
 
 class Command(BaseCommand):
@@ -23,33 +19,23 @@ class Command(BaseCommand):
             if notification.should_send_now():
                 self.stdout.write(f"Enviando: {notification.title}")
                 
-                # Enviar para todos os usuários com subscrições ativas
-                users_with_subscriptions = User.objects.filter(
-                    push_subscriptions__is_active=True
-                ).distinct()
-                
-                users_notified_for_this_notification = 0
+                # Envio em lote e em paralelo para todas as subscrições ativas
+                results = broadcast(
+                    title=notification.title,
+                    body=notification.body,
+                    url=notification.url,
+                    icon=notification.icon
+                )
                 
-                for user in users_with_subscriptions:
-                    try:
-                        results = send_push_notification(
-                            user=user,
-                            title=notification.title,
-                            body=notification.body,
-                            url=notification.url,
-                            icon=notification.icon
-                        )
-                        
-                        if results['sent'] > 0:
-                            users_notified_for_this_notification += 1
-                            notifications_sent += results['sent']
-                            
-                    except Exception as e:
-                        self.stderr.write(f"Erro ao enviar para {user.email}: {e}")
+                if results['failed']:
+                    self.stderr.write(f"  {results['failed']} envios falharam")
                 
                 # Marcar como enviada
                 notification.mark_sent()
                 
+                users_notified_for_this_notification = len(results['user_ids'])
+                notifications_sent += results['sent']
+                
                 self.stdout.write(f"  Notificação enviada para {users_notified_for_this_notification} usuários")
                 users_notified += users_notified_for_this_notification
         
@@ -57,4 +43,4 @@ class Command(BaseCommand):
             self.style.SUCCESS(
                 f"Concluído! {notifications_sent} notificações enviadas para {users_notified} usuários"
             )
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-17 17:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('core', '0003_auto_20251211_2023'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertEvaluation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_changed_at', models.DateTimeField(blank=True, null=True, verbose_name='Dados Alterados em')),
+                ('last_evaluated_at', models.DateTimeField(blank=True, null=True, verbose_name='Última Avaliação')),
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='alert_evaluation', to='accounts.company', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Avaliação de Alertas',
+                'verbose_name_plural': 'Avaliações de Alertas',
+                'indexes': [models.Index(fields=['last_evaluated_at'], name='core_alerte_last_ev_82a7c1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.7 on 2026-10-17 22:10
+
+import uuid
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_data_changed_at(apps, schema_editor):
+    """Leva a última alteração registrada pelo agendador de alertas para a versão dos dados"""
+    AlertEvaluation = apps.get_model('core', 'AlertEvaluation')
+    CompanyDataVersion = apps.get_model('core', 'CompanyDataVersion')
+
+    CompanyDataVersion.objects.bulk_create([
+        CompanyDataVersion(company_id=company_id, version=uuid.uuid4().hex[:12], changed_at=changed_at)
+        for company_id, changed_at in AlertEvaluation.objects.filter(
+            data_changed_at__isnull=False
+        ).values_list('company_id', 'data_changed_at')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('core', '0004_alertevaluation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompanyDataVersion',
+            fields=[
+                ('company', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='data_version', serialize=False, to='accounts.company', verbose_name='Empresa')),
+                ('version', models.CharField(max_length=32, verbose_name='Versão')),
+                ('changed_at', models.DateTimeField(verbose_name='Alterado em')),
+            ],
+            options={
+                'verbose_name': 'Versão dos Dados',
+                'verbose_name_plural': 'Versões dos Dados',
+            },
+        ),
+        migrations.RunPython(copy_data_changed_at, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='alertevaluation',
+            name='data_changed_at',
+        ),
+    ]
@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
@@ -196,3 +197,90 @@ class WebAuthnCredential(models.Model):
         self.sign_count += 1
         self.last_used = timezone.now()
         self.save(update_fields=['sign_count', 'last_used'])
+
+
+class CompanyDataVersion(models.Model):
+    """
+    Versão dos dados financeiros de cada empresa
+    
+    Trocada após o commit de toda escrita que altera os dados da empresa
+    (core.caching.bump_data_version). É a única versão dos dados: as chaves
+    do cache do dashboard, as previsões gravadas (reports.Forecast) e a fila
+    de avaliação de alertas (core.alert_scheduler) comparam-se com ela.
+    """
+    company = models.OneToOneField(
+        'accounts.Company',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version',
+        verbose_name='Empresa'
+    )
+    version = models.CharField('Versão', max_length=32)
+    changed_at = models.DateTimeField('Alterado em')
+    
+    class Meta:
+        verbose_name = 'Versão dos Dados'
+        verbose_name_plural = 'Versões dos Dados'
+    
+    def __str__(self):
+        return f"{self.company} - {self.version}"
+    
+    @classmethod
+    def current(cls, company_ids):
+        """
+        Versão atual dos dados de cada empresa
+        
+        Returns:
+            dict company_id -> versão (str), vazia para empresas sem alterações registradas
+        """
+        versions = {company_id: '' for company_id in company_ids}
+        versions.update(cls.objects.filter(
+            company_id__in=versions
+        ).values_list('company_id', 'version'))
+        return versions
+    
+    @classmethod
+    def bump(cls, company_ids):
+        """Troca a versão dos dados das empresas informadas"""
+        from accounts.models import Company
+        
+        company_ids = set(company_ids)
+        now = timezone.now()
+        # Token aleatório em vez de contador: não repete versões já usadas
+        # em chaves de cache nem em previsões gravadas
+        version = uuid.uuid4().hex[:12]
+        
+        existing = set(cls.objects.filter(
+            company_id__in=company_ids
+        ).values_list('company_id', flat=True))
+        missing = company_ids - existing
+        if missing:
+            # Empresas excluídas no mesmo commit não têm mais versão
+            cls.objects.bulk_create([
+                cls(company_id=company_id, version=version, changed_at=now)
+                for company_id in Company.objects.filter(pk__in=missing).values_list('pk', flat=True)
+            ], ignore_conflicts=True)
+        cls.objects.filter(company_id__in=company_ids).update(version=version, changed_at=now)
+
+
+class AlertEvaluation(models.Model):
+    """Controle da avaliação de alertas dinâmicos por empresa"""
+    company = models.OneToOneField(
+        'accounts.Company',
+        on_delete=models.CASCADE,
+        related_name='alert_evaluation',
+        verbose_name='Empresa'
+    )
+    
+    # Última avaliação dos alertas (comparada com CompanyDataVersion.changed_at)
+    last_evaluated_at = models.DateTimeField('Última Avaliação', null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Avaliação de Alertas'
+        verbose_name_plural = 'Avaliações de Alertas'
+        indexes = [
+            models.Index(fields=['last_evaluated_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.company} - {self.last_evaluated_at or 'nunca avaliada'}"
@@ -1,43 +1,179 @@
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.http import FileResponse
 from django.template.loader import get_template
 from django.utils import timezone
 from django.db.models import Sum, Count, Avg  # Fixed Sum import
 from datetime import datetime, timedelta
 from decimal import Decimal
-import io
+import tempfile
+from itertools import islice
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, Flowable
 from reportlab.lib.units import inch
 import xlsxwriter
 from transactions.models import Transaction, Account, Category
-from core.financial_analyzer import FinancialAnalyzer
+from core.financial_analyzer import company_insights
+from core.aggregations import category_totals, income_expense_totals
+
+
+def report_period(params):
+    """
+    Período do relatório a partir dos parâmetros da requisição
+    
+    Usa start_date/end_date (AAAA-MM-DD) quando informados; senão os
+    últimos 'period' dias (30 por padrão).
+    """
+    end_date = timezone.now().date()
+    try:
+        if params.get('start_date') and params.get('end_date'):
+            start_date = datetime.strptime(params['start_date'], '%Y-%m-%d').date()
+            end_date = datetime.strptime(params['end_date'], '%Y-%m-%d').date()
+            return start_date, max(start_date, end_date)
+        period_days = int(params.get('period', 30))
+    except ValueError:
+        period_days = 30
+    return end_date - timedelta(days=period_days), end_date
+
+
+def report_filename(company, end_date, extension):
+    return f'relatorio_financeiro_{company.name}_{end_date.strftime("%Y%m%d")}.{extension}'
 
 
 @login_required
 def export_financial_report_pdf(request):
     """Exporta relatório financeiro completo em PDF (PREMIUM FEATURE)"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
-    # Parâmetros
-    period_days = int(request.GET.get('period', 30))
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=period_days)
+    start_date, end_date = report_period(request.GET)
     
-    # Criar PDF
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="relatorio_financeiro_{current_company.name}_{end_date.strftime("%Y%m%d")}.pdf"'
+    # PDF gravado em arquivo temporário e enviado em blocos; o FileResponse
+    # fecha (e assim apaga) o arquivo ao final do envio
+    output = tempfile.TemporaryFile()
+    build_financial_report_pdf(current_company, start_date, end_date, output)
+    output.seek(0)
     
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    story = []
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=report_filename(current_company, end_date, 'pdf'),
+        content_type='application/pdf'
+    )
+
+
+# Linhas por tabela de transações no PDF (e por bloco lido do banco)
+PDF_TABLE_ROWS = 500
+
+
+class _TransactionTables(Flowable):
+    """
+    Tabelas de transações montadas só quando o layout chega até elas
+    
+    O flowable sempre se declara maior que o espaço livre do quadro, então
+    o platypus pede a divisão (split): cada divisão devolve a próxima tabela
+    (ou os pedaços dela, se não couber) seguida de um novo
+    _TransactionTables com o restante. Só a tabela em diagramação fica em
+    memória.
+    """
+    
+    def __init__(self, tables, current=None):
+        super().__init__()
+        self._tables = tables
+        self._current = current
+    
+    def _table(self):
+        if self._current is None:
+            self._current = next(self._tables, None)
+        return self._current
+    
+    def wrap(self, availWidth, availHeight):
+        if self._table() is None:
+            return 0, 0
+        return availWidth, availHeight + 1
+    
+    def split(self, availWidth, availHeight):
+        table = self._table()
+        if table is None:
+            return []
+        remainder = _TransactionTables(self._tables)
+        if table.wrap(availWidth, availHeight)[1] <= availHeight:
+            return [table, remainder]
+        # Sem espaço nem para o cabeçalho, a tabela vai para o próximo quadro
+        parts = table.split(availWidth, availHeight)
+        return parts + [remainder] if parts else []
+    
+    def draw(self):
+        pass
+
+
+def _pdf_transaction_tables(current_company, start_date, end_date):
+    """Tabelas de transações do período, montadas bloco a bloco"""
+    rows = Transaction.objects.filter(
+        company=current_company,
+        transaction_date__range=[start_date, end_date],
+        status='completed'
+    ).order_by('-transaction_date', '-created_at').values_list(
+        'transaction_date', 'transaction_type', 'category__name', 'description', 'amount'
+    ).iterator(chunk_size=PDF_TABLE_ROWS)
     
+    style = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+    
+    # Tabelas de tamanho fixo: quebrar uma tabela única com milhares de
+    # linhas entre páginas tem custo quadrático no ReportLab
+    while True:
+        chunk = list(islice(rows, PDF_TABLE_ROWS))
+        if not chunk:
+            break
+        
+        trans_data = [['Data', 'Tipo', 'Categoria', 'Descrição', 'Valor']]
+        for date, kind, category_name, description, amount in chunk:
+            trans_data.append([
+                date.strftime('%d/%m/%Y'),
+                'Receita' if kind == 'income' else 'Despesa',
+                category_name or 'Sem categoria',
+                description[:30] + '...' if len(description) > 30 else description,
+                f'R$ {amount:,.2f}'
+            ])
+        
+        trans_table = Table(trans_data, colWidths=[1*inch, 1*inch, 1.2*inch, 2.3*inch, 1*inch], repeatRows=1)
+        trans_table.setStyle(style)
+        yield trans_table
+
+
+def build_financial_report_pdf(current_company, start_date, end_date, output):
+    """
+    Monta o relatório financeiro em PDF
+    
+    As transações são lidas em blocos e viram tabelas só quando o layout
+    chega até elas (_TransactionTables), então as linhas em memória ficam
+    limitadas a um bloco de PDF_TABLE_ROWS. O canvas do ReportLab, porém,
+    guarda o conteúdo (comprimido) de todas as páginas até gravar o arquivo:
+    a memória do documento cresce com o número de páginas. Os insights vêm
+    do cache da empresa quando já calculados.
+    
+    Args:
+        output: arquivo binário (ex.: tempfile) onde o PDF é escrito
+    """
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    doc.build(list(_pdf_story(current_company, start_date, end_date)))
+
+
+def _pdf_story(current_company, start_date, end_date):
+    """Flowables do relatório em PDF, na ordem do documento"""
     # Estilos
     styles = getSampleStyleSheet()
     title_style = ParagraphStyle(
@@ -49,30 +185,17 @@ def export_financial_report_pdf(request):
     )
     
     # Título
-    story.append(Paragraph(f"Relatório Financeiro - {current_company.name}", title_style))
-    story.append(Paragraph(f"Período: {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}", styles['Normal']))
-    story.append(Spacer(1, 20))
+    yield Paragraph(f"Relatório Financeiro - {current_company.name}", title_style)
+    yield Paragraph(f"Período: {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}", styles['Normal'])
+    yield Spacer(1, 20)
     
     # Resumo Executivo
-    analyzer = FinancialAnalyzer(current_company)
-    insights = analyzer.get_all_insights()
+    insights = company_insights(current_company)
     
-    story.append(Paragraph("RESUMO EXECUTIVO", styles['Heading2']))
+    yield Paragraph("RESUMO EXECUTIVO", styles['Heading2'])
     
     # Métricas principais
-    income = Transaction.objects.filter(
-        company=current_company,
-        transaction_type='income',
-        transaction_date__range=[start_date, end_date],
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-    
-    expense = Transaction.objects.filter(
-        company=current_company,
-        transaction_type='expense',
-        transaction_date__range=[start_date, end_date],
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    income, expense = income_expense_totals(current_company, start_date, end_date)
     
     # Tabela de métricas
     metrics_data = [
@@ -96,92 +219,99 @@ def export_financial_report_pdf(request):
         ('GRID', (0, 0), (-1, -1), 1, colors.black)
     ]))
     
-    story.append(metrics_table)
-    story.append(Spacer(1, 20))
-    
-    # Transações detalhadas
-    story.append(Paragraph("TRANSAÇÕES DETALHADAS", styles['Heading2']))
-    
-    transactions = Transaction.objects.filter(
-        company=current_company,
-        transaction_date__range=[start_date, end_date],
-        status='completed'
-    ).order_by('-transaction_date', '-created_at')[:50]  # Últimas 50
+    yield metrics_table
+    yield Spacer(1, 20)
     
-    if transactions:
-        trans_data = [['Data', 'Tipo', 'Categoria', 'Descrição', 'Valor']]
+    # Por categoria
+    categories = category_totals(current_company, start_date, end_date)
+    if categories:
+        yield Paragraph("POR CATEGORIA", styles['Heading2'])
         
-        for trans in transactions:
-            trans_data.append([
-                trans.transaction_date.strftime('%d/%m/%Y'),
-                'Receita' if trans.transaction_type == 'income' else 'Despesa',
-                trans.category.name if trans.category else 'Sem categoria',
-                trans.description[:30] + '...' if len(trans.description) > 30 else trans.description,
-                f'R$ {trans.amount:,.2f}'
+        category_data = [['Categoria', 'Tipo', 'Quantidade', 'Total']]
+        for category in categories:
+            category_data.append([
+                category['name'],
+                'Receita' if category['transaction_type'] == 'income' else 'Despesa',
+                category['count'],
+                f"R$ {category['total']:,.2f}"
             ])
         
-        trans_table = Table(trans_data, colWidths=[1*inch, 1*inch, 1.2*inch, 2.3*inch, 1*inch])
-        trans_table.setStyle(TableStyle([
+        category_table = Table(category_data, colWidths=[2.5*inch, 1*inch, 1*inch, 1.5*inch], repeatRows=1)
+        category_table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2E86AB')),
             ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
             ('GRID', (0, 0), (-1, -1), 1, colors.black)
         ]))
         
-        story.append(trans_table)
+        yield category_table
+        yield Spacer(1, 20)
+    
+    # Transações detalhadas
+    yield Paragraph("TRANSAÇÕES DETALHADAS", styles['Heading2'])
+    yield _TransactionTables(_pdf_transaction_tables(current_company, start_date, end_date))
     
     # Insights e Alertas
     if insights['spending_spikes'] or insights['balance_risks']:
-        story.append(Spacer(1, 20))
-        story.append(Paragraph("ALERTAS INTELIGENTES", styles['Heading2']))
+        yield Spacer(1, 20)
+        yield Paragraph("ALERTAS INTELIGENTES", styles['Heading2'])
         
         for alert in insights['spending_spikes']:
-            story.append(Paragraph(f"⚠️ {alert['title']}: {alert['message']}", styles['Normal']))
-            story.append(Paragraph(f"💡 Recomendação: {alert['recommendation']}", styles['Italic']))
-            story.append(Spacer(1, 10))
+            yield Paragraph(f"⚠️ {alert['title']}: {alert['message']}", styles['Normal'])
+            yield Paragraph(f"💡 Recomendação: {alert['recommendation']}", styles['Italic'])
+            yield Spacer(1, 10)
         
         for alert in insights['balance_risks']:
-            story.append(Paragraph(f"🚨 {alert['title']}: {alert['message']}", styles['Normal']))
-            story.append(Paragraph(f"💡 Recomendação: {alert['recommendation']}", styles['Italic']))
-            story.append(Spacer(1, 10))
+            yield Paragraph(f"🚨 {alert['title']}: {alert['message']}", styles['Normal'])
+            yield Paragraph(f"💡 Recomendação: {alert['recommendation']}", styles['Italic'])
+            yield Spacer(1, 10)
     
     # Rodapé
-    story.append(Spacer(1, 30))
-    story.append(Paragraph("Relatório gerado automaticamente pelo CashFlow Manager", styles['Italic']))
-    story.append(Paragraph(f"Data de geração: {timezone.now().strftime('%d/%m/%Y às %H:%M')}", styles['Italic']))
-    
-    # Construir PDF
-    doc.build(story)
-    
-    pdf = buffer.getvalue()
-    buffer.close()
-    response.write(pdf)
-    
-    return response
+    yield Spacer(1, 30)
+    yield Paragraph("Relatório gerado automaticamente pelo CashFlow Manager", styles['Italic'])
+    yield Paragraph(f"Data de geração: {timezone.now().strftime('%d/%m/%Y às %H:%M')}", styles['Italic'])
 
 
 @login_required
 def export_financial_report_excel(request):
     """Exporta relatório financeiro completo em Excel (PREMIUM FEATURE)"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
-    # Parâmetros
-    period_days = int(request.GET.get('period', 30))
-    end_date = timezone.now().date()
-    start_date = end_date - timedelta(days=period_days)
+    start_date, end_date = report_period(request.GET)
     
-    # Criar arquivo Excel
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename="relatorio_financeiro_{current_company.name}_{end_date.strftime("%Y%m%d")}.xlsx"'
+    # Planilha montada em arquivo temporário e enviada em blocos; o
+    # FileResponse fecha (e assim apaga) o arquivo ao final do envio
+    output = tempfile.TemporaryFile()
+    build_financial_report_excel(current_company, start_date, end_date, output)
+    output.seek(0)
+    
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=report_filename(current_company, end_date, 'xlsx'),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+def build_financial_report_excel(current_company, start_date, end_date, output):
+    """
+    Monta o relatório financeiro em Excel com memória constante
     
-    output = io.BytesIO()
-    workbook = xlsxwriter.Workbook(output, {'in_memory': True})
+    As linhas são gravadas em ordem no modo constant_memory do xlsxwriter
+    (cada linha vai para disco ao iniciar a próxima) e as transações são
+    lidas em blocos com iterator(), então o consumo de memória não cresce
+    com o período exportado.
+    
+    Args:
+        output: arquivo binário com seek (ex.: tempfile) onde o .xlsx é escrito
+    """
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
     
     # Formatos
     title_format = workbook.add_format({
@@ -215,22 +345,9 @@ def export_financial_report_excel(request):
     summary_sheet.write('A2', f'Período: {start_date.strftime("%d/%m/%Y")} a {end_date.strftime("%d/%m/%Y")}')
     
     # Métricas principais
-    analyzer = FinancialAnalyzer(current_company)
-    insights = analyzer.get_all_insights()
-    
-    income = Transaction.objects.filter(
-        company=current_company,
-        transaction_type='income',
-        transaction_date__range=[start_date, end_date],
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    insights = company_insights(current_company)
     
-    expense = Transaction.objects.filter(
-        company=current_company,
-        transaction_type='expense',
-        transaction_date__range=[start_date, end_date],
-        status='completed'
-    ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    income, expense = income_expense_totals(current_company, start_date, end_date)
     
     summary_sheet.write('A4', 'Métrica', header_format)
     summary_sheet.write('B4', 'Valor', header_format)
@@ -265,17 +382,32 @@ def export_financial_report_excel(request):
         company=current_company,
         transaction_date__range=[start_date, end_date],
         status='completed'
-    ).order_by('-transaction_date', '-created_at')
-    
-    for row, trans in enumerate(transactions, start=1):
-        trans_sheet.write(row, 0, trans.transaction_date, date_format)
-        trans_sheet.write(row, 1, 'Receita' if trans.transaction_type == 'income' else 'Despesa')
-        trans_sheet.write(row, 2, trans.category.name if trans.category else 'Sem categoria')
-        trans_sheet.write(row, 3, trans.account.name)
-        trans_sheet.write(row, 4, trans.description)
-        trans_sheet.write(row, 5, float(trans.amount), money_format)
+    ).order_by('-transaction_date', '-created_at').values_list(
+        'transaction_date', 'transaction_type', 'category__name', 'account__name', 'description', 'amount'
+    )
     
-    # Aba 3: Insights
+    rows = transactions.iterator(chunk_size=2000)
+    for row, (date, kind, category_name, account_name, description, amount) in enumerate(rows, start=1):
+        trans_sheet.write(row, 0, date, date_format)
+        trans_sheet.write(row, 1, 'Receita' if kind == 'income' else 'Despesa')
+        trans_sheet.write(row, 2, category_name or 'Sem categoria')
+        trans_sheet.write(row, 3, account_name)
+        trans_sheet.write(row, 4, description)
+        trans_sheet.write(row, 5, float(amount), money_format)
+    
+    # Aba 3: Categorias (consolidados diários, uma consulta agrupada)
+    category_sheet = workbook.add_worksheet('Categorias')
+    for col, header in enumerate(['Categoria', 'Tipo', 'Quantidade', 'Total']):
+        category_sheet.write(0, col, header, header_format)
+    
+    rows = category_totals(current_company, start_date, end_date)
+    for row, category in enumerate(rows, start=1):
+        category_sheet.write(row, 0, category['name'])
+        category_sheet.write(row, 1, 'Receita' if category['transaction_type'] == 'income' else 'Despesa')
+        category_sheet.write(row, 2, category['count'])
+        category_sheet.write(row, 3, float(category['total']), money_format)
+    
+    # Aba 4: Insights
     insights_sheet = workbook.add_worksheet('Insights IA')
     
     insights_sheet.write('A1', 'Insights Inteligentes', title_format)
@@ -309,12 +441,8 @@ def export_financial_report_excel(request):
     trans_sheet.set_column('D:D', 15)
     trans_sheet.set_column('E:E', 30)
     trans_sheet.set_column('F:F', 15)
+    category_sheet.set_column('A:A', 25)
+    category_sheet.set_column('B:D', 15)
     insights_sheet.set_column('A:A', 80)
     
     workbook.close()
-    
-    output.seek(0)
-    response.write(output.getvalue())
-    output.close()
-    
-    return response
\ No newline at end of file
@@ -0,0 +1,211 @@
+"""
+Projeção de fluxo de caixa com saldo diário por conta
+
+Combina, em um vetor denso de dias, três fontes:
+
+- o saldo atual de cada conta;
+- as transações pendentes na data de vencimento (ou da transação), incluindo
+  as ocorrências geradas pelas recorrências; as vencidas entram no primeiro dia;
+- uma linha de base diária: a média das receitas e despesas concluídas e não
+  recorrentes da janela recente (as recorrentes já estão nas pendentes).
+
+O saldo de cada dia sai da soma acumulada desse vetor. São duas consultas
+agrupadas, independentemente do horizonte e do número de transações.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from transactions.models import Transaction, Account
+
+
+CENTS = Decimal('0.01')
+
+
+def _baseline(company, today, baseline_days):
+    """Média diária de receitas e despesas não recorrentes por conta"""
+    rows = Transaction.objects.filter(
+        company=company,
+        status='completed',
+        transaction_type__in=['income', 'expense'],
+        transaction_date__gt=today - timedelta(days=baseline_days),
+        transaction_date__lte=today,
+        recurrence='none',
+        parent_transaction__isnull=True
+    ).values('account_id', 'transaction_type').annotate(
+        total=Sum('amount')
+    ).order_by()
+
+    income = {}
+    expense = {}
+    for row in rows:
+        target = income if row['transaction_type'] == 'income' else expense
+        target[row['account_id']] = (row['total'] or Decimal('0')) / baseline_days
+    return income, expense
+
+
+def _scheduled(company, last_day):
+    """Transações pendentes até o último dia, agrupadas por conta, tipo e data efetiva"""
+    return Transaction.objects.filter(
+        company=company,
+        status='pending'
+    ).annotate(
+        effective_date=Coalesce('due_date', 'transaction_date')
+    ).filter(
+        effective_date__lte=last_day
+    ).values(
+        'account_id', 'transfer_to_account_id', 'transaction_type', 'effective_date'
+    ).annotate(
+        total=Sum('amount')
+    ).order_by()
+
+
+def project_cash_flow(company, days=30, baseline_days=60, accounts=None):
+    """
+    Projeta o saldo diário de cada conta para os próximos dias
+
+    Args:
+        company: Empresa
+        days: horizonte da projeção (dias a partir de amanhã)
+        baseline_days: janela usada para a linha de base
+        accounts: contas a projetar (padrão: contas ativas da empresa)
+
+    Returns:
+        dict com os totais da projeção, 'dates', 'balances' (saldo total por
+        dia) e 'accounts' (série de cada conta)
+    """
+    days = max(1, days)
+    today = timezone.now().date()
+    dates = [today + timedelta(days=offset) for offset in range(1, days + 1)]
+
+    if accounts is None:
+        accounts = Account.objects.filter(company=company, is_active=True)
+    accounts = list(accounts)
+    positions = {account.pk: position for position, account in enumerate(accounts)}
+
+    # Vetor denso de variações diárias por conta, começando pela linha de base
+    income_rate, expense_rate = _baseline(company, today, baseline_days)
+    deltas = [
+        [income_rate.get(account.pk, Decimal('0')) - expense_rate.get(account.pk, Decimal('0'))] * days
+        for account in accounts
+    ]
+
+    scheduled_income = Decimal('0')
+    scheduled_expense = Decimal('0')
+    for row in _scheduled(company, dates[-1]):
+        # Pendentes vencidas ou de hoje entram no primeiro dia projetado
+        day = max(0, (row['effective_date'] - dates[0]).days)
+        amount = row['total'] or Decimal('0')
+        source = positions.get(row['account_id'])
+
+        if row['transaction_type'] == 'income':
+            if source is not None:
+                deltas[source][day] += amount
+                scheduled_income += amount
+        elif row['transaction_type'] == 'expense':
+            if source is not None:
+                deltas[source][day] -= amount
+                scheduled_expense += amount
+        elif row['transaction_type'] == 'transfer':
+            if source is not None:
+                deltas[source][day] -= amount
+            target = positions.get(row['transfer_to_account_id'])
+            if target is not None:
+                deltas[target][day] += amount
+
+    # Soma acumulada: saldo ao fim de cada dia
+    account_series = []
+    for account, account_deltas in zip(accounts, deltas):
+        balances = [value.quantize(CENTS) for value in accumulate(account_deltas, initial=account.current_balance)][1:]
+        lowest = min(range(days), key=balances.__getitem__)
+        account_series.append({
+            'id': account.pk,
+            'name': account.name,
+            'current_balance': account.current_balance,
+            'balances': balances,
+            'lowest_balance': balances[lowest],
+            'lowest_balance_date': dates[lowest],
+            # Primeiro dia com saldo negativo (None se não ocorrer no horizonte)
+            'negative_on': next((dates[i] for i, value in enumerate(balances) if value < 0), None),
+        })
+
+    totals = [Decimal('0')] * days
+    for series in account_series:
+        totals = [total + value for total, value in zip(totals, series['balances'])]
+
+    current_balance = sum((account.current_balance for account in accounts), Decimal('0'))
+    avg_daily_income = sum(income_rate.values(), Decimal('0'))
+    avg_daily_expense = sum(expense_rate.values(), Decimal('0'))
+    projected_income = (avg_daily_income * days + scheduled_income).quantize(CENTS)
+    projected_expense = (avg_daily_expense * days + scheduled_expense).quantize(CENTS)
+    lowest = min(range(days), key=totals.__getitem__)
+
+    return {
+        'current_balance': current_balance,
+        'projected_income': projected_income,
+        'projected_expense': projected_expense,
+        'projected_balance': totals[-1],
+        'net_flow': projected_income - projected_expense,
+        'scheduled_income': scheduled_income,
+        'scheduled_expense': scheduled_expense,
+        'avg_daily_income': avg_daily_income,
+        'avg_daily_expense': avg_daily_expense,
+        'lowest_balance': totals[lowest],
+        'lowest_balance_date': dates[lowest],
+        'forecast_days': days,
+        'dates': dates,
+        'balances': totals,
+        'accounts': account_series,
+    }
+
+
+def serialize_projection(projection):
+    """Converte a projeção para JSON (datas ISO e valores float)"""
+    def convert(value):
+        if isinstance(value, Decimal):
+            return float(value)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if isinstance(value, dict):
+            return {key: convert(item) for key, item in value.items()}
+        if isinstance(value, list):
+            return [convert(item) for item in value]
+        return value
+
+    return convert(projection)
+
+
+# Campos monetários e de data da projeção, para reconstruí-la a partir do JSON
+MONEY_KEYS = {
+    'current_balance', 'projected_income', 'projected_expense', 'projected_balance',
+    'net_flow', 'scheduled_income', 'scheduled_expense', 'avg_daily_income',
+    'avg_daily_expense', 'lowest_balance', 'balances',
+}
+DATE_KEYS = {'dates', 'lowest_balance_date', 'negative_on'}
+
+
+def deserialize_projection(data):
+    """Reconstrói (Decimal e date) uma projeção gravada por serialize_projection"""
+    def money(value):
+        return Decimal(str(value)).quantize(CENTS) if value is not None else None
+
+    def day(value):
+        return date.fromisoformat(value) if value else None
+
+    def convert(values):
+        result = {}
+        for key, value in values.items():
+            if key in MONEY_KEYS:
+                result[key] = [money(item) for item in value] if isinstance(value, list) else money(value)
+            elif key in DATE_KEYS:
+                result[key] = [day(item) for item in value] if isinstance(value, list) else day(value)
+            elif key == 'accounts':
+                result[key] = [convert(account) for account in value]
+            else:
+                result[key] = value
+        return result
+
+    return convert(data)
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from transactions.models import Transaction, Account, Goal, Category
+from .caching import bump_data_version
+
+
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+@receiver(post_save, sender=Account)
+@receiver(post_delete, sender=Account)
+@receiver(post_save, sender=Goal)
+@receiver(post_delete, sender=Goal)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def company_data_changed(sender, instance, **kwargs):
+    """Troca a versão dos dados da empresa (cache, previsões e alertas)"""
+    bump_data_version(instance.company_id)
@@ -0,0 +1,122 @@
+"""
+Padrões de gasto: perfis por dia da semana, dia do mês e hora
+
+Os perfis por data e o mapa de calor categoria x dia da semana saem de uma
+única consulta agrupada sobre os consolidados diários (data, categoria),
+dobrada em Python; novos perfis por data não custam consultas extras. A hora
+não existe nos consolidados nem na transação (transaction_date é só data),
+então o perfil por hora usa o horário de lançamento (created_at), em uma
+segunda consulta agrupada.
+"""
+from decimal import Decimal
+from django.db.models import Sum
+from django.db.models.functions import ExtractHour
+
+from transactions.models import DailyRollup, Transaction
+
+
+WEEKDAYS = ['Seg', 'Ter', 'Qua', 'Qui', 'Sex', 'Sáb', 'Dom']
+
+
+def _daily_category_totals(company, start_date, end_date):
+    """Despesas concluídas por (data, categoria) no período"""
+    return DailyRollup.objects.filter(
+        company=company,
+        transaction_type='expense',
+        status='completed',
+        date__range=[start_date, end_date]
+    ).values(
+        'date', 'category_id', 'category__name', 'category__color'
+    ).annotate(
+        total=Sum('total_amount')
+    ).order_by()
+
+
+def hour_profile(company, start_date, end_date):
+    """
+    Despesas concluídas por hora de lançamento (0-23)
+
+    Returns:
+        dict hora -> total (float)
+    """
+    rows = Transaction.objects.filter(
+        company=company,
+        transaction_type='expense',
+        status='completed',
+        transaction_date__range=[start_date, end_date]
+    ).annotate(
+        hour=ExtractHour('created_at')
+    ).values('hour').annotate(
+        total=Sum('amount')
+    ).order_by()
+
+    hours = {hour: 0.0 for hour in range(24)}
+    for row in rows:
+        hours[row['hour']] = float(row['total'] or 0)
+    return hours
+
+
+def spending_profile(company, start_date, end_date, top_categories=5):
+    """
+    Perfis de gasto do período
+
+    Args:
+        company: Empresa
+        start_date: Data inicial (inclusive)
+        end_date: Data final (inclusive)
+        top_categories: quantas categorias entram no ranking e no mapa de calor
+
+    Returns:
+        dict com:
+        - 'weekday': dia da semana (0=Segunda, 6=Domingo) -> total
+        - 'day_of_month': dia do mês (1-31) -> total
+        - 'hour': hora de lançamento (0-23) -> total
+        - 'top_categories': maiores categorias de gasto ('id', 'name',
+          'color', 'total_spent')
+        - 'heatmap': {'categories': nomes, 'weekdays': rótulos, 'values':
+          uma linha de 7 totais por categoria}
+    """
+    weekday = [Decimal('0')] * 7
+    day_of_month = [Decimal('0')] * 31
+    categories = {}
+
+    for row in _daily_category_totals(company, start_date, end_date):
+        total = row['total'] or Decimal('0')
+        day = row['date']
+        weekday[day.weekday()] += total
+        day_of_month[day.day - 1] += total
+
+        if row['category_id'] is None:
+            continue
+        category = categories.get(row['category_id'])
+        if category is None:
+            category = categories[row['category_id']] = {
+                'id': row['category_id'],
+                'name': row['category__name'],
+                'color': row['category__color'],
+                'total_spent': Decimal('0'),
+                'weekday': [Decimal('0')] * 7,
+            }
+        category['total_spent'] += total
+        category['weekday'][day.weekday()] += total
+
+    ranking = sorted(
+        (category for category in categories.values() if category['total_spent'] > 0),
+        key=lambda category: category['total_spent'],
+        reverse=True
+    )[:top_categories]
+
+    return {
+        'weekday': {index: float(total) for index, total in enumerate(weekday)},
+        'day_of_month': {index: float(total) for index, total in enumerate(day_of_month, start=1)},
+        'hour': hour_profile(company, start_date, end_date),
+        'top_categories': [
+            {key: category[key] for key in ('id', 'name', 'color', 'total_spent')}
+            for category in ranking
+        ],
+        'heatmap': {
+            'categories': [category['name'] for category in ranking],
+            'weekdays': WEEKDAYS,
+            'values': [[float(total) for total in category['weekday']] for category in ranking],
+        },
+    }
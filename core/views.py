@@ -1,15 +1,17 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Sum, Count, Q
+from django.db.models import Sum
 from django.utils import timezone
 from django.http import HttpResponse
 from datetime import datetime, timedelta
 from accounts.models import CompanyMember
 from transactions.models import Transaction, Account, Category, Goal
 from reports.models import Alert
-from .financial_analyzer import FinancialAnalyzer
-from .alert_generator import generate_dynamic_alerts, auto_resolve_outdated_alerts
+from .financial_analyzer import company_insights
+from .aggregations import income_expense_series, income_expense_totals
+from .caching import cached_payload
+from .spending_patterns import spending_profile
 from . import premium_exports
 import json
 
@@ -18,7 +20,7 @@ import json
 def dashboard_view(request):
     """Dashboard principal com visão geral"""
     # Verificar se o usuário tem uma empresa
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -61,21 +63,14 @@ def dashboard_view(request):
             start_date = today - timedelta(days=period_days-1)
             end_date = today
     
-    # Estatísticas básicas
-    total_income = Transaction.objects.filter(
-        company=current_company,
-        transaction_type='income',
-        status='completed',
-        transaction_date__range=[start_date, end_date]
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    total_expense = Transaction.objects.filter(
-        company=current_company,
-        transaction_type='expense',
-        status='completed',
-        transaction_date__range=[start_date, end_date]
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
+    # Totais, gráficos e insights ficam em cache até os dados da empresa mudarem
+    payload = cached_payload(
+        current_company, 'dashboard',
+        {'start_date': start_date, 'end_date': end_date, 'today': today},
+        lambda: _build_dashboard_payload(current_company, start_date, end_date)
+    )
+    total_income = payload['total_income']
+    total_expense = payload['total_expense']
     net_income = total_income - total_expense
     
     # Saldo atual de todas as contas
@@ -94,29 +89,12 @@ def dashboard_view(request):
         is_active=True
     ).order_by('target_date')[:5]
     
-    # Gerar/atualizar alertas dinâmicos automaticamente
-    try:
-        # Resolver alertas desatualizados
-        auto_resolve_outdated_alerts(current_company)
-        
-        # Gerar novos alertas baseados nos dados atuais
-        generate_dynamic_alerts(current_company, request.user)
-    except Exception as e:
-        print(f"Erro ao gerar alertas dinâmicos: {e}")
-    
-    # Alertas ativos (agora dinâmicos)
+    # Alertas ativos (gerados em segundo plano pelo comando evaluate_alerts)
     active_alerts = Alert.objects.filter(
         company=current_company,
         status='active'
     ).order_by('-severity', '-triggered_at')[:5]
     
-    # Dados para gráficos
-    chart_data = _get_chart_data(current_company, start_date, end_date)
-    
-    # Insights inteligentes (PREMIUM FEATURE)
-    analyzer = FinancialAnalyzer(current_company)
-    insights = analyzer.get_all_insights()
-    
     context = {
         'total_income': total_income,
         'total_expense': total_expense,
@@ -126,8 +104,8 @@ def dashboard_view(request):
         'active_goals': active_goals,
         'active_alerts': active_alerts,
         'accounts': accounts,
-        'chart_data': json.dumps(chart_data),
-        'insights': insights,  # PREMIUM FEATURE
+        'chart_data': json.dumps(payload['chart_data']),
+        'insights': payload['insights'],  # PREMIUM FEATURE
         'period_days': period_days,
         'start_date': start_date,
         'end_date': end_date,
@@ -144,7 +122,7 @@ def dashboard_view(request):
 @login_required
 def overview_view(request):
     """Visão geral mais detalhada"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -163,39 +141,24 @@ def overview_view(request):
         company=current_company,
         is_active=True
     ).annotate(
-        total_amount=Sum('transactions__amount'),
-        transaction_count=Count('transactions')
+        total_amount=Sum('daily_rollups__total_amount'),
+        transaction_count=Sum('daily_rollups__transaction_count')
     ).filter(total_amount__gt=0).order_by('-total_amount')
     
-    # Evolução mensal
+    # Evolução mensal (últimos 12 meses em uma única consulta)
+    first_month = end_date.replace(day=1)
+    for _ in range(11):
+        first_month = (first_month - timedelta(days=1)).replace(day=1)
+    
     monthly_data = []
-    for i in range(12):
-        month_start = (end_date.replace(day=1) - timedelta(days=i*30)).replace(day=1)
-        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-        
-        income = Transaction.objects.filter(
-            company=current_company,
-            transaction_type='income',
-            status='completed',
-            transaction_date__range=[month_start, month_end]
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        expense = Transaction.objects.filter(
-            company=current_company,
-            transaction_type='expense',
-            status='completed',
-            transaction_date__range=[month_start, month_end]
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
+    for row in income_expense_series(current_company, first_month, end_date, grain='month'):
         monthly_data.append({
-            'month': month_start.strftime('%B %Y'),
-            'income': float(income),
-            'expense': float(expense),
-            'net': float(income - expense)
+            'month': row['period'].strftime('%B %Y'),
+            'income': float(row['income']),
+            'expense': float(row['expense']),
+            'net': float(row['income'] - row['expense'])
         })
     
-    monthly_data.reverse()
-    
     context = {
         'category_analysis': category_analysis,
         'monthly_data': json.dumps(monthly_data),
@@ -208,13 +171,10 @@ def overview_view(request):
 @login_required
 def insights_view(request):
     """Página dedicada aos insights financeiros (PREMIUM FEATURE)"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
-    analyzer = FinancialAnalyzer(current_company)
-    insights = analyzer.get_all_insights()
-    
     # Filtros de data personalizados (mesma lógica do dashboard)
     start_date_str = request.GET.get('start_date')
     end_date_str = request.GET.get('end_date')
@@ -234,33 +194,20 @@ def insights_view(request):
         period_days = int(period_preset) if period_preset.isdigit() else 30
         start_date = end_date - timedelta(days=period_days-1)
     
-    # Top categorias de gasto no período
-    top_expense_categories = Category.objects.filter(
-        company=current_company,
-        category_type='expense'
-    ).annotate(
-        total_spent=Sum('transactions__amount', 
-                       filter=Q(transactions__transaction_date__range=[start_date, end_date],
-                                transactions__status='completed'))
-    ).filter(total_spent__gt=0).order_by('-total_spent')[:5]
-    
-    # Padrões de gasto por dia da semana no período
-    weekday_patterns = {}
-    for i in range(7):  # 0=Segunda, 6=Domingo
-        day_total = Transaction.objects.filter(
-            company=current_company,
-            transaction_type='expense',
-            transaction_date__week_day=i+2,  # Django week_day: 1=Domingo
-            transaction_date__range=[start_date, end_date],
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        weekday_patterns[i] = float(day_total)
+    today = timezone.now().date()
+    payload = cached_payload(
+        current_company, 'insights',
+        {'start_date': start_date, 'end_date': end_date, 'today': today},
+        lambda: _build_insights_payload(current_company, start_date, end_date)
+    )
     
     context = {
-        'insights': insights,
-        'top_expense_categories': top_expense_categories,
-        'weekday_patterns': weekday_patterns,
+        'insights': payload['insights'],
+        'top_expense_categories': payload['top_expense_categories'],
+        'weekday_patterns': payload['weekday_patterns'],
+        'day_of_month_patterns': json.dumps(payload['day_of_month_patterns']),
+        'hour_patterns': json.dumps(payload['hour_patterns']),
+        'category_heatmap': payload['category_heatmap'],  # json_script no template (nomes de categoria)
         'period_days': period_days,
         'start_date': start_date,
         'end_date': end_date,
@@ -275,35 +222,45 @@ def insights_view(request):
     return render(request, 'core/insights.html', context)
 
 
+def _build_dashboard_payload(company, start_date, end_date):
+    """Calcula os dados do dashboard que podem ficar em cache"""
+    total_income, total_expense = income_expense_totals(company, start_date, end_date)
+    
+    return {
+        'total_income': total_income,
+        'total_expense': total_expense,
+        'chart_data': _get_chart_data(company, start_date, end_date),
+        'insights': company_insights(company),  # PREMIUM FEATURE
+    }
+
+
+def _build_insights_payload(company, start_date, end_date):
+    """Calcula os dados da página de insights que podem ficar em cache"""
+    # Top categorias, dia da semana, dia do mês, hora e mapa de calor em
+    # número fixo de consultas (core.spending_patterns)
+    profile = spending_profile(company, start_date, end_date)
+    
+    return {
+        'insights': company_insights(company),
+        'top_expense_categories': profile['top_categories'],
+        'weekday_patterns': profile['weekday'],
+        'day_of_month_patterns': profile['day_of_month'],
+        'hour_patterns': profile['hour'],
+        'category_heatmap': profile['heatmap'],
+    }
+
+
 def _get_chart_data(company, start_date, end_date):
     """Gera dados para gráficos do dashboard"""
     
     # Gráfico de receitas vs despesas por dia
     daily_data = []
-    current_date = start_date
-    
-    while current_date <= end_date:
-        income = Transaction.objects.filter(
-            company=company,
-            transaction_type='income',
-            status='completed',
-            transaction_date=current_date
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        expense = Transaction.objects.filter(
-            company=company,
-            transaction_type='expense',
-            status='completed',
-            transaction_date=current_date
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
+    for row in income_expense_series(company, start_date, end_date, grain='day'):
         daily_data.append({
-            'date': current_date.strftime('%Y-%m-%d'),
-            'income': float(income),
-            'expense': float(expense)
+            'date': row['period'].strftime('%Y-%m-%d'),
+            'income': float(row['income']),
+            'expense': float(row['expense'])
         })
-        
-        current_date += timedelta(days=1)
     
     # Gráfico por categoria
     category_data = []
@@ -311,7 +268,7 @@ def _get_chart_data(company, start_date, end_date):
         company=company,
         is_active=True
     ).annotate(
-        total_amount=Sum('transactions__amount')
+        total_amount=Sum('daily_rollups__total_amount')
     ).filter(total_amount__gt=0).order_by('-total_amount')[:10]
     
     for category in categories:
@@ -1,108 +1,238 @@
-from django.http import HttpResponse
-from django.template.loader import get_template
+"""
+Relatório DASN-SIMEI (Declaração Anual do Simples Nacional - MEI)
+
+Os valores do ano saem de consultas agrupadas sobre os consolidados diários
+(transactions.DailyRollup). Anos encerrados ficam gravados como Report
+('dasn_simei') com os valores e o PDF; o registro é descartado quando uma
+escrita retroativa toca o ano (transactions.side_effects). O ano corrente
+fica no cache versionado da empresa.
+"""
+import json
+from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Sum, Q
+from django.db.models.functions import ExtractMonth
 from django.utils import timezone
-from datetime import datetime, date
+from datetime import date
 from decimal import Decimal
-from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
 from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.enums import TA_CENTER
 from io import BytesIO
-from transactions.models import Transaction
-from accounts.models import Company
+from transactions.models import DailyRollup
 
 
-def generate_dasn_simei_report(company, year=None):
-    """
-    Gera relatório DASN-SIMEI (Declaração Anual do Simples Nacional - MEI)
-    para auxiliar o MEI no preenchimento da declaração anual
+LIMITE_MEI = Decimal('81000.00')  # Limite MEI para 2024/2025
+
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho',
+         'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+# Categorias de despesa consideradas dedutíveis (para controle)
+CATEGORIAS_DEDUTIVEIS = [
+    'Material de escritório',
+    'Telefone/Internet',
+    'Combustível',
+    'Manutenção de veículos',
+    'Aluguel do local de trabalho',
+    'Energia elétrica',
+    'Água',
+    'IPTU',
+    'Materiais e insumos',
+    'Equipamentos',
+    'Cursos e capacitação'
+]
+
+
+def dasn_simei_data(company, year):
     """
-    if year is None:
-        year = timezone.now().year - 1  # Ano anterior por padrão
-    
-    # Período da declaração (ano completo)
-    start_date = date(year, 1, 1)
-    end_date = date(year, 12, 31)
+    Calcula os valores da declaração do ano com consultas agrupadas
     
-    # Buscar transações do período
-    transactions = Transaction.objects.filter(
+    Receitas por categoria e por mês saem de uma única consulta agrupada
+    por (categoria, mês); as despesas dedutíveis, de uma agregação.
+    """
+    rollups = DailyRollup.objects.filter(
         company=company,
-        transaction_date__range=[start_date, end_date]
+        date__range=[date(year, 1, 1), date(year, 12, 31)]
     )
     
-    # Cálculos para DASN-SIMEI
-    receita_total = transactions.filter(transaction_type='income').aggregate(
-        total=models.Sum('amount')
-    )['total'] or Decimal('0')
+    rows = rollups.filter(transaction_type='income').annotate(
+        month=ExtractMonth('date')
+    ).values('category__name', 'month').annotate(
+        total=Sum('total_amount')
+    ).order_by()
     
-    # Receitas por categoria (importante para MEI)
     receitas_por_categoria = {}
-    for transaction in transactions.filter(transaction_type='income'):
-        categoria = transaction.category.name if transaction.category else 'Sem categoria'
-        if categoria not in receitas_por_categoria:
-            receitas_por_categoria[categoria] = Decimal('0')
-        receitas_por_categoria[categoria] += transaction.amount
+    receitas_por_mes = [Decimal('0')] * 12
+    for row in rows:
+        categoria = row['category__name'] or 'Sem categoria'
+        total = row['total'] or Decimal('0')
+        receitas_por_categoria[categoria] = receitas_por_categoria.get(categoria, Decimal('0')) + total
+        receitas_por_mes[row['month'] - 1] += total
+    
+    receita_total = sum(receitas_por_mes, Decimal('0'))
     
     # Despesas dedutíveis (para controle)
-    despesas_dedutiveis = transactions.filter(
-        transaction_type='expense',
-        category__name__in=[
-            'Material de escritório',
-            'Telefone/Internet',
-            'Combustível',
-            'Manutenção de veículos',
-            'Aluguel do local de trabalho',
-            'Energia elétrica',
-            'Água',
-            'IPTU',
-            'Materiais e insumos',
-            'Equipamentos',
-            'Cursos e capacitação'
-        ]
-    ).aggregate(total=models.Sum('amount'))['total'] or Decimal('0')
+    despesas_dedutiveis = rollups.aggregate(
+        total=Sum('total_amount', filter=Q(
+            transaction_type='expense',
+            category__name__in=CATEGORIAS_DEDUTIVEIS
+        ))
+    )['total'] or Decimal('0')
+    
+    # Receita mensal contra o limite: acumulado do ano e limite proporcional
+    limite_mensal = LIMITE_MEI / 12
+    receita_mensal = []
+    acumulado = Decimal('0')
+    mes_excedido = None
+    for month, receita in enumerate(receitas_por_mes, start=1):
+        acumulado += receita
+        if mes_excedido is None and acumulado > LIMITE_MEI:
+            mes_excedido = month
+        receita_mensal.append({
+            'mes': month,
+            'nome': MESES[month - 1],
+            'receita': receita,
+            'acumulado': acumulado,
+            'limite_proporcional': limite_mensal * month,
+            'percentual_limite': acumulado / LIMITE_MEI * 100,
+        })
     
     # Informações importantes para DASN-SIMEI
-    dados_dasn = {
-        'empresa': company,
+    dados = {
         'ano_declaracao': year,
         'periodo': f"01/01/{year} a 31/12/{year}",
         'receita_bruta_total': receita_total,
         'receitas_por_categoria': receitas_por_categoria,
+        'receita_mensal': receita_mensal,
         'despesas_dedutiveis': despesas_dedutiveis,
-        'limite_mei': Decimal('81000.00'),  # Limite MEI para 2024/2025
-        'dentro_do_limite': receita_total <= Decimal('81000.00'),
-        'percentual_limite': (receita_total / Decimal('81000.00') * 100) if receita_total > 0 else 0,
-    }
-    
-    # Informações adicionais
-    dados_dasn.update({
+        'limite_mei': LIMITE_MEI,
+        'dentro_do_limite': receita_total <= LIMITE_MEI,
+        'percentual_limite': (receita_total / LIMITE_MEI * 100) if receita_total > 0 else 0,
         'possui_funcionario': False,  # MEI não pode ter funcionário CLT
         'receita_mensal_media': receita_total / 12,
         'alertas': []
-    })
+    }
     
     # Alertas importantes
-    if receita_total > Decimal('81000.00'):
-        dados_dasn['alertas'].append({
+    if receita_total > LIMITE_MEI:
+        dados['alertas'].append({
             'tipo': 'erro',
-            'mensagem': f'ATENÇÃO: Receita excedeu o limite MEI de R$ 81.000,00. Você pode precisar migrar para ME.'
+            'mensagem': f'ATENÇÃO: Receita excedeu o limite MEI de R$ 81.000,00 em {MESES[mes_excedido - 1]}. Você pode precisar migrar para ME.'
         })
-    elif receita_total > Decimal('64800.00'):  # 80% do limite
-        dados_dasn['alertas'].append({
+    elif receita_total > LIMITE_MEI * Decimal('0.8'):  # 80% do limite
+        dados['alertas'].append({
             'tipo': 'aviso',
             'mensagem': f'ATENÇÃO: Receita ultrapassou 80% do limite MEI. Monitore para não exceder R$ 81.000,00.'
         })
     
     if receita_total == 0:
-        dados_dasn['alertas'].append({
+        dados['alertas'].append({
             'tipo': 'info',
             'mensagem': 'Mesmo sem receita, você deve fazer a declaração DASN-SIMEI.'
         })
     
-    return create_dasn_simei_pdf(dados_dasn)
+    return dados
+
+
+def generate_dasn_simei_report(company, year=None):
+    """
+    Gera relatório DASN-SIMEI (Declaração Anual do Simples Nacional - MEI)
+    para auxiliar o MEI no preenchimento da declaração anual
+    """
+    if year is None:
+        year = timezone.now().year - 1  # Ano anterior por padrão
+    
+    dados = dasn_simei_data(company, year)
+    dados['empresa'] = company
+    return create_dasn_simei_pdf(dados)
+
+
+def _snapshot(company, year):
+    from .models import Report
+    
+    return Report.objects.filter(
+        company=company,
+        report_type='dasn_simei',
+        status='ready',
+        start_date=date(year, 1, 1)
+    ).exclude(file_pdf='').order_by('-created_at').first()
+
+
+def dasn_simei_pdf(company, year=None):
+    """
+    PDF da declaração, reaproveitado depois da primeira geração
+    
+    Anos encerrados são lidos do registro gravado (gerado e gravado na
+    primeira vez); o ano corrente vem do cache versionado da empresa.
+    
+    Returns:
+        arquivo aberto para leitura com o PDF
+    """
+    from core.caching import cached_payload
+    from .models import Report
+    
+    if year is None:
+        year = timezone.now().year - 1
+    
+    if year >= timezone.now().year:
+        # Ano em aberto: qualquer escrita troca a versão e invalida o cache
+        content = cached_payload(
+            company, 'dasn_simei', {'year': year, 'today': timezone.now().date()},
+            lambda: generate_dasn_simei_report(company, year).getvalue()
+        )
+        return BytesIO(content)
+    
+    snapshot = _snapshot(company, year)
+    if snapshot is not None:
+        return snapshot.file_pdf.open('rb')
+    
+    dados = dasn_simei_data(company, year)
+    buffer = create_dasn_simei_pdf(dict(dados, empresa=company))
+    
+    report = Report(
+        name=f'DASN-SIMEI {year}',
+        report_type='dasn_simei',
+        start_date=date(year, 1, 1),
+        end_date=date(year, 12, 31),
+        status='ready',
+        data=json.loads(json.dumps(dados, cls=DjangoJSONEncoder)),
+        company=company,
+        finished_at=timezone.now()
+    )
+    report.file_pdf.save(f'{report.uuid}.pdf', ContentFile(buffer.getvalue()), save=False)
+    report.save()
+    
+    buffer.seek(0)
+    return buffer
+
+
+def discard_snapshots(keys):
+    """
+    Descarta as declarações gravadas dos anos alterados
+    
+    Args:
+        keys: pares (company_id, ano) tocados por escritas de transações;
+            ano None descarta todos os anos da empresa (ex.: categoria
+            renomeada ou excluída)
+    """
+    from .models import Report
+    
+    current_year = timezone.now().year
+    condition = Q()
+    for company_id, year in keys:
+        if year is None:
+            condition |= Q(company_id=company_id)
+        elif year < current_year:
+            condition |= Q(company_id=company_id, start_date=date(year, 1, 1))
+    if not condition:
+        return
+    
+    for report in Report.objects.filter(condition, report_type='dasn_simei'):
+        report.delete_files()
+        report.delete()
 
 
 def create_dasn_simei_pdf(dados):
@@ -245,6 +375,47 @@ def create_dasn_simei_pdf(dados):
         elements.append(categoria_table)
         elements.append(Spacer(1, 20))
     
+    # Receita mensal contra o limite
+    if dados.get('receita_mensal'):
+        elements.append(Paragraph("RECEITA MENSAL E LIMITE MEI", heading_style))
+        
+        mensal_data = [['Mês', 'Receita', 'Acumulado', 'Limite Proporcional', '% do Limite']]
+        for mes in dados['receita_mensal']:
+            mensal_data.append([
+                mes['nome'],
+                f"R$ {mes['receita']:,.2f}",
+                f"R$ {mes['acumulado']:,.2f}",
+                f"R$ {mes['limite_proporcional']:,.2f}",
+                f"{mes['percentual_limite']:.1f}%"
+            ])
+        
+        mensal_style = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3b82f6')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f9fafb')]),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#e5e7eb')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 4),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+        ]
+        # Destaque nos meses em que o acumulado passou do limite proporcional
+        for row, mes in enumerate(dados['receita_mensal'], start=1):
+            if mes['acumulado'] > mes['limite_proporcional']:
+                mensal_style.append(('TEXTCOLOR', (2, row), (2, row), colors.red))
+        
+        mensal_table = Table(mensal_data, colWidths=[3*cm, 3.2*cm, 3.2*cm, 3.6*cm, 3*cm])
+        mensal_table.setStyle(TableStyle(mensal_style))
+        
+        elements.append(mensal_table)
+        elements.append(Spacer(1, 20))
+    
     # Alertas e observações
     if dados['alertas']:
         elements.append(Paragraph("ALERTAS E OBSERVAÇÕES", heading_style))
@@ -310,6 +481,3 @@ def create_dasn_simei_pdf(dados):
     buffer.seek(0)
     return buffer
 
-
-# Adicionar import necessário
-from django.db import models
\ No newline at end of file
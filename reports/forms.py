@@ -0,0 +1,29 @@
+from django import forms
+
+
+class ForecastForm(forms.Form):
+    """Parâmetros de uma previsão de fluxo de caixa"""
+    name = forms.CharField(
+        label='Nome',
+        max_length=200,
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Ex.: Fluxo de caixa do trimestre'
+        })
+    )
+    days = forms.IntegerField(
+        label='Horizonte (dias)',
+        min_value=7,
+        max_value=365,
+        initial=90,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    baseline_days = forms.IntegerField(
+        label='Histórico considerado (dias)',
+        min_value=30,
+        max_value=365,
+        initial=60,
+        help_text='Janela usada para a média das movimentações não recorrentes',
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
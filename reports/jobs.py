@@ -0,0 +1,122 @@
+"""
+Geração de relatórios em segundo plano
+
+Os relatórios entram na fila com status 'generating' e sem started_at. O
+comando process_reports reserva lotes da fila e renderiza cada relatório em
+um pool de processos, fora dos workers do gunicorn. Os arquivos vão para o
+storage padrão (MEDIA_ROOT) e expiram após REPORT_TTL_HOURS.
+"""
+import logging
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Report
+
+logger = logging.getLogger(__name__)
+
+
+def _builders():
+    from core.premium_exports import build_financial_report_excel, build_financial_report_pdf
+
+    return {
+        'pdf': (build_financial_report_pdf, 'pdf'),
+        'excel': (build_financial_report_excel, 'xlsx'),
+    }
+
+
+def init_worker():
+    """Inicializa o Django em cada processo do pool (necessário com spawn/forkserver)"""
+    import django
+
+    django.setup()
+
+
+def claim(batch_size):
+    """
+    Reserva um lote de relatórios na fila
+
+    Returns:
+        lista de pks reservados
+    """
+    with transaction.atomic():
+        pks = list(
+            Report.objects.select_for_update(skip_locked=True).filter(
+                status='generating',
+                started_at__isnull=True
+            ).order_by('created_at').values_list('pk', flat=True)[:batch_size]
+        )
+        Report.objects.filter(pk__in=pks).update(started_at=timezone.now())
+    return pks
+
+
+def render(report_pk):
+    """
+    Gera os arquivos de um relatório e marca como pronto
+
+    Executado nos processos do pool; retorna (pk, status) para o log do comando.
+    O resultado só é gravado se o relatório ainda estiver em geração: um
+    relatório que fail_stuck já encerrou não volta para 'ready'.
+    """
+    report = None
+    try:
+        report = Report.objects.select_related('company').get(pk=report_pk)
+        if report.status != 'generating':
+            return report.pk, report.status
+
+        builders = _builders()
+        for fmt in report.formats:
+            build, extension = builders[fmt]
+            # Arquivo temporário em vez de memória: o storage copia em blocos
+            with tempfile.TemporaryFile() as output:
+                build(report.company, report.start_date, report.end_date, output)
+                output.seek(0)
+                filename = f'{report.uuid}.{extension}'
+                getattr(report, Report.FILE_FIELDS[fmt]).save(filename, File(output), save=False)
+
+        result = {field: getattr(report, field).name for field in Report.FILE_FIELDS.values()}
+        result.update(
+            status='ready',
+            error_message='',
+            expires_at=timezone.now() + timedelta(hours=getattr(settings, 'REPORT_TTL_HOURS', 72))
+        )
+    except Exception as e:
+        logger.exception(f'Erro ao gerar o relatório {report_pk}')
+        if report is not None:
+            report.delete_files()
+        result = {'status': 'error', 'error_message': str(e)}
+
+    updated = Report.objects.filter(pk=report_pk, status='generating').update(
+        finished_at=timezone.now(), **result
+    )
+    if not updated:
+        # Encerrado por fail_stuck durante a geração: os arquivos não valem
+        if report is not None and result['status'] == 'ready':
+            report.delete_files()
+        return report_pk, Report.objects.filter(pk=report_pk).values_list('status', flat=True).first()
+    return report_pk, result['status']
+
+
+def fail(report_pks, message):
+    """Marca como erro os relatórios do lote que ainda estão em geração"""
+    return Report.objects.filter(pk__in=report_pks, status='generating').update(
+        status='error',
+        error_message=message,
+        finished_at=timezone.now()
+    )
+
+
+def fail_stuck(timeout):
+    """Marca como erro os relatórios iniciados há mais de timeout (worker interrompido)"""
+    return Report.objects.filter(
+        status='generating',
+        started_at__lt=timezone.now() - timeout
+    ).update(
+        status='error',
+        error_message='Tempo limite de geração excedido',
+        finished_at=timezone.now()
+    )
@@ -0,0 +1,70 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from reports.models import Forecast
+
+
+class Command(BaseCommand):
+    help = 'Calcula as previsões na fila (reports.Forecast) fora dos workers web'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Previsões reservadas por lote (padrão: 20)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Executa continuamente, verificando a fila a cada --interval segundos'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=15,
+            help='Segundos entre as verificações no modo --loop (padrão: 15)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            # Empresas sem previsão entram na fila; as prontas cujos dados
+            # mudaram voltam para ela
+            Forecast.enqueue_missing()
+            Forecast.requeue_stale()
+
+            computed = 0
+            while True:
+                batch = self._claim(options['batch_size'])
+                if not batch:
+                    break
+                for forecast in batch:
+                    computed += self._compute(forecast)
+
+            if computed:
+                self.stdout.write(self.style.SUCCESS(f'{computed} previsões calculadas.'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _claim(self, batch_size):
+        """Reserva um lote da fila; skip_locked permite vários workers em paralelo"""
+        with transaction.atomic():
+            batch = list(
+                Forecast.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                    status='pending',
+                    forecast_type='cash_flow'
+                ).select_related('company').order_by('created_at')[:batch_size]
+            )
+            Forecast.objects.filter(pk__in=[forecast.pk for forecast in batch]).update(status='running')
+        return batch
+
+    def _compute(self, forecast):
+        try:
+            forecast.compute()
+            return 1
+        except Exception as e:
+            Forecast.objects.filter(pk=forecast.pk).update(status='error', error_message=str(e))
+            self.stderr.write(f'Erro ao calcular a previsão "{forecast.name}": {e}')
+            return 0
@@ -0,0 +1,95 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from reports import jobs
+from reports.models import Report
+
+
+class Command(BaseCommand):
+    help = 'Gera os relatórios na fila em um pool de processos e remove os expirados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Processos de geração (padrão: REPORT_WORKERS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Relatórios reservados por lote (padrão: 10)'
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=30,
+            help='Minutos após os quais um relatório em geração é dado como falho (padrão: 30)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Executa continuamente, verificando a fila a cada --interval segundos'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=5,
+            help='Segundos entre as verificações no modo --loop (padrão: 5)'
+        )
+
+    def handle(self, *args, **options):
+        workers = options.get('workers') or getattr(settings, 'REPORT_WORKERS', 2)
+        timeout = timedelta(minutes=options['timeout'])
+
+        pool = self._pool(workers)
+        try:
+            while True:
+                removed = Report.cleanup_expired()
+                if removed:
+                    self.stdout.write(f'{removed} relatórios expirados removidos.')
+
+                failed = jobs.fail_stuck(timeout)
+                if failed:
+                    self.stderr.write(f'{failed} relatórios excederam o tempo limite.')
+
+                while True:
+                    pks = jobs.claim(options['batch_size'])
+                    if not pks:
+                        break
+                    try:
+                        self._render(pool, pks)
+                    except BrokenProcessPool as e:
+                        # Um processo filho morreu (ex.: falta de memória) e o
+                        # pool não aceita mais tarefas: encerrar o lote e recriar
+                        self.stderr.write(f'Pool de geração interrompido: {e}')
+                        jobs.fail(pks, 'Processo de geração interrompido')
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        pool = self._pool(workers)
+
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            pool.shutdown()
+
+    def _pool(self, workers):
+        # Conexões abertas não podem ser herdadas pelos processos filhos
+        connections.close_all()
+        return ProcessPoolExecutor(max_workers=workers, initializer=jobs.init_worker)
+
+    def _render(self, pool, pks):
+        connections.close_all()
+        futures = [pool.submit(jobs.render, pk) for pk in pks]
+        for future in as_completed(futures):
+            try:
+                pk, status = future.result()
+                self.stdout.write(f'Relatório {pk}: {status}')
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                self.stderr.write(f'Erro ao gerar relatório: {e}')
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-17 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('reports', '0002_alter_report_report_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecast',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Na fila'), ('running', 'Calculando'), ('ready', 'Pronta'), ('error', 'Erro')], default='pending', max_length=20, verbose_name='Status'),
+        ),
+        migrations.AddField(
+            model_name='forecast',
+            name='data_version',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Versão dos Dados'),
+        ),
+        migrations.AddField(
+            model_name='forecast',
+            name='computed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Calculada em'),
+        ),
+        migrations.AddField(
+            model_name='forecast',
+            name='error_message',
+            field=models.TextField(blank=True, verbose_name='Mensagem de Erro'),
+        ),
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['status', 'created_at'], name='reports_for_status_8ff694_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forecast',
+            index=models.Index(fields=['company', 'forecast_type'], name='reports_for_company_05c629_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.7 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_forecast_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='report',
+            name='report_type',
+            field=models.CharField(choices=[('financial', 'Relatório Financeiro'), ('cash_flow', 'Fluxo de Caixa'), ('income_statement', 'Demonstrativo de Resultado'), ('balance_sheet', 'Balanço Patrimonial'), ('category_analysis', 'Análise por Categoria'), ('trends', 'Análise de Tendências'), ('goals_progress', 'Progresso de Metas'), ('dasn_simei', 'DASN-SIMEI (Declaração Anual MEI)'), ('custom', 'Personalizado')], max_length=20, verbose_name='Tipo'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Concluído em'),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='error_message',
+            field=models.TextField(blank=True, verbose_name='Mensagem de Erro'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['status', 'created_at'], name='reports_rep_status_22ec20_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['expires_at'], name='reports_rep_expires_6eb760_idx'),
+        ),
+    ]
@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from accounts.models import Company
 from django.utils import timezone
+from datetime import timedelta
 import uuid
 
 User = get_user_model()
@@ -10,6 +11,7 @@ User = get_user_model()
 class Report(models.Model):
     """Modelo para relatórios personalizados"""
     REPORT_TYPES = [
+        ('financial', 'Relatório Financeiro'),
         ('cash_flow', 'Fluxo de Caixa'),
         ('income_statement', 'Demonstrativo de Resultado'),
         ('balance_sheet', 'Balanço Patrimonial'),
@@ -43,6 +45,11 @@ class Report(models.Model):
     file_pdf = models.FileField('Arquivo PDF', upload_to='reports/pdf/', blank=True, null=True)
     file_excel = models.FileField('Arquivo Excel', upload_to='reports/excel/', blank=True, null=True)
     
+    # Geração em segundo plano (comando process_reports)
+    started_at = models.DateTimeField('Iniciado em', null=True, blank=True)
+    finished_at = models.DateTimeField('Concluído em', null=True, blank=True)
+    error_message = models.TextField('Mensagem de Erro', blank=True)
+    
     # Relacionamentos
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='reports', verbose_name='Empresa')
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_reports', verbose_name='Criado por')
@@ -56,6 +63,16 @@ class Report(models.Model):
         verbose_name = 'Relatório'
         verbose_name_plural = 'Relatórios'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['expires_at']),
+        ]
+    
+    # Formatos de arquivo gerados e o campo de cada um
+    FILE_FIELDS = {
+        'pdf': 'file_pdf',
+        'excel': 'file_excel',
+    }
     
     def __str__(self):
         return f"{self.name} ({self.get_report_type_display()})"
@@ -63,6 +80,56 @@ class Report(models.Model):
     def is_expired(self):
         """Verifica se o relatório expirou"""
         return self.expires_at and timezone.now() > self.expires_at
+    
+    @property
+    def formats(self):
+        return [fmt for fmt in self.filters.get('formats', ['pdf']) if fmt in self.FILE_FIELDS]
+    
+    @property
+    def is_ready(self):
+        return self.status == 'ready' and not self.is_expired()
+    
+    def file_for(self, fmt):
+        """Arquivo gerado no formato ('pdf' ou 'excel'), ou None"""
+        field = self.FILE_FIELDS.get(fmt)
+        file = getattr(self, field) if field else None
+        return file if file else None
+    
+    @classmethod
+    def enqueue(cls, company, report_type, start_date, end_date, formats, created_by=None, name=None):
+        """Cria o relatório na fila de geração (status 'generating', sem started_at)"""
+        report = cls(
+            report_type=report_type,
+            start_date=start_date,
+            end_date=end_date,
+            filters={'formats': list(formats)},
+            company=company,
+            created_by=created_by
+        )
+        report.name = name or f'{report.get_report_type_display()} - {start_date:%d/%m/%Y} a {end_date:%d/%m/%Y}'
+        report.save()
+        return report
+    
+    def delete_files(self):
+        """Remove do storage os arquivos gerados"""
+        for field in self.FILE_FIELDS.values():
+            file = getattr(self, field)
+            if file:
+                file.delete(save=False)
+    
+    @classmethod
+    def cleanup_expired(cls):
+        """
+        Exclui os relatórios expirados e seus arquivos
+        
+        Returns:
+            número de relatórios excluídos
+        """
+        expired = list(cls.objects.filter(expires_at__lt=timezone.now()))
+        for report in expired:
+            report.delete_files()
+        cls.objects.filter(pk__in=[report.pk for report in expired]).delete()
+        return len(expired)
 
 
 class Dashboard(models.Model):
@@ -113,6 +180,13 @@ class Forecast(models.Model):
         ('yearly', 'Anual'),
     ]
     
+    STATUS_CHOICES = [
+        ('pending', 'Na fila'),
+        ('running', 'Calculando'),
+        ('ready', 'Pronta'),
+        ('error', 'Erro'),
+    ]
+    
     name = models.CharField('Nome', max_length=200)
     forecast_type = models.CharField('Tipo', max_length=20, choices=FORECAST_TYPES)
     period_type = models.CharField('Período', max_length=20, choices=PERIOD_TYPES)
@@ -126,6 +200,12 @@ class Forecast(models.Model):
     # Parâmetros do modelo
     model_parameters = models.JSONField('Parâmetros do Modelo', default=dict)
     
+    # Cálculo em segundo plano (comando compute_forecasts)
+    status = models.CharField('Status', max_length=20, choices=STATUS_CHOICES, default='pending')
+    data_version = models.CharField('Versão dos Dados', max_length=32, blank=True)
+    computed_at = models.DateTimeField('Calculada em', null=True, blank=True)
+    error_message = models.TextField('Mensagem de Erro', blank=True)
+    
     # Relacionamentos
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='forecasts', verbose_name='Empresa')
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='created_forecasts', verbose_name='Criado por')
@@ -139,9 +219,175 @@ class Forecast(models.Model):
         verbose_name = 'Previsão'
         verbose_name_plural = 'Previsões'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['company', 'forecast_type']),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.get_forecast_type_display()}"
+    
+    def _is_fresh_for(self, version):
+        # Também fica desatualizada na virada do dia (a série começa amanhã)
+        return (
+            self.status == 'ready'
+            and self.data_version == version
+            and self.computed_at is not None
+            and timezone.localdate(self.computed_at) == timezone.localdate()
+        )
+    
+    @property
+    def is_fresh(self):
+        """Pronta, calculada hoje e sobre a versão atual (no banco) dos dados da empresa"""
+        from core.models import CompanyDataVersion
+        
+        return self._is_fresh_for(CompanyDataVersion.current([self.company_id])[self.company_id])
+    
+    @property
+    def projection(self):
+        """Série gravada, com valores Decimal e datas (core.projection)"""
+        from core.projection import deserialize_projection
+        
+        return deserialize_projection(self.data) if self.data else None
+    
+    @classmethod
+    def _cash_flow_lookup(cls, company, days, baseline_days):
+        return cls.objects.filter(
+            company=company,
+            forecast_type='cash_flow',
+            is_active=True,
+            model_parameters__days=days,
+            model_parameters__baseline_days=baseline_days
+        ).order_by('-created_at')
+    
+    @classmethod
+    def _new_cash_flow(cls, company, days, baseline_days, created_by=None, name=None):
+        today = timezone.now().date()
+        return cls(
+            name=name or f'Fluxo de caixa - {days} dias',
+            forecast_type='cash_flow',
+            period_type='daily',
+            start_date=today + timedelta(days=1),
+            end_date=today + timedelta(days=days),
+            model_parameters={'days': days, 'baseline_days': baseline_days},
+            company=company,
+            created_by=created_by
+        )
+    
+    @classmethod
+    def request_cash_flow(cls, company, days=30, baseline_days=60, created_by=None, name=None):
+        """
+        Previsão de fluxo de caixa com os parâmetros informados
+        
+        Reaproveita uma previsão existente com os mesmos parâmetros; se ela
+        estiver desatualizada, volta para a fila. Sem previsão, cria uma nova
+        na fila. O cálculo é feito pelo comando compute_forecasts.
+        """
+        with transaction.atomic():
+            # Bloquear a empresa evita previsões repetidas em requisições simultâneas
+            list(Company.objects.select_for_update().filter(pk=company.pk).values_list('pk', flat=True))
+            forecast = cls._cash_flow_lookup(company, days, baseline_days).first()
+            if forecast is None:
+                forecast = cls._new_cash_flow(company, days, baseline_days, created_by, name)
+                forecast.save()
+                return forecast
+        
+        if forecast.status in ('ready', 'error') and not forecast.is_fresh:
+            forecast.requeue()
+        return forecast
+    
+    @classmethod
+    def cash_flow(cls, company, days=30, baseline_days=60):
+        """
+        Projeção de fluxo de caixa para leitura nas requisições
+        
+        Lê a previsão gravada (uma linha) quando ela está atualizada. Caso
+        contrário calcula a projeção sem gravá-la. A leitura não escreve
+        nada: criar e devolver previsões à fila é papel do comando
+        compute_forecasts (enqueue_missing e requeue_stale).
+        """
+        from core.projection import project_cash_flow
+        
+        forecast = cls._cash_flow_lookup(company, days, baseline_days).first()
+        if forecast is not None and forecast.is_fresh:
+            return forecast.projection
+        
+        return project_cash_flow(company, days=days, baseline_days=baseline_days)
+    
+    @classmethod
+    def enqueue_missing(cls, days=30, baseline_days=60):
+        """
+        Cria na fila a previsão de fluxo de caixa das empresas ativas sem ela
+        
+        Returns:
+            número de previsões criadas
+        """
+        existing = cls.objects.filter(
+            forecast_type='cash_flow',
+            is_active=True,
+            model_parameters__days=days,
+            model_parameters__baseline_days=baseline_days
+        ).values('company_id')
+        companies = Company.objects.filter(is_active=True).exclude(pk__in=existing)
+        return len(cls.objects.bulk_create([
+            cls._new_cash_flow(company, days, baseline_days) for company in companies
+        ]))
+    
+    @classmethod
+    def requeue_stale(cls):
+        """
+        Devolve para a fila as previsões prontas que ficaram desatualizadas
+        
+        Returns:
+            número de previsões devolvidas
+        """
+        from core.models import CompanyDataVersion
+        
+        ready = list(cls.objects.filter(
+            status='ready',
+            forecast_type='cash_flow',
+            is_active=True
+        ).only('pk', 'company_id', 'status', 'data_version', 'computed_at'))
+        versions = CompanyDataVersion.current({forecast.company_id for forecast in ready})
+        
+        stale = [forecast.pk for forecast in ready if not forecast._is_fresh_for(versions[forecast.company_id])]
+        return cls.objects.filter(pk__in=stale, status='ready').update(status='pending')
+    
+    def requeue(self):
+        """Devolve a previsão para a fila de cálculo"""
+        Forecast.objects.filter(pk=self.pk).exclude(status='running').update(status='pending')
+        self.status = 'pending'
+    
+    def compute(self):
+        """
+        Calcula a projeção, grava a série e marca a previsão como pronta
+        
+        A versão dos dados é lida antes do cálculo: escritas feitas durante
+        o cálculo deixam a previsão desatualizada, e ela é refeita depois.
+        
+        Returns:
+            a projeção calculada (core.projection.project_cash_flow)
+        """
+        from core.models import CompanyDataVersion
+        from core.projection import project_cash_flow, serialize_projection
+        
+        version = CompanyDataVersion.current([self.company_id])[self.company_id]
+        parameters = self.model_parameters or {}
+        projection = project_cash_flow(
+            self.company,
+            days=parameters.get('days', 30),
+            baseline_days=parameters.get('baseline_days', 60)
+        )
+        
+        self.data = serialize_projection(projection)
+        self.start_date = projection['dates'][0]
+        self.end_date = projection['dates'][-1]
+        self.status = 'ready'
+        self.data_version = version
+        self.computed_at = timezone.now()
+        self.error_message = ''
+        self.save()
+        return projection
 
 
 class Alert(models.Model):
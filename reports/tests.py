@@ -1,3 +1,37 @@
-from django.test import TestCase
+"""
+Testes das páginas de relatórios
+"""
+from datetime import date
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from accounts.models import Company, CompanyMember
+from .models import Report
+
+User = get_user_model()
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ReportListViewTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='relatorios', email='relatorios@example.com', password='senha-teste'
+        )
+        self.company = Company.objects.create(name='Empresa Teste', owner=self.user)
+        CompanyMember.objects.create(user=self.user, company=self.company, role='owner')
+        self.client.force_login(self.user)
+
+    def test_list_renders_generated_reports(self):
+        report = Report.objects.create(
+            name='Financeiro de Janeiro', report_type='financial', company=self.company,
+            start_date=date(2026, 1, 1), end_date=date(2026, 1, 31)
+        )
+
+        response = self.client.get(reverse('reports:list'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Relatórios Gerados')
+        self.assertContains(response, report.name)
+        self.assertContains(response, reverse('reports:detail', args=[report.uuid]))
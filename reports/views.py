@@ -1,6 +1,8 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
+from django.contrib import messages
+from django.http import JsonResponse, HttpResponse, FileResponse
+from django.urls import reverse
 from django.db.models import Sum, Q
 from django.utils import timezone
 from datetime import datetime, timedelta
@@ -9,54 +11,113 @@ import json
 from io import BytesIO
 
 from transactions.models import Transaction, Account, Category
-from .models import Alert
-from .dasn_simei import generate_dasn_simei_report
+from core.aggregations import income_expense_series, income_expense_totals, category_totals, category_tree_totals, tag_totals
+from core.premium_exports import report_filename, report_period
+from .models import Alert, Forecast, Report
+from .forms import ForecastForm
+from .dasn_simei import dasn_simei_pdf
 
 
 @login_required
 def report_list_view(request):
     """Lista de relatórios"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
-    return render(request, 'reports/list.html', {})
+    reports = Report.objects.filter(company=current_company).defer('data')[:20]
+    return render(request, 'reports/list.html', {'reports': reports})
+
+
+# Tipos do formulário de geração -> Report.report_type
+GENERATE_TYPES = {
+    'financial': 'financial',
+    'cash_flow': 'cash_flow',
+    'categories': 'category_analysis',
+    'accounts': 'custom',
+}
 
 
 @login_required
 def report_generate_view(request):
     """Gerar relatório"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
+    if request.method == 'POST':
+        start_date, end_date = report_period(request.POST)
+        fmt = request.POST.get('format', 'pdf')
+        
+        # Visualização online não gera arquivo
+        if fmt == 'online':
+            return redirect(f"{reverse('reports:financial')}?start_date={start_date:%Y-%m-%d}&end_date={end_date:%Y-%m-%d}")
+        
+        # Os arquivos são gerados pelo comando process_reports, fora da requisição
+        report = Report.enqueue(
+            current_company,
+            report_type=GENERATE_TYPES.get(request.POST.get('type'), 'financial'),
+            start_date=start_date,
+            end_date=end_date,
+            formats=[fmt] if fmt in Report.FILE_FIELDS else ['pdf'],
+            created_by=request.user,
+            name=request.POST.get('title') or None
+        )
+        return redirect('reports:detail', uuid=report.uuid)
+    
     return render(request, 'reports/generate.html', {})
 
 
 @login_required
 def report_detail_view(request, uuid):
-    """Detalhes do relatório"""
-    current_company = request.user.companies.first()
+    """Detalhes do relatório (também responde JSON para acompanhar a geração)"""
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
-    return render(request, 'reports/detail.html', {})
+    report = get_object_or_404(Report, uuid=uuid, company=current_company)
+    
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'status': report.status,
+            'ready': report.is_ready,
+            'error': report.error_message,
+            'downloads': {
+                fmt: f"{reverse('reports:download', kwargs={'uuid': report.uuid})}?file={fmt}"
+                for fmt in report.formats if report.is_ready and report.file_for(fmt)
+            },
+        })
+    
+    return render(request, 'reports/detail.html', {'report': report})
 
 
 @login_required
 def report_download_view(request, uuid):
     """Download do relatório"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
-    return redirect('reports:list')
+    report = get_object_or_404(Report, uuid=uuid, company=current_company)
+    fmt = request.GET.get('file') or (report.formats[0] if report.formats else 'pdf')
+    file = report.file_for(fmt)
+    
+    if not report.is_ready or file is None:
+        messages.warning(request, 'O relatório ainda não está disponível ou já expirou.')
+        return redirect('reports:detail', uuid=report.uuid)
+    
+    extension = 'xlsx' if fmt == 'excel' else 'pdf'
+    return FileResponse(
+        file.open('rb'),
+        as_attachment=True,
+        filename=report_filename(current_company, report.end_date, extension)
+    )
 
 
 @login_required
 def dashboard_list_view(request):
     """Lista de dashboards"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -66,7 +127,7 @@ def dashboard_list_view(request):
 @login_required
 def dashboard_create_view(request):
     """Criar dashboard"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -76,7 +137,7 @@ def dashboard_create_view(request):
 @login_required
 def dashboard_detail_view(request, pk):
     """Detalhes do dashboard"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -86,27 +147,54 @@ def dashboard_detail_view(request, pk):
 @login_required
 def forecast_list_view(request):
     """Lista de previsões"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
-    return render(request, 'reports/forecasts.html', {})
+    forecasts = list(Forecast.objects.filter(
+        company=current_company,
+        is_active=True
+    ).select_related('created_by'))
+    
+    return render(request, 'reports/forecasts.html', {
+        'forecasts': forecasts,
+        'has_pending': any(forecast.status in ('pending', 'running') for forecast in forecasts),
+    })
 
 
 @login_required
 def forecast_create_view(request):
     """Criar previsão"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
-    return render(request, 'reports/forecast_form.html', {})
+    if request.method == 'POST':
+        form = ForecastForm(request.POST)
+        if form.is_valid():
+            # Reaproveita a previsão com os mesmos parâmetros; o cálculo é feito pelo worker
+            forecast = Forecast.request_cash_flow(
+                current_company,
+                days=form.cleaned_data['days'],
+                baseline_days=form.cleaned_data['baseline_days'],
+                created_by=request.user,
+                name=form.cleaned_data['name'] or None
+            )
+            if forecast.status == 'ready':
+                messages.info(request, f'A previsão "{forecast.name}" já está atualizada.')
+            else:
+                messages.success(request, f'Previsão "{forecast.name}" enviada para cálculo.')
+            return redirect('reports:forecast_list')
+    else:
+        form = ForecastForm()
+    
+    return render(request, 'reports/forecast_form.html', {'form': form})
 
 
 @login_required
 def alert_list_view(request):
     """Lista de alertas dinâmicos baseados nos dados reais"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -145,7 +233,7 @@ def alert_list_view(request):
 @login_required
 def alert_acknowledge_view(request, pk):
     """Reconhecer alerta"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return JsonResponse({'success': False, 'error': 'Empresa não encontrada'})
     
@@ -171,7 +259,7 @@ def alert_acknowledge_view(request, pk):
 @login_required
 def alert_resolve_view(request, pk):
     """Resolver/Dispensar alerta"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return JsonResponse({'success': False, 'error': 'Empresa não encontrada'})
     
@@ -209,7 +297,7 @@ def alert_resolve_view(request, pk):
 @login_required
 def reports_overview(request):
     """Visão geral dos relatórios"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -226,7 +314,7 @@ def reports_overview(request):
 @login_required
 def financial_report(request):
     """Relatório financeiro detalhado"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -246,17 +334,16 @@ def financial_report(request):
         transaction_date__range=[start_date, end_date]
     )
     
-    # Receitas e despesas
-    income = transactions.filter(transaction_type='income').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-    expense = transactions.filter(transaction_type='expense').aggregate(total=Sum('amount'))['total'] or Decimal('0')
+    # Receitas e despesas (consolidados diários)
+    income, expense = income_expense_totals(current_company, start_date, end_date, status=None)
     
-    # Por categoria
+    # Por categoria (consolidados diários, uma consulta agrupada)
     category_data = {}
-    for transaction in transactions:
-        cat_name = transaction.category.name if transaction.category else 'Sem categoria'
-        if cat_name not in category_data:
-            category_data[cat_name] = {'income': Decimal('0'), 'expense': Decimal('0')}
-        category_data[cat_name][transaction.transaction_type] += transaction.amount
+    # ?group=parent soma as subcategorias na categoria pai
+    rollup_parents = request.GET.get('group') == 'parent'
+    for row in category_totals(current_company, start_date, end_date, status=None, rollup_parents=rollup_parents):
+        data = category_data.setdefault(row['name'], {'income': Decimal('0'), 'expense': Decimal('0')})
+        data[row['transaction_type']] += row['total']
     
     context = {
         'start_date': start_date,
@@ -266,6 +353,7 @@ def financial_report(request):
         'net': income - expense,
         'transactions': transactions.order_by('-transaction_date')[:50],  # Últimas 50
         'category_data': category_data,
+        'tag_data': tag_totals(current_company, start_date, end_date, status=None),
     }
     
     return render(request, 'reports/financial.html', context)
@@ -274,7 +362,7 @@ def financial_report(request):
 @login_required
 def cash_flow_report(request):
     """Relatório de fluxo de caixa"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -283,28 +371,14 @@ def cash_flow_report(request):
     start_date = end_date - timedelta(days=365)
     
     monthly_data = []
-    current_date = start_date.replace(day=1)
-    
-    while current_date <= end_date:
-        next_month = (current_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-        
-        transactions = Transaction.objects.filter(
-            company=current_company,
-            transaction_date__gte=current_date,
-            transaction_date__lt=next_month
-        )
-        
-        income = transactions.filter(transaction_type='income').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        expense = transactions.filter(transaction_type='expense').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        
+    for row in income_expense_series(current_company, start_date.replace(day=1), end_date,
+                                     grain='month', status=None):
         monthly_data.append({
-            'month': current_date.strftime('%b %Y'),
-            'income': float(income),
-            'expense': float(expense),
-            'net': float(income - expense)
+            'month': row['period'].strftime('%b %Y'),
+            'income': float(row['income']),
+            'expense': float(row['expense']),
+            'net': float(row['income'] - row['expense'])
         })
-        
-        current_date = next_month
     
     context = {
         'monthly_data': json.dumps(monthly_data),
@@ -317,7 +391,7 @@ def cash_flow_report(request):
 @login_required
 def api_chart_data(request):
     """API para dados dos gráficos"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return JsonResponse({'error': 'Empresa não encontrada'}, status=400)
     
@@ -329,27 +403,13 @@ def api_chart_data(request):
         start_date = end_date - timedelta(days=180)
         
         data = []
-        current_date = start_date.replace(day=1)
-        
-        while current_date <= end_date:
-            next_month = (current_date.replace(day=28) + timedelta(days=4)).replace(day=1)
-            
-            transactions = Transaction.objects.filter(
-                company=current_company,
-                transaction_date__gte=current_date,
-                transaction_date__lt=next_month
-            )
-            
-            income = transactions.filter(transaction_type='income').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            expense = transactions.filter(transaction_type='expense').aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            
+        for row in income_expense_series(current_company, start_date.replace(day=1), end_date,
+                                         grain='month', status=None):
             data.append({
-                'month': current_date.strftime('%b'),
-                'income': float(income),
-                'expense': float(expense)
+                'month': row['period'].strftime('%b'),
+                'income': float(row['income']),
+                'expense': float(row['expense'])
             })
-            
-            current_date = next_month
         
         return JsonResponse({'data': data})
     
@@ -359,27 +419,43 @@ def api_chart_data(request):
         start_date = end_date - timedelta(days=30)
         
         categories = {}
-        transactions = Transaction.objects.filter(
-            company=current_company,
-            transaction_date__range=[start_date, end_date]
+        rows = category_totals(
+            current_company, start_date, end_date, status=None,
+            transaction_types=('income', 'expense', 'transfer'),
+            rollup_parents=request.GET.get('group') == 'parent'
         )
-        
-        for transaction in transactions:
-            cat_name = transaction.category.name if transaction.category else 'Sem categoria'
-            if cat_name not in categories:
-                categories[cat_name] = 0
-            categories[cat_name] += float(transaction.amount)
+        for row in rows:
+            categories[row['name']] = categories.get(row['name'], 0) + float(row['total'])
         
         data = [{'name': k, 'value': v} for k, v in categories.items()]
         return JsonResponse({'data': data})
     
+    elif chart_type == 'category_tree':
+        # Despesas por categoria com o total de cada subárvore (último mês)
+        end_date = timezone.now().date()
+        start_date = end_date - timedelta(days=30)
+        
+        data = [
+            {
+                'id': category.pk,
+                'name': category.name,
+                'parent_id': category.parent_id,
+                'depth': category.depth,
+                'value': float(category.total),
+                'subtree_value': float(category.subtree_total),
+            }
+            for category in category_tree_totals(current_company, start_date, end_date, status=None)
+            if category.subtree_total
+        ]
+        return JsonResponse({'data': data})
+    
     return JsonResponse({'error': 'Tipo de gráfico inválido'}, status=400)
 
 
 @login_required
 def dasn_simei_report_view(request):
     """Gerar relatório DASN-SIMEI para MEI"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -394,15 +470,12 @@ def dasn_simei_report_view(request):
     if request.method == 'POST':
         # Gerar PDF do relatório
         try:
-            pdf_buffer = generate_dasn_simei_report(current_company, year)
+            # Anos encerrados são gravados na primeira geração e reaproveitados
+            pdf_file = dasn_simei_pdf(current_company, year)
             
-            # Preparar resposta HTTP
-            response = HttpResponse(pdf_buffer.getvalue(), content_type='application/pdf')
             year_label = year or (timezone.now().year - 1)
             filename = f'DASN-SIMEI_{current_company.name.replace(" ", "_")}_{year_label}.pdf'
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            
-            return response
+            return FileResponse(pdf_file, as_attachment=True, filename=filename, content_type='application/pdf')
             
         except Exception as e:
             # Em caso de erro, redirecionar com mensagem
@@ -145,10 +145,12 @@ class CategoryForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         if self.company:
-            # Filtrar categorias pai pela empresa
-            self.fields['parent'].queryset = Category.objects.filter(
-                company=self.company, parent__isnull=True, is_active=True
-            )
+            # Filtrar categorias pai pela empresa (qualquer nível, exceto a
+            # própria categoria e a sua subárvore)
+            parents = Category.objects.filter(company=self.company, is_active=True)
+            if self.instance.pk and self.instance.path:
+                parents = parents.exclude(path__startswith=self.instance.path)
+            self.fields['parent'].queryset = parents.select_related('parent')
         
         # Campos opcionais
         self.fields['description'].required = False
@@ -0,0 +1,52 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts.models import Company
+from transactions import recurrence
+
+
+class Command(BaseCommand):
+    help = 'Gera as ocorrências pendentes das transações recorrentes até o horizonte (executar diariamente)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='ID da empresa a processar (padrão: todas)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Horizonte em dias a partir de hoje (padrão: RECURRENCE_HORIZON_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Regras processadas por lote (padrão: 500)'
+        )
+
+    def handle(self, *args, **options):
+        company = None
+        if options.get('company'):
+            company = Company.objects.filter(pk=options['company']).first()
+            if not company:
+                self.stdout.write(self.style.ERROR(f"Empresa {options['company']} não encontrada."))
+                return
+
+        days = options.get('days') or recurrence.horizon_days()
+        until = timezone.now().date() + timedelta(days=days)
+        rules = recurrence.rules_queryset(company)
+
+        created = 0
+        last_pk = 0
+        while True:
+            batch = list(rules.filter(pk__gt=last_pk).order_by('pk')[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            created += recurrence.materialize(batch, until=until)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Sucesso! {created} ocorrências criadas até {until.strftime("%d/%m/%Y")}.')
+        )
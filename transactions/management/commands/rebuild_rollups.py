@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from accounts.models import Company
+from transactions.models import DailyRollup
+from core.caching import bump_data_version
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói os consolidados diários (DailyRollup) a partir das transações'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='ID da empresa a reconstruir (padrão: todas)'
+        )
+
+    def handle(self, *args, **options):
+        company_id = options.get('company')
+
+        if company_id:
+            companies = Company.objects.filter(pk=company_id)
+            if not companies.exists():
+                self.stdout.write(self.style.ERROR(f'Empresa {company_id} não encontrada.'))
+                return
+        else:
+            companies = Company.objects.all()
+
+        total_rows = 0
+        for company in companies:
+            rows = DailyRollup.rebuild(company)
+            bump_data_version(company.pk)
+            total_rows += rows
+            self.stdout.write(f'Empresa "{company.name}": {rows} linhas')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Sucesso! {total_rows} consolidados reconstruídos.')
+        )
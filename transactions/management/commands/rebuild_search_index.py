@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from accounts.models import Company
+from transactions.models import TransactionSearchToken
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de busca das transações (descrição, observações e tags)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='ID da empresa a reindexar (padrão: todas)'
+        )
+
+    def handle(self, *args, **options):
+        company_id = options.get('company')
+
+        if company_id:
+            companies = Company.objects.filter(pk=company_id)
+            if not companies.exists():
+                self.stdout.write(self.style.ERROR(f'Empresa {company_id} não encontrada.'))
+                return
+        else:
+            companies = Company.objects.all()
+
+        total_tokens = 0
+        for company in companies:
+            tokens = TransactionSearchToken.rebuild(company)
+            total_tokens += tokens
+            self.stdout.write(f'Empresa "{company.name}": {tokens} termos')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Sucesso! {total_tokens} termos indexados.')
+        )
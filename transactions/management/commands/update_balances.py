@@ -3,23 +3,49 @@ from transactions.models import Account
 
 
 class Command(BaseCommand):
-    help = 'Atualiza o saldo atual de todas as contas baseado no saldo inicial e transações'
+    help = 'Verifica e corrige o saldo atual de todas as contas recalculando a partir do saldo inicial e transações'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--company',
+            type=int,
+            help='ID da empresa cujas contas serão verificadas (padrão: todas)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Contas recalculadas por consulta (padrão: 1000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Apenas lista as divergências, sem gravar'
+        )
 
     def handle(self, *args, **options):
         accounts = Account.objects.filter(is_active=True)
-        updated_count = 0
+        if options.get('company'):
+            accounts = accounts.filter(company_id=options['company'])
+        
+        dry_run = options['dry_run']
+        differences = Account.reconcile_balances(
+            accounts,
+            chunk_size=options['chunk_size'],
+            dry_run=dry_run
+        )
         
-        for account in accounts:
-            old_balance = account.current_balance
-            account.update_balance()
-            new_balance = account.current_balance
-            
-            if old_balance != new_balance:
-                updated_count += 1
-                self.stdout.write(
-                    f'Conta "{account.name}": {old_balance} → {new_balance}'
-                )
+        for account_id, name, old_balance, new_balance in differences:
+            self.stdout.write(
+                f'Conta "{name}" (#{account_id}): {old_balance} → {new_balance} '
+                f'(diferença {new_balance - old_balance:+})'
+            )
         
-        self.stdout.write(
-            self.style.SUCCESS(f'Sucesso! {updated_count} contas atualizadas.')
-        )
\ No newline at end of file
+        if dry_run:
+            self.stdout.write(
+                self.style.WARNING(f'Simulação: {len(differences)} contas com saldo divergente.')
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Sucesso! {len(differences)} contas atualizadas.')
+            )
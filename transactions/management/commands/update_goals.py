@@ -6,30 +6,23 @@ class Command(BaseCommand):
     help = 'Atualiza o progresso de todas as metas baseado nas transações existentes'
 
     def handle(self, *args, **options):
-        goals = Goal.objects.filter(is_active=True)
+        goals = list(Goal.objects.filter(is_active=True))
         
-        self.stdout.write(f"Atualizando {goals.count()} metas...")
+        self.stdout.write(f"Atualizando {len(goals)} metas...")
         
-        updated_count = 0
-        for goal in goals:
-            old_amount = goal.current_amount
-            goal.update_progress()
-            new_amount = goal.current_amount
-            
-            if old_amount != new_amount:
-                updated_count += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"✅ Meta '{goal.name}': R$ {old_amount} → R$ {new_amount}"
-                    )
-                )
-            else:
-                self.stdout.write(
-                    f"Meta '{goal.name}': R$ {old_amount} (sem alteração)"
+        # Valores anteriores para o relatório; o cálculo é feito em lote
+        old_amounts = {goal.pk: goal.current_amount for goal in goals}
+        changed = Goal.bulk_update_progress(goals)
+        
+        for goal in changed:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ Meta '{goal.name}': R$ {old_amounts[goal.pk]} → R$ {goal.current_amount}"
                 )
+            )
         
         self.stdout.write(
             self.style.SUCCESS(
-                f"\n🎯 Atualização concluída! {updated_count} metas foram atualizadas."
+                f"\n🎯 Atualização concluída! {len(changed)} metas foram atualizadas."
             )
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,64 @@
+# Generated by Django 5.0.7 on 2026-10-17 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_rollups(apps, schema_editor):
+    """Preenche os consolidados diários a partir das transações existentes"""
+    Transaction = apps.get_model('transactions', 'Transaction')
+    DailyRollup = apps.get_model('transactions', 'DailyRollup')
+
+    rows = Transaction.objects.values(
+        'company_id', 'account_id', 'category_id', 'transaction_date', 'transaction_type', 'status'
+    ).annotate(
+        total=models.Sum('amount'),
+        count=models.Count('id'),
+    ).order_by()
+
+    DailyRollup.objects.bulk_create([
+        DailyRollup(
+            company_id=row['company_id'],
+            account_id=row['account_id'],
+            category_id=row['category_id'],
+            date=row['transaction_date'],
+            transaction_type=row['transaction_type'],
+            status=row['status'],
+            total_amount=row['total'] or 0,
+            transaction_count=row['count'],
+        )
+        for row in rows.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Data')),
+                ('transaction_type', models.CharField(choices=[('income', 'Receita'), ('expense', 'Despesa'), ('transfer', 'Transferência')], max_length=10, verbose_name='Tipo')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('completed', 'Concluído'), ('cancelled', 'Cancelado')], max_length=20, verbose_name='Status')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=17, verbose_name='Total')),
+                ('transaction_count', models.IntegerField(default=0, verbose_name='Quantidade')),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='transactions.account', verbose_name='Conta')),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_rollups', to='transactions.category', verbose_name='Categoria')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='accounts.company', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Consolidado Diário',
+                'verbose_name_plural': 'Consolidados Diários',
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['company', 'date'], name='transaction_company_91d4d4_idx'), models.Index(fields=['company', 'category', 'date'], name='transaction_company_10da75_idx')],
+                'unique_together': {('company', 'account', 'category', 'date', 'transaction_type', 'status')},
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0002_dailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['company', 'transaction_date', 'created_at', 'id'], name='transaction_company_f89aad_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.0.7 on 2026-10-17 18:40
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Cópia congelada do tokenizador da época desta migração: mudanças em
+# transactions.search não devem alterar o que ela grava
+TOKEN_MAX_LENGTH = 100
+
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'no',
+    'na', 'nos', 'nas', 'um', 'uma', 'para', 'por', 'com', 'ao', 'aos',
+}
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def word_tokens(text):
+    return {
+        word[:TOKEN_MAX_LENGTH]
+        for word in _WORD_RE.findall(normalize(text))
+        if word not in STOPWORDS
+    }
+
+
+def transaction_tokens(transaction):
+    words = (
+        word_tokens(transaction.description) |
+        word_tokens(transaction.notes) |
+        word_tokens((transaction.tags or '').replace(',', ' '))
+    )
+    return sorted(words)
+
+
+def build_search_index(apps, schema_editor):
+    """Indexa as transações existentes"""
+    Transaction = apps.get_model('transactions', 'Transaction')
+    TransactionSearchToken = apps.get_model('transactions', 'TransactionSearchToken')
+
+    batch = []
+    transactions = Transaction.objects.only('id', 'company_id', 'description', 'notes', 'tags').order_by()
+    for transaction in transactions.iterator(chunk_size=2000):
+        batch.extend(
+            TransactionSearchToken(transaction_id=transaction.pk, company_id=transaction.company_id, token=token)
+            for token in transaction_tokens(transaction)
+        )
+        if len(batch) >= 5000:
+            TransactionSearchToken.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        TransactionSearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transactions', '0003_transaction_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100, verbose_name='Termo')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_search_tokens', to='accounts.company', verbose_name='Empresa')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='transactions.transaction', verbose_name='Transação')),
+            ],
+            options={
+                'verbose_name': 'Termo de Busca',
+                'verbose_name_plural': 'Termos de Busca',
+                'indexes': [models.Index(fields=['company', 'token'], name='transaction_company_4a05ba_idx')],
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.0.7 on 2026-10-17 19:20
+
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Cópia congelada da normalização de tags da época desta migração: mudanças em
+# transactions.search não devem alterar o que ela grava
+TOKEN_MAX_LENGTH = 100
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def parse_tags(tags, max_length=TOKEN_MAX_LENGTH):
+    result = {}
+    for tag in (tags or '').split(','):
+        name = ' '.join(tag.split())[:max_length]
+        normalized = ' '.join(normalize(name).split())
+        if normalized and normalized not in result:
+            result[normalized] = name
+    return result
+
+
+def backfill_tags(apps, schema_editor):
+    """Cria as tags normalizadas e seus vínculos a partir do campo tags"""
+    Transaction = apps.get_model('transactions', 'Transaction')
+    Tag = apps.get_model('transactions', 'Tag')
+    TransactionTag = apps.get_model('transactions', 'TransactionTag')
+
+    tags = {}
+    links = []
+    transactions = Transaction.objects.exclude(tags='').only('id', 'company_id', 'tags').order_by()
+    for transaction in transactions.iterator(chunk_size=2000):
+        for normalized, name in parse_tags(transaction.tags).items():
+            key = (transaction.company_id, normalized)
+            if key not in tags:
+                tags[key] = Tag.objects.create(company_id=transaction.company_id, name=name, normalized=normalized)
+            links.append(TransactionTag(transaction_id=transaction.pk, tag_id=tags[key].pk))
+
+        if len(links) >= 5000:
+            TransactionTag.objects.bulk_create(links)
+            links = []
+
+    TransactionTag.objects.bulk_create(links)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transactions', '0004_transactionsearchtoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Nome')),
+                ('normalized', models.CharField(max_length=100, verbose_name='Nome Normalizado')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='accounts.company', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Tag',
+                'verbose_name_plural': 'Tags',
+                'ordering': ['name'],
+                'unique_together': {('company', 'normalized')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TransactionTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_tags', to='transactions.tag', verbose_name='Tag')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transaction_tags', to='transactions.transaction', verbose_name='Transação')),
+            ],
+            options={
+                'verbose_name': 'Tag da Transação',
+                'verbose_name_plural': 'Tags das Transações',
+                'indexes': [models.Index(fields=['tag', 'transaction'], name='transaction_tag_id_c8610f_idx')],
+                'unique_together': {('transaction', 'tag')},
+            },
+        ),
+        migrations.RunPython(backfill_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    """Preenche o caminho materializado das categorias, nível a nível a partir das raízes"""
+    Category = apps.get_model('transactions', 'Category')
+
+    paths = {}
+    level = list(Category.objects.filter(parent__isnull=True).values_list('pk', flat=True))
+    for pk in level:
+        paths[pk] = f'/{pk}/'
+
+    while level:
+        children = list(Category.objects.filter(parent_id__in=level).values_list('pk', 'parent_id'))
+        for pk, parent_id in children:
+            paths[pk] = f'{paths[parent_id]}{pk}/'
+        level = [pk for pk, _ in children]
+
+    categories = [Category(pk=pk, path=path) for pk, path in paths.items()]
+    Category.objects.bulk_update(categories, ['path'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0005_tag_transactiontag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255, verbose_name='Caminho'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['company', 'path'], name='transaction_company_7cf08b_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
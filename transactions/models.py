@@ -1,10 +1,13 @@
-from django.db import models
+from django.db import models, IntegrityError, transaction as db_transaction
+from django.db.models import F, ExpressionWrapper
 from django.contrib.auth import get_user_model
 from accounts.models import Company
 from decimal import Decimal
 from django.utils import timezone
 import uuid
 
+from . import recurrence as recurrences, search, side_effects
+
 User = get_user_model()
 
 
@@ -26,6 +29,10 @@ class Category(models.Model):
     company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='categories', verbose_name='Empresa')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subcategories', verbose_name='Categoria Pai')
     
+    # Caminho materializado na árvore ('/1/5/9/'): a subárvore de uma
+    # categoria são as linhas cujo caminho começa com o dela
+    path = models.CharField('Caminho', max_length=255, blank=True, editable=False)
+    
     # Metadata
     created_at = models.DateTimeField('Criado em', auto_now_add=True)
     updated_at = models.DateTimeField('Atualizado em', auto_now=True)
@@ -36,11 +43,65 @@ class Category(models.Model):
         verbose_name_plural = 'Categorias'
         ordering = ['name']
         unique_together = ['name', 'company']
+        indexes = [
+            models.Index(fields=['company', 'path']),
+        ]
     
     def __str__(self):
         if self.parent:
             return f"{self.parent.name} > {self.name}"
         return self.name
+    
+    @property
+    def depth(self):
+        """Nível na árvore (0 para categorias raiz)"""
+        return max(0, self.path.count('/') - 2)
+    
+    @property
+    def ancestor_ids(self):
+        """Ids das categorias acima desta, da raiz até o pai"""
+        return [int(pk) for pk in self.path.strip('/').split('/')[:-1] if pk]
+    
+    def descendants(self, include_self=False):
+        """Subárvore da categoria em uma consulta (pelo prefixo do caminho)"""
+        queryset = Category.objects.filter(company_id=self.company_id, path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+    
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        
+        # A categoria pai não pode estar na subárvore da própria categoria
+        if self.pk and self.parent_id and self.path and self.parent.path.startswith(self.path):
+            raise ValidationError({'parent': 'A categoria pai não pode ser a própria categoria nem uma subcategoria dela.'})
+    
+    def save(self, *args, **kwargs):
+        with db_transaction.atomic():
+            previous_path = None
+            if self.pk:
+                previous_path = Category.objects.filter(pk=self.pk).values_list('path', flat=True).first()
+            
+            super().save(*args, **kwargs)
+            
+            path = f'{self.parent.path if self.parent_id else "/"}{self.pk}/'
+            self.path = path
+            if previous_path != path:
+                Category.objects.filter(pk=self.pk).update(path=path)
+                if previous_path:
+                    self._move_subtree(previous_path, path)
+    
+    def _move_subtree(self, previous_path, path):
+        """Troca o prefixo do caminho de todas as subcategorias (uma atualização)"""
+        from django.db.models import Value
+        from django.db.models.functions import Concat, Substr
+        
+        Category.objects.filter(
+            company_id=self.company_id,
+            path__startswith=previous_path
+        ).exclude(pk=self.pk).update(
+            path=Concat(Value(path), Substr('path', len(previous_path) + 1))
+        )
 
 
 class Account(models.Model):
@@ -79,15 +140,131 @@ class Account(models.Model):
     
     def save(self, *args, **kwargs):
         """Salva a conta e inicializa o saldo atual se necessário"""
-        is_new = self.pk is None
-        super().save(*args, **kwargs)
+        if self._state.adding:
+            # Conta nova ainda não tem transações: o saldo atual é o inicial
+            if self.initial_balance != 0:
+                self.current_balance = self.initial_balance
+            super().save(*args, **kwargs)
+            return
+        
+        # O saldo atual é mantido por deltas atômicos das transações; não
+        # sobrescrever com o valor em memória, que pode estar desatualizado
+        if kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'current_balance'
+            ]
+        
+        with db_transaction.atomic():
+            previous = Account.objects.select_for_update().filter(
+                pk=self.pk
+            ).values('initial_balance', 'current_balance').first()
+            super().save(*args, **kwargs)
+            
+            # Alteração do saldo inicial desloca o saldo atual pela diferença
+            if previous and 'initial_balance' in kwargs['update_fields']:
+                difference = self.initial_balance - previous['initial_balance']
+                if difference:
+                    Account.apply_balance_deltas({self.pk: difference})
+                    self.current_balance = previous['current_balance'] + difference
+    
+    @classmethod
+    def apply_balance_deltas(cls, deltas):
+        """
+        Aplica variações de saldo às contas sem reagregar o histórico
+        
+        Args:
+            deltas: dict {account_id: Decimal} com a variação de cada conta
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if pk and delta}
+        if not deltas:
+            return
         
-        # Se é uma nova conta, inicializar o saldo atual com o saldo inicial
-        if is_new and self.initial_balance != 0:
-            self.update_balance()
+        with db_transaction.atomic():
+            # Bloquear as contas sempre na mesma ordem evita deadlocks
+            locked_ids = cls.objects.select_for_update().filter(
+                pk__in=deltas.keys()
+            ).order_by('pk').values_list('pk', flat=True)
+            
+            for pk in locked_ids:
+                cls.objects.filter(pk=pk).update(
+                    current_balance=F('current_balance') + deltas[pk]
+                )
+    
+    @classmethod
+    def reconcile_balances(cls, accounts, chunk_size=1000, dry_run=False):
+        """
+        Recalcula em lote o saldo de várias contas a partir das transações
+        
+        Cada lote de contas é lido em uma única consulta, com o saldo
+        esperado calculado por subconsultas agrupadas (receitas, despesas,
+        transferências enviadas e recebidas). Só as contas divergentes são
+        gravadas, com bulk_update.
+        
+        Args:
+            accounts: queryset das contas a verificar
+            chunk_size: contas por lote
+            dry_run: apenas relata as divergências, sem gravar
+        
+        Returns:
+            lista de (conta_id, nome, saldo_gravado, saldo_calculado) das divergentes
+        """
+        from django.db.models import Sum, OuterRef, Subquery, DecimalField
+        from django.db.models.functions import Coalesce
+        
+        def total(field, **filters):
+            subquery = Transaction.objects.filter(
+                status='completed', **{field: OuterRef('pk')}, **filters
+            ).order_by().values(field).annotate(total=Sum('amount')).values('total')
+            return Coalesce(
+                Subquery(subquery, output_field=DecimalField(max_digits=17, decimal_places=2)),
+                Decimal('0'),
+                output_field=DecimalField(max_digits=17, decimal_places=2)
+            )
+        
+        expected = (
+            F('initial_balance')
+            + total('account', transaction_type='income')
+            - total('account', transaction_type='expense')
+            - total('account', transaction_type='transfer')
+            + total('transfer_to_account', transaction_type='transfer')
+        )
+        
+        account_ids = list(accounts.order_by('pk').values_list('pk', flat=True))
+        differences = []
+        
+        for offset in range(0, len(account_ids), chunk_size):
+            chunk_ids = account_ids[offset:offset + chunk_size]
+            
+            with db_transaction.atomic():
+                # O bloqueio impede que deltas concorrentes sejam sobrescritos
+                rows = cls.objects.filter(pk__in=chunk_ids).order_by('pk')
+                if not dry_run:
+                    rows = rows.select_for_update()
+                rows = rows.annotate(
+                    expected_balance=ExpressionWrapper(
+                        expected, output_field=DecimalField(max_digits=17, decimal_places=2)
+                    )
+                ).values_list('pk', 'name', 'current_balance', 'expected_balance')
+                
+                changed = []
+                for pk, name, current_balance, expected_balance in rows:
+                    if current_balance != expected_balance:
+                        differences.append((pk, name, current_balance, expected_balance))
+                        changed.append(cls(pk=pk, current_balance=expected_balance))
+                
+                if changed and not dry_run:
+                    cls.objects.bulk_update(changed, ['current_balance'], batch_size=chunk_size)
+        
+        return differences
     
     def update_balance(self):
-        """Atualiza o saldo baseado nas transações"""
+        """
+        Recalcula o saldo a partir de todo o histórico de transações
+        
+        Usado como verificação (comando update_balances); o caminho normal
+        de escrita aplica apenas deltas via apply_balance_deltas.
+        """
         from django.db.models import Sum, Q
         
         # Receitas (apenas receitas reais, sem transferências)
@@ -186,6 +363,8 @@ class Transaction(models.Model):
         ordering = ['-transaction_date', '-created_at']
         indexes = [
             models.Index(fields=['company', 'transaction_date']),
+            # Ordem da listagem paginada por cursor (transactions.pagination)
+            models.Index(fields=['company', 'transaction_date', 'created_at', 'id']),
             models.Index(fields=['account', 'status']),
             models.Index(fields=['category', 'transaction_type']),
         ]
@@ -220,51 +399,438 @@ class Transaction(models.Model):
         symbol = "+" if amount >= 0 else "-"
         return f"{symbol}R$ {abs(amount)} - {self.description}"
     
+    # Campos que determinam o efeito da transação nos saldos
+    BALANCE_FIELDS = ('account_id', 'transfer_to_account_id', 'transaction_type', 'status', 'amount')
+    
+    # Campos da regra de recorrência que, alterados, refazem as ocorrências futuras
+    SCHEDULE_FIELDS = (
+        'amount', 'transaction_date', 'recurrence', 'recurrence_end_date', 'account_id',
+        'transfer_to_account_id', 'category_id', 'transaction_type', 'description',
+    )
+    
+    # Campos indexados pela busca e pelas tags normalizadas
+    SEARCH_FIELDS = ('description', 'notes', 'tags')
+    
+    # Campos lidos antes de cada escrita para calcular seus efeitos colaterais
+    STATE_FIELDS = BALANCE_FIELDS + (
+        'company_id', 'category_id', 'transaction_date', 'recurrence', 'recurrence_end_date',
+    ) + SEARCH_FIELDS
+    
+    @staticmethod
+    def balance_effects(state):
+        """Retorna {account_id: valor} com o efeito de um estado da transação nos saldos"""
+        effects = {}
+        if not state or state['status'] != 'completed':
+            return effects
+        
+        amount = state['amount']
+        account_id = state['account_id']
+        
+        if state['transaction_type'] == 'income':
+            effects[account_id] = amount
+        elif state['transaction_type'] == 'expense':
+            effects[account_id] = -amount
+        elif state['transaction_type'] == 'transfer':
+            effects[account_id] = -amount
+            to_account_id = state['transfer_to_account_id']
+            if to_account_id:
+                effects[to_account_id] = effects.get(to_account_id, Decimal('0')) + amount
+        
+        return effects
+    
+    @staticmethod
+    def _changed(previous, current, fields):
+        """Indica se a escrita é nova ou alterou algum dos campos"""
+        return previous is None or any(previous[field] != current[field] for field in fields)
+    
+    def _tracked_state(self):
+        """Estado atual (em memória) dos campos que afetam saldos e agregados"""
+        return {field: getattr(self, field) for field in self.STATE_FIELDS}
+    
+    def _locked_previous_state(self):
+        """Lê e bloqueia o estado gravado da transação antes de alterá-la"""
+        if self._state.adding or self.pk is None:
+            return None
+        return Transaction.objects.select_for_update().filter(
+            pk=self.pk
+        ).values(*self.STATE_FIELDS).first()
+    
+    def _apply_balance_change(self, previous, current):
+        """Aplica aos saldos a diferença entre o estado anterior e o novo"""
+        deltas = {}
+        for account_id, amount in self.balance_effects(current).items():
+            deltas[account_id] = deltas.get(account_id, Decimal('0')) + amount
+        for account_id, amount in self.balance_effects(previous).items():
+            deltas[account_id] = deltas.get(account_id, Decimal('0')) - amount
+        
+        Account.apply_balance_deltas(deltas)
+        
+        # Manter coerentes as instâncias de conta já carregadas
+        seen = set()
+        for field_name in ('account', 'transfer_to_account'):
+            field = self._meta.get_field(field_name)
+            if not field.is_cached(self):
+                continue
+            account = field.get_cached_value(self)
+            if account is not None and id(account) not in seen and deltas.get(account.pk):
+                account.current_balance += deltas[account.pk]
+                seen.add(id(account))
+    
     def save(self, *args, **kwargs):
         # Controle de criação para evitar loops infinitos
         creating = kwargs.pop('creating', False)
-        is_new = self.pk is None
         
         # Atualizar status para concluído se a data de pagamento foi definida
         if self.paid_date and self.status == 'pending':
             self.status = 'completed'
         
-        # Salvar primeiro a transação principal
-        super().save(*args, **kwargs)
-        
-        # Para transferências, não criar transações espelho - apenas atualizar saldos
-        # Atualizar saldo das contas envolvidas
-        if not creating:
-            if hasattr(self, 'account') and self.account:
-                self.account.update_balance()
-            if hasattr(self, 'transfer_to_account') and self.transfer_to_account:
-                self.transfer_to_account.update_balance()
-        
-        # Atualizar progresso das metas relacionadas à categoria desta transação
-        if self.category and self.status == 'completed' and not creating:
-            from .models import Goal
-            related_goals = Goal.objects.filter(
-                company=self.company,
-                category=self.category,
-                is_active=True
-            )
-            for goal in related_goals:
-                goal.update_progress()
+        with db_transaction.atomic():
+            previous = self._locked_previous_state()
+            
+            # Salvar primeiro a transação principal
+            super().save(*args, **kwargs)
+            current = self._tracked_state()
+            
+            # Atualizar saldos das contas envolvidas apenas pela diferença
+            if not creating:
+                self._apply_balance_change(previous, current)
+                DailyRollup.apply_change(previous, current)
+                
+                # Metas e orçamentos são recalculados uma vez no commit
+                side_effects.transaction_changed(previous, current)
+            
+            # Índice de busca e tags normalizadas só mudam com descrição,
+            # observações ou tags (edições de status não reindexam)
+            if self._changed(previous, current, self.SEARCH_FIELDS):
+                TransactionSearchToken.index_transaction(self)
+            if self._changed(previous, current, ('tags',)):
+                TransactionTag.sync_transaction(self)
+            
+            # Regras de recorrência: gerar as ocorrências futuras, ou refazê-las
+            # quando a edição muda o agendamento (mudar só o status não muda)
+            if self.parent_transaction_id is None:
+                if previous is None:
+                    if self.recurrence != 'none':
+                        recurrences.materialize([self])
+                elif previous['recurrence'] != 'none' or self.recurrence != 'none':
+                    if self._changed(previous, current, self.SCHEDULE_FIELDS):
+                        recurrences.reschedule(self)
     
     def delete(self, *args, **kwargs):
         """Override do método delete para atualizar saldos das contas"""
-        # Guardar referências das contas antes de deletar
-        account = self.account
-        transfer_to_account = self.transfer_to_account if hasattr(self, 'transfer_to_account') else None
-        
-        # Deletar a transação
-        super().delete(*args, **kwargs)
-        
-        # Atualizar saldos das contas envolvidas
-        if account:
-            account.update_balance()
-        if transfer_to_account:
-            transfer_to_account.update_balance()
+        with db_transaction.atomic():
+            # O estorno dos saldos é feito no sinal post_delete (que também
+            # cobre exclusões em cascata); garantir que ele use o estado gravado
+            previous = self._locked_previous_state()
+            if previous:
+                for field, value in previous.items():
+                    setattr(self, field, value)
+            
+            return super().delete(*args, **kwargs)
+
+
+class DailyRollup(models.Model):
+    """
+    Totais diários materializados das transações
+
+    Uma linha por (empresa, conta, categoria, data, tipo, status), mantida
+    por deltas a cada escrita de transação. As análises agregam estas
+    linhas em vez de varrer a tabela de transações.
+    """
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='daily_rollups', verbose_name='Empresa')
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_rollups', verbose_name='Conta')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_rollups', verbose_name='Categoria')
+    date = models.DateField('Data')
+    transaction_type = models.CharField('Tipo', max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    status = models.CharField('Status', max_length=20, choices=Transaction.STATUS_CHOICES)
+
+    total_amount = models.DecimalField('Total', max_digits=17, decimal_places=2, default=0)
+    transaction_count = models.IntegerField('Quantidade', default=0)
+
+    # Chave de agrupamento, na mesma ordem dos campos acima
+    KEY_FIELDS = ('company_id', 'account_id', 'category_id', 'date', 'transaction_type', 'status')
+
+    class Meta:
+        verbose_name = 'Consolidado Diário'
+        verbose_name_plural = 'Consolidados Diários'
+        ordering = ['-date']
+        unique_together = ['company', 'account', 'category', 'date', 'transaction_type', 'status']
+        indexes = [
+            models.Index(fields=['company', 'date']),
+            models.Index(fields=['company', 'category', 'date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.get_transaction_type_display()} - R$ {self.total_amount}"
+
+    @classmethod
+    def key_for(cls, state):
+        """Retorna a chave do consolidado para um estado de transação"""
+        return (
+            state['company_id'],
+            state['account_id'],
+            state['category_id'],
+            state['transaction_date'],
+            state['transaction_type'],
+            state['status'],
+        )
+
+    @classmethod
+    def apply_change(cls, previous, current):
+        """
+        Move o valor da transação do consolidado antigo para o novo
+
+        Args:
+            previous: estado gravado antes da escrita (None se nova)
+            current: estado após a escrita (None se excluída)
+        """
+        deltas = {}
+        for state, sign in ((previous, -1), (current, 1)):
+            if not state:
+                continue
+            key = cls.key_for(state)
+            amount, count = deltas.get(key, (Decimal('0'), 0))
+            deltas[key] = (amount + sign * state['amount'], count + sign)
+
+        for key, (amount, count) in deltas.items():
+            if amount or count:
+                cls._apply_delta(key, amount, count)
+
+    @classmethod
+    def apply_many(cls, states):
+        """
+        Soma aos consolidados vários estados novos (ex.: criações em lote)
+
+        Estados com a mesma chave são acumulados e aplicados uma única vez.
+        """
+        deltas = {}
+        for state in states:
+            key = cls.key_for(state)
+            amount, count = deltas.get(key, (Decimal('0'), 0))
+            deltas[key] = (amount + state['amount'], count + 1)
+
+        for key, (amount, count) in deltas.items():
+            cls._apply_delta(key, amount, count)
+
+    @classmethod
+    def _apply_delta(cls, key, amount, count):
+        lookup = dict(zip(cls.KEY_FIELDS, key))
+
+        with db_transaction.atomic():
+            # Categorias excluídas viram NULL e podem deixar linhas repetidas
+            # na mesma chave; basta acumular na primeira
+            row_pk = cls.objects.select_for_update().filter(
+                **lookup
+            ).order_by('pk').values_list('pk', flat=True).first()
+
+            if row_pk is not None:
+                cls.objects.filter(pk=row_pk).update(
+                    total_amount=F('total_amount') + amount,
+                    transaction_count=F('transaction_count') + count,
+                )
+                if count < 0:
+                    cls.objects.filter(pk=row_pk, transaction_count__lte=0).delete()
+            elif count > 0:
+                # Remoções sem linha vêm de exclusões em cascata que já
+                # apagaram o consolidado junto com a conta ou a empresa
+                try:
+                    with db_transaction.atomic():
+                        cls.objects.create(total_amount=amount, transaction_count=count, **lookup)
+                except IntegrityError:
+                    # Outra escrita criou a linha primeiro
+                    cls.objects.filter(**lookup).update(
+                        total_amount=F('total_amount') + amount,
+                        transaction_count=F('transaction_count') + count,
+                    )
+
+    @classmethod
+    def rebuild(cls, company=None):
+        """
+        Reconstrói os consolidados a partir das transações
+
+        Args:
+            company: Empresa a reconstruir (None para todas)
+
+        Returns:
+            número de linhas criadas
+        """
+        from django.db.models import Sum, Count
+
+        transactions = Transaction.objects.all()
+        rollups = cls.objects.all()
+        if company is not None:
+            transactions = transactions.filter(company=company)
+            rollups = rollups.filter(company=company)
+
+        rows = transactions.values(
+            'company_id', 'account_id', 'category_id', 'transaction_date', 'transaction_type', 'status'
+        ).annotate(
+            total=Sum('amount'),
+            count=Count('id'),
+        ).order_by()
+
+        with db_transaction.atomic():
+            rollups.delete()
+            created = cls.objects.bulk_create([
+                cls(
+                    company_id=row['company_id'],
+                    account_id=row['account_id'],
+                    category_id=row['category_id'],
+                    date=row['transaction_date'],
+                    transaction_type=row['transaction_type'],
+                    status=row['status'],
+                    total_amount=row['total'] or Decimal('0'),
+                    transaction_count=row['count'],
+                )
+                for row in rows.iterator()
+            ], batch_size=1000)
+
+        return len(created)
+
+
+class TransactionSearchToken(models.Model):
+    """
+    Índice de busca das transações
+
+    Uma linha por termo normalizado (sem acentos, minúsculo) da descrição,
+    das observações ou das tags, regravada a cada escrita da transação.
+    Consultado por transactions.search.search_transactions.
+    """
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='search_tokens', verbose_name='Transação')
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='transaction_search_tokens', verbose_name='Empresa')
+    token = models.CharField('Termo', max_length=100)
+
+    class Meta:
+        verbose_name = 'Termo de Busca'
+        verbose_name_plural = 'Termos de Busca'
+        indexes = [
+            models.Index(fields=['company', 'token']),
+        ]
+
+    def __str__(self):
+        return self.token
+
+    @classmethod
+    def _build(cls, transaction):
+        return [
+            cls(transaction_id=transaction.pk, company_id=transaction.company_id, token=token)
+            for token in search.transaction_tokens(transaction)
+        ]
+
+    @classmethod
+    def index_transaction(cls, transaction):
+        """Regrava os termos de uma transação"""
+        cls.objects.filter(transaction_id=transaction.pk).delete()
+        cls.objects.bulk_create(cls._build(transaction))
+
+    @classmethod
+    def rebuild(cls, company=None):
+        """
+        Reconstrói o índice a partir das transações
+
+        Returns:
+            quantidade de termos gravados
+        """
+        transactions = Transaction.objects.only(
+            'id', 'company_id', 'description', 'notes', 'tags'
+        ).order_by()
+        tokens = cls.objects.all()
+        if company is not None:
+            transactions = transactions.filter(company=company)
+            tokens = tokens.filter(company=company)
+
+        created = 0
+        with db_transaction.atomic():
+            tokens.delete()
+            batch = []
+            for transaction in transactions.iterator(chunk_size=2000):
+                batch.extend(cls._build(transaction))
+                if len(batch) >= 5000:
+                    created += len(cls.objects.bulk_create(batch))
+                    batch = []
+            if batch:
+                created += len(cls.objects.bulk_create(batch))
+
+        return created
+
+
+class Tag(models.Model):
+    """Tag de transação, única por empresa pelo nome normalizado"""
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='tags', verbose_name='Empresa')
+    name = models.CharField('Nome', max_length=100)
+    normalized = models.CharField('Nome Normalizado', max_length=100)
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Tag'
+        verbose_name_plural = 'Tags'
+        ordering = ['name']
+        unique_together = ['company', 'normalized']
+
+    def __str__(self):
+        return self.name
+
+    @classmethod
+    def for_names(cls, company_id, names):
+        """
+        Tags da empresa para os nomes informados, criando as que faltam
+
+        Args:
+            names: dict nome normalizado -> nome exibido (search.parse_tags)
+
+        Returns:
+            dict nome normalizado -> Tag
+        """
+        if not names:
+            return {}
+        existing = {
+            tag.normalized: tag
+            for tag in cls.objects.filter(company_id=company_id, normalized__in=names)
+        }
+        missing = [normalized for normalized in names if normalized not in existing]
+        if missing:
+            # ignore_conflicts cobre a criação concorrente da mesma tag
+            cls.objects.bulk_create([
+                cls(company_id=company_id, name=names[normalized], normalized=normalized)
+                for normalized in missing
+            ], ignore_conflicts=True)
+            existing.update({
+                tag.normalized: tag
+                for tag in cls.objects.filter(company_id=company_id, normalized__in=missing)
+            })
+        return existing
+
+
+class TransactionTag(models.Model):
+    """Associação entre transação e tag"""
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='transaction_tags', verbose_name='Transação')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='transaction_tags', verbose_name='Tag')
+
+    class Meta:
+        verbose_name = 'Tag da Transação'
+        verbose_name_plural = 'Tags das Transações'
+        unique_together = ['transaction', 'tag']
+        indexes = [
+            models.Index(fields=['tag', 'transaction']),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction} - {self.tag}"
+
+    @classmethod
+    def sync_transaction(cls, transaction):
+        """Faz as associações da transação refletirem o campo tags"""
+        tags = Tag.for_names(transaction.company_id, search.parse_tags(transaction.tags))
+        tag_ids = {tag.pk for tag in tags.values()}
+
+        links = cls.objects.filter(transaction_id=transaction.pk)
+        links.exclude(tag_id__in=tag_ids).delete()
+        if tag_ids:
+            current = set(links.values_list('tag_id', flat=True))
+            cls.objects.bulk_create([
+                cls(transaction_id=transaction.pk, tag_id=tag_id)
+                for tag_id in tag_ids - current
+            ], ignore_conflicts=True)
 
 
 class Goal(models.Model):
@@ -318,99 +884,92 @@ class Goal(models.Model):
         """Calcula quantos dias restam para a meta"""
         return (self.target_date - timezone.now().date()).days
     
+    @property
+    def progress_types(self):
+        """Tipos de transação somados no progresso da meta"""
+        if self.goal_type in ['savings', 'income_increase']:
+            # Poupança e aumento de receita somam receitas da categoria
+            return ['income']
+        if self.goal_type == 'expense_reduction':
+            # Redução de gastos soma despesas da categoria
+            return ['expense']
+        # Outras metas (custom, debt_payment) somam todas as transações da categoria
+        return ['income', 'expense']
+    
+    @classmethod
+    def progress_totals(cls, windows, chunk_size=100):
+        """
+        Soma o progresso de várias metas com agregação condicional
+        
+        Cada lote de metas vira uma única consulta sobre os consolidados
+        diários, com uma soma filtrada pela categoria e período de cada meta.
+        
+        Args:
+            windows: lista de (meta, data_inicial, data_final)
+            chunk_size: metas por consulta
+        
+        Returns:
+            lista de Decimal na mesma ordem de windows
+        """
+        from django.db.models import Sum, Q
+        
+        totals = [Decimal('0')] * len(windows)
+        indexed = [(index, window) for index, window in enumerate(windows) if window[0].category_id]
+        
+        for offset in range(0, len(indexed), chunk_size):
+            chunk = indexed[offset:offset + chunk_size]
+            aggregates = {
+                f'goal_{index}': Sum('total_amount', filter=Q(
+                    company_id=goal.company_id,
+                    category_id=goal.category_id,
+                    transaction_type__in=goal.progress_types,
+                    date__range=[start_date, end_date],
+                ))
+                for index, (goal, start_date, end_date) in chunk
+            }
+            result = DailyRollup.objects.filter(
+                status='completed',
+                category_id__in={goal.category_id for _, (goal, _, _) in chunk}
+            ).aggregate(**aggregates)
+            
+            for index, _ in chunk:
+                totals[index] = result[f'goal_{index}'] or Decimal('0')
+        
+        return totals
+    
+    @classmethod
+    def bulk_update_progress(cls, goals):
+        """
+        Atualiza o progresso de várias metas com poucas consultas
+        
+        O período de cada meta vai da data inicial até hoje ou a data alvo,
+        o que for menor. Apenas as metas alteradas são gravadas.
+        
+        Returns:
+            lista das metas cujo progresso mudou
+        """
+        goals = [goal for goal in goals if goal.category_id]
+        today = timezone.now().date()
+        totals = cls.progress_totals([
+            (goal, goal.start_date, min(today, goal.target_date)) for goal in goals
+        ])
+        
+        changed = []
+        for goal, total in zip(goals, totals):
+            # A meta alcançada continua alcançada mesmo que o total caia
+            is_achieved = goal.is_achieved or total >= goal.target_amount
+            if total != goal.current_amount or is_achieved != goal.is_achieved:
+                goal.current_amount = total
+                goal.is_achieved = is_achieved
+                changed.append(goal)
+        
+        cls.objects.bulk_update(changed, ['current_amount', 'is_achieved'], batch_size=500)
+        return changed
+    
     def update_progress(self):
         """Atualiza o progresso baseado nas transações relacionadas no período da meta"""
-        if self.category:
-            from django.db.models import Sum
-            from django.utils import timezone
-            
-            # Definir o período da meta (da data inicial até hoje ou data final, o que for menor)
-            end_date = min(timezone.now().date(), self.target_date)
-            
-            if self.goal_type in ['savings', 'income_increase']:
-                # Para metas de poupança e aumento de receita, somar receitas da categoria
-                total = self.category.transactions.filter(
-                    transaction_type='income',
-                    status='completed',
-                    transaction_date__gte=self.start_date,
-                    transaction_date__lte=end_date,
-                    company=self.company
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            elif self.goal_type == 'expense_reduction':
-                # Para metas de redução de gastos, somar despesas da categoria
-                total = self.category.transactions.filter(
-                    transaction_type='expense',
-                    status='completed',
-                    transaction_date__gte=self.start_date,
-                    transaction_date__lte=end_date,
-                    company=self.company
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            else:
-                # Para outras metas (custom, debt_payment), somar todas as transações da categoria
-                income = self.category.transactions.filter(
-                    transaction_type='income',
-                    status='completed',
-                    transaction_date__gte=self.start_date,
-                    transaction_date__lte=end_date,
-                    company=self.company
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-                
-                expenses = self.category.transactions.filter(
-                    transaction_type='expense',
-                    status='completed',
-                    transaction_date__gte=self.start_date,
-                    transaction_date__lte=end_date,
-                    company=self.company
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-                
-                total = income + expenses
-            
-            self.current_amount = total
-            
-            # Verificar se a meta foi alcançada
-            if self.current_amount >= self.target_amount:
-                self.is_achieved = True
-            
-            self.save(update_fields=['current_amount', 'is_achieved'])
+        Goal.bulk_update_progress([self])
     
     def calculate_progress_for_period(self, start_date, end_date):
         """Calcula o progresso da meta para um período específico"""
-        if self.category:
-            from django.db.models import Sum
-            
-            if self.goal_type in ['savings', 'income_increase']:
-                # Para metas de poupança e aumento de receita, somar receitas da categoria
-                total = self.category.transactions.filter(
-                    transaction_type='income',
-                    status='completed',
-                    transaction_date__range=[start_date, end_date],
-                    company=self.company
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            elif self.goal_type == 'expense_reduction':
-                # Para metas de redução de gastos, somar despesas da categoria
-                total = self.category.transactions.filter(
-                    transaction_type='expense',
-                    status='completed',
-                    transaction_date__range=[start_date, end_date],
-                    company=self.company
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-            else:
-                # Para outras metas (custom, debt_payment), somar todas as transações da categoria
-                income = self.category.transactions.filter(
-                    transaction_type='income',
-                    status='completed',
-                    transaction_date__range=[start_date, end_date],
-                    company=self.company
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-                
-                expenses = self.category.transactions.filter(
-                    transaction_type='expense',
-                    status='completed',
-                    transaction_date__range=[start_date, end_date],
-                    company=self.company
-                ).aggregate(total=Sum('amount'))['total'] or Decimal('0')
-                
-                total = income + expenses
-            
-            return total
-        return Decimal('0')
+        return Goal.progress_totals([(self, start_date, end_date)])[0]
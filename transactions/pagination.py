@@ -0,0 +1,128 @@
+"""
+Paginação por cursor (keyset) para listas de transações
+
+Em vez de OFFSET, cada página começa logo após a última linha da página
+anterior na ordem (transaction_date, created_at, id) decrescente. A consulta
+usa o índice (company, transaction_date, created_at, id) e custa o mesmo na
+primeira ou na milésima página. A contagem total é opcional e limitada.
+"""
+import base64
+from datetime import date, datetime
+from django.db.models import Q
+
+
+ORDERING = ('-transaction_date', '-created_at', '-id')
+
+
+def encode_cursor(transaction):
+    """Codifica a posição de uma transação em um cursor opaco para a URL"""
+    raw = f'{transaction.transaction_date.isoformat()}|{transaction.created_at.isoformat()}|{transaction.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodifica um cursor gerado por encode_cursor
+
+    Returns:
+        tupla (transaction_date, created_at, id) ou None se o cursor for inválido
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw_date, raw_created, raw_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return date.fromisoformat(raw_date), datetime.fromisoformat(raw_created), int(raw_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _after(position):
+    """Linhas posteriores à posição na ordem decrescente"""
+    transaction_date, created_at, pk = position
+    return (
+        Q(transaction_date__lt=transaction_date) |
+        Q(transaction_date=transaction_date, created_at__lt=created_at) |
+        Q(transaction_date=transaction_date, created_at=created_at, id__lt=pk)
+    )
+
+
+def _before(position):
+    """Linhas anteriores à posição na ordem decrescente"""
+    transaction_date, created_at, pk = position
+    return (
+        Q(transaction_date__gt=transaction_date) |
+        Q(transaction_date=transaction_date, created_at__gt=created_at) |
+        Q(transaction_date=transaction_date, created_at=created_at, id__gt=pk)
+    )
+
+
+class KeysetPage:
+    """
+    Página de transações obtida por cursor
+
+    Exemplo:
+        page = KeysetPage(transactions, after=request.GET.get('after'))
+        for transaction in page: ...
+        page.next_cursor  # usar em ?after=
+    """
+
+    def __init__(self, queryset, after=None, before=None, per_page=20, count_limit=None):
+        """
+        Args:
+            queryset: transações já filtradas (sem ordenação)
+            after: cursor da última linha da página anterior (avançar)
+            before: cursor da primeira linha da página seguinte (voltar)
+            per_page: linhas por página
+            count_limit: se informado, conta até esse limite de linhas
+        """
+        self.per_page = per_page
+        after_position = decode_cursor(after)
+        before_position = decode_cursor(before)
+
+        if before_position and not after_position:
+            # Voltando: lê na ordem inversa a partir do cursor e desinverte
+            rows = list(
+                queryset.filter(_before(before_position))
+                .order_by(*(field.lstrip('-') for field in ORDERING))[:per_page + 1]
+            )
+            self.has_previous = len(rows) > per_page
+            self.object_list = rows[:per_page][::-1]
+            self.has_next = True
+        else:
+            page_queryset = queryset
+            if after_position:
+                page_queryset = page_queryset.filter(_after(after_position))
+            rows = list(page_queryset.order_by(*ORDERING)[:per_page + 1])
+            self.has_next = len(rows) > per_page
+            self.object_list = rows[:per_page]
+            self.has_previous = after_position is not None
+
+        self.count = None
+        self.count_is_capped = False
+        if count_limit:
+            # COUNT sobre um LIMIT: custo limitado mesmo em empresas grandes
+            count = queryset.order_by()[:count_limit + 1].count()
+            self.count_is_capped = count > count_limit
+            self.count = min(count, count_limit)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor(self.object_list[0])
+        return None
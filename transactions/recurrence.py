@@ -0,0 +1,266 @@
+"""
+Materialização das transações recorrentes
+
+Cada transação com recorrência (e sem parent_transaction) é uma regra. As
+ocorrências futuras são gravadas como transações pendentes filhas, até um
+horizonte móvel (RECURRENCE_HORIZON_DAYS), para que previsões, alertas e os
+períodos futuros do dashboard leiam linhas reais.
+
+A materialização é idempotente: só cria ocorrências posteriores à última já
+gravada, então rodar de novo não duplica nada e ocorrências excluídas pelo
+usuário não voltam. Quando uma edição muda o agendamento da regra
+(Transaction.SCHEDULE_FIELDS), as ocorrências futuras ainda pendentes são
+descartadas e geradas de novo com os dados atuais; mudar só o status da
+regra mantém as ocorrências (e seus uuids).
+"""
+import calendar
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Max
+from django.utils import timezone
+
+
+# Passo de cada recorrência: (dias, meses)
+STEPS = {
+    'daily': (1, 0),
+    'weekly': (7, 0),
+    'monthly': (0, 1),
+    'quarterly': (0, 3),
+    'yearly': (0, 12),
+}
+
+# Campos copiados da regra para cada ocorrência
+COPIED_FIELDS = (
+    'description', 'amount', 'transaction_type', 'company_id', 'account_id',
+    'category_id', 'created_by_id', 'transfer_to_account_id', 'notes', 'tags',
+)
+
+
+def horizon_days():
+    return getattr(settings, 'RECURRENCE_HORIZON_DAYS', 90)
+
+
+def add_months(value, months):
+    """Soma meses mantendo o dia, limitado ao último dia do mês (31/01 + 1 -> 28/02)"""
+    month_index = value.month - 1 + months
+    year = value.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def rule_date(rule):
+    """
+    Data da regra como date
+
+    O default do campo é timezone.now, então uma regra criada sem data
+    carrega um datetime até ser relida do banco.
+    """
+    value = rule.transaction_date
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def occurrence_date(start, recurrence, index):
+    """
+    Data da index-ésima ocorrência a partir da data da regra
+
+    Calculada sempre a partir da data original, para que dias 29-31 não
+    se desloquem depois de passar por um mês curto.
+    """
+    days, months = STEPS[recurrence]
+    if months:
+        return add_months(start, months * index)
+    return start + timedelta(days=days * index)
+
+
+def occurrence_dates(rule, after, until):
+    """
+    Datas das ocorrências da regra em (after, until]
+
+    Respeita recurrence_end_date quando definido.
+    """
+    if rule.recurrence not in STEPS:
+        return []
+    if rule.recurrence_end_date:
+        until = min(until, rule.recurrence_end_date)
+
+    start = rule_date(rule)
+    days, months = STEPS[rule.recurrence]
+
+    # Pular direto para perto de 'after' em vez de iterar desde o início
+    if after > start:
+        if months:
+            index = max(1, ((after.year - start.year) * 12 + after.month - start.month) // months)
+        else:
+            index = max(1, (after - start).days // days)
+    else:
+        index = 1
+
+    dates = []
+    while True:
+        value = occurrence_date(start, rule.recurrence, index)
+        if value > until:
+            break
+        if value > after:
+            dates.append(value)
+        index += 1
+    return dates
+
+
+def _build(rule, dates):
+    from .models import Transaction
+
+    return [
+        Transaction(
+            parent_transaction_id=rule.pk,
+            transaction_date=value,
+            due_date=value,
+            status='pending',
+            recurrence='none',
+            **{field: getattr(rule, field) for field in COPIED_FIELDS}
+        )
+        for value in dates
+    ]
+
+
+def _index_created(created):
+    """
+    Mantém consolidados, índice de busca e tags das ocorrências criadas
+
+    bulk_create não passa por Transaction.save; os efeitos são aplicados em
+    lote. Ocorrências pendentes não afetam saldos, metas nem orçamentos.
+    """
+    from .models import DailyRollup, Tag, TransactionSearchToken, TransactionTag
+    from . import search
+
+    DailyRollup.apply_many([occurrence._tracked_state() for occurrence in created])
+
+    tokens = []
+    links = []
+    tags = {}
+    for occurrence in created:
+        tokens.extend(TransactionSearchToken._build(occurrence))
+        names = search.parse_tags(occurrence.tags)
+        if names:
+            missing = {normalized: name for normalized, name in names.items() if normalized not in tags}
+            tags.update(Tag.for_names(occurrence.company_id, missing))
+            links.extend(
+                TransactionTag(transaction_id=occurrence.pk, tag_id=tags[normalized].pk)
+                for normalized in names
+            )
+    TransactionSearchToken.objects.bulk_create(tokens, batch_size=1000)
+    TransactionTag.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+
+
+def _data_changed(company_ids):
+    from core.caching import bump_data_version
+
+    for company_id in company_ids:
+        bump_data_version(company_id)
+
+
+def materialize(rules, until=None):
+    """
+    Cria em lote as ocorrências que faltam até o horizonte
+
+    Args:
+        rules: transações-regra (recorrência definida e sem parent_transaction)
+        until: data limite (padrão: hoje + RECURRENCE_HORIZON_DAYS)
+
+    Returns:
+        número de ocorrências criadas
+    """
+    from .models import Transaction
+
+    if until is None:
+        until = timezone.now().date() + timedelta(days=horizon_days())
+
+    rules = [rule for rule in rules if rule.recurrence in STEPS and rule.pk]
+    if not rules:
+        return 0
+
+    # Última ocorrência já gravada de cada regra, em uma consulta
+    last_dates = dict(
+        Transaction.objects.filter(
+            parent_transaction_id__in=[rule.pk for rule in rules]
+        ).values('parent_transaction_id').annotate(
+            last=Max('transaction_date')
+        ).order_by().values_list('parent_transaction_id', 'last')
+    )
+
+    pending = []
+    for rule in rules:
+        start = rule_date(rule)
+        after = max(start, last_dates.get(rule.pk) or start)
+        pending.extend(_build(rule, occurrence_dates(rule, after, until)))
+
+    return _create(pending)
+
+
+def _create(pending):
+    """Grava em lote as ocorrências e aplica os efeitos; retorna quantas foram criadas"""
+    from .models import Transaction
+
+    if not pending:
+        return 0
+
+    with db_transaction.atomic():
+        created = Transaction.objects.bulk_create(pending, batch_size=1000)
+        _index_created(created)
+        _data_changed({occurrence.company_id for occurrence in created})
+
+    return len(created)
+
+
+def reschedule(rule):
+    """
+    Refaz as ocorrências futuras pendentes de uma regra editada
+
+    Ocorrências passadas ou já concluídas/canceladas são preservadas. As
+    datas de hoje até o horizonte são recalculadas a partir da data da
+    regra, pulando só as que já têm ocorrência; uma ocorrência futura
+    concluída antes do prazo não faz pular as pendentes anteriores a ela.
+    """
+    from .models import Transaction
+
+    today = timezone.now().date()
+    until = today + timedelta(days=horizon_days())
+    with db_transaction.atomic():
+        future = Transaction.objects.filter(
+            parent_transaction_id=rule.pk,
+            status='pending',
+            transaction_date__gte=today
+        )
+        # Exclusão via queryset dispara post_delete por linha (consolidados)
+        future.delete()
+        if rule.recurrence not in STEPS:
+            return 0
+
+        existing = set(
+            Transaction.objects.filter(
+                parent_transaction_id=rule.pk,
+                transaction_date__gte=today
+            ).values_list('transaction_date', flat=True)
+        )
+        after = max(rule_date(rule), today - timedelta(days=1))
+        dates = [value for value in occurrence_dates(rule, after, until) if value not in existing]
+        return _create(_build(rule, dates))
+
+
+def rules_queryset(company=None):
+    """Regras de recorrência ativas (sem fim ou com fim ainda não atingido)"""
+    from django.db.models import Q
+    from .models import Transaction
+
+    rules = Transaction.objects.filter(
+        parent_transaction__isnull=True
+    ).exclude(recurrence='none').filter(
+        Q(recurrence_end_date__isnull=True) |
+        Q(recurrence_end_date__gte=timezone.now().date())
+    )
+    if company is not None:
+        rules = rules.filter(company=company)
+    return rules
@@ -0,0 +1,111 @@
+"""
+Busca de transações por índice de termos normalizados
+
+Descrição, observações e tags de cada transação são quebradas em termos
+minúsculos e sem acentos, gravados em TransactionSearchToken. A busca
+consulta esse índice (company, token) por prefixo, em vez de varrer
+a tabela com icontains, e funciona igual em SQLite e PostgreSQL. O filtro
+por tag usa as tags normalizadas (Tag/TransactionTag).
+"""
+import re
+import unicodedata
+
+
+TOKEN_MAX_LENGTH = 100
+
+# Palavras muito comuns que não ajudam a filtrar
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'e', 'de', 'da', 'do', 'das', 'dos', 'em', 'no',
+    'na', 'nos', 'nas', 'um', 'uma', 'para', 'por', 'com', 'ao', 'aos',
+}
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def normalize(text):
+    """Minúsculas e sem acentos ('Padaria São João' -> 'padaria sao joao')"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def word_tokens(text):
+    """Termos de busca de um texto livre, sem stopwords e sem repetição"""
+    return {
+        word[:TOKEN_MAX_LENGTH]
+        for word in _WORD_RE.findall(normalize(text))
+        if word not in STOPWORDS
+    }
+
+
+def parse_tags(tags, max_length=TOKEN_MAX_LENGTH):
+    """
+    Tags normalizadas a partir do texto separado por vírgulas
+
+    Returns:
+        dict nome normalizado -> nome exibido
+        ('Cartão de Crédito' -> {'cartao de credito': 'Cartão de Crédito'})
+    """
+    result = {}
+    for tag in (tags or '').split(','):
+        name = ' '.join(tag.split())[:max_length]
+        normalized = ' '.join(normalize(name).split())
+        if normalized and normalized not in result:
+            result[normalized] = name
+    return result
+
+
+def transaction_tokens(transaction):
+    """
+    Termos indexados de uma transação (inclui as palavras das tags)
+
+    Returns:
+        lista de termos, em ordem
+    """
+    words = (
+        word_tokens(transaction.description) |
+        word_tokens(transaction.notes) |
+        word_tokens((transaction.tags or '').replace(',', ' '))
+    )
+    return sorted(words)
+
+
+def search_transactions(queryset, company, query='', tags=None):
+    """
+    Filtra transações pelo índice de busca
+
+    Cada termo da consulta casa por prefixo com algum termo da transação
+    ('merc' encontra 'Mercado'); todos os termos e todas as tags precisam
+    casar. Uma consulta sem nenhum termo indexável (só stopwords ou
+    pontuação, como 'de') filtra pelo texto digitado na descrição e nas
+    observações, em vez de devolver todas as transações.
+
+    Args:
+        queryset: transações da empresa
+        company: Empresa (restringe o índice consultado)
+        query: texto livre digitado pelo usuário
+        tags: lista de tags exigidas
+    """
+    from django.db.models import Q
+    from .models import TransactionSearchToken, TransactionTag
+
+    tokens = TransactionSearchToken.objects.filter(company=company)
+    terms = word_tokens(query)
+
+    if not terms and query and query.strip():
+        text = query.strip()
+        queryset = queryset.filter(Q(description__icontains=text) | Q(notes__icontains=text))
+
+    for term in terms:
+        # Faixa [termo, termo + U+FFFF) usa o índice B-tree em qualquer collation
+        queryset = queryset.filter(pk__in=tokens.filter(
+            token__gte=term,
+            token__lt=term + '\uffff'
+        ).values('transaction_id'))
+
+    for tag in parse_tags(','.join(tags or [])):
+        queryset = queryset.filter(pk__in=TransactionTag.objects.filter(
+            tag__company=company,
+            tag__normalized=tag
+        ).values('transaction_id'))
+
+    return queryset
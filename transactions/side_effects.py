@@ -0,0 +1,133 @@
+"""
+Pipeline de efeitos colaterais das escritas de transações
+
+As escritas apenas marcam metas, orçamentos e declarações anuais gravadas
+(DASN-SIMEI) como pendentes; cada item marcado é recalculado (ou, no caso
+das declarações, descartado) uma única vez quando a transação do banco é
+confirmada (core.commit_queue). Dentro de um bloco atômico ou de batch(),
+várias escritas compartilham o mesmo recálculo.
+
+Os saldos das contas não passam por aqui: eles já são atualizados por
+deltas dentro da própria escrita (Transaction.save/delete).
+"""
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models import Q
+
+from core.commit_queue import CommitQueue
+
+
+def mark_goals(company_id, category_id):
+    """Marca as metas da categoria para recálculo de progresso"""
+    if company_id and category_id:
+        _queue.add(('goals', (company_id, category_id)))
+
+
+def mark_budgets(company_id, date):
+    """Marca os orçamentos da empresa que cobrem a data para recálculo"""
+    if company_id and date:
+        _queue.add(('budgets', (company_id, date)))
+
+
+def mark_declarations(company_id, date):
+    """Marca a declaração anual gravada do ano da data para descarte"""
+    if company_id and date:
+        _queue.add(('declarations', (company_id, date.year)))
+
+
+def mark_all_declarations(company_id):
+    """Marca todas as declarações anuais gravadas da empresa para descarte"""
+    if company_id:
+        _queue.add(('declarations', (company_id, None)))
+
+
+def transaction_changed(previous, current):
+    """
+    Registra os efeitos de uma escrita de transação
+
+    Args:
+        previous: estado gravado antes da escrita (None se nova)
+        current: estado após a escrita (None se excluída)
+    """
+    for state in (previous, current):
+        if not state:
+            continue
+        # A declaração soma transações de qualquer status
+        mark_declarations(state['company_id'], state['transaction_date'])
+        if state['status'] != 'completed':
+            continue
+        mark_goals(state['company_id'], state['category_id'])
+        if state['transaction_type'] == 'expense':
+            mark_budgets(state['company_id'], state['transaction_date'])
+
+
+def flush(items):
+    """
+    Recalcula cada meta e orçamento pendente e descarta cada declaração
+    gravada pendente uma única vez
+
+    Args:
+        items: set de (tipo, chave), com tipo 'goals', 'budgets' ou 'declarations'
+    """
+    pending = {'goals': set(), 'budgets': set(), 'declarations': set()}
+    for kind, key in items:
+        pending[kind].add(key)
+
+    if pending['goals']:
+        _refresh_goals(pending['goals'])
+    if pending['budgets']:
+        _refresh_budgets(pending['budgets'])
+    if pending['declarations']:
+        _discard_declarations(pending['declarations'])
+
+
+_queue = CommitQueue(flush)
+
+
+def _refresh_goals(keys):
+    from .models import Goal
+
+    condition = Q()
+    for company_id, category_id in keys:
+        condition |= Q(company_id=company_id, category_id=category_id)
+
+    Goal.bulk_update_progress(Goal.objects.filter(condition, is_active=True))
+
+
+def _refresh_budgets(keys):
+    from reports.models import Budget
+
+    # Uma faixa de datas por empresa mantém a consulta pequena em importações
+    ranges = {}
+    for company_id, date in keys:
+        first, last = ranges.get(company_id, (date, date))
+        ranges[company_id] = (min(first, date), max(last, date))
+
+    condition = Q()
+    for company_id, (first, last) in ranges.items():
+        condition |= Q(company_id=company_id, start_date__lte=last, end_date__gte=first)
+
+    for budget in Budget.objects.filter(condition, is_active=True):
+        budget.update_spent_amount()
+
+
+def _discard_declarations(keys):
+    from reports.dasn_simei import discard_snapshots
+
+    # Só anos encerrados têm declaração gravada; o ano corrente usa o cache
+    discard_snapshots(keys)
+
+
+@contextmanager
+def batch():
+    """
+    Agrupa várias escritas em um bloco atômico com recálculo único
+
+    Exemplo:
+        with side_effects.batch():
+            for transaction in transactions:
+                transaction.save()
+    """
+    with transaction.atomic():
+        yield
+
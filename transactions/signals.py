@@ -1,49 +1,22 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Transaction, Account, Goal
-
-
-@receiver(post_save, sender=Transaction)
-def update_account_balance_on_transaction_save(sender, instance, created, **kwargs):
-    """Atualiza o saldo da conta quando uma transação é salva"""
-    if instance.status == 'completed':
-        # Atualizar conta de origem (se existir)
-        if hasattr(instance, 'account') and instance.account:
-            instance.account.update_balance()
-        
-        # Para transferências, atualizar também a conta de destino
-        if instance.transaction_type == 'transfer' and instance.transfer_to_account:
-            instance.transfer_to_account.update_balance()
-        
-        # Atualizar progresso das metas relacionadas à categoria desta transação
-        if instance.category:
-            related_goals = Goal.objects.filter(
-                company=instance.company,
-                category=instance.category,
-                is_active=True
-            )
-            for goal in related_goals:
-                goal.update_progress()
+from .models import Transaction, Category, DailyRollup
+from . import side_effects
 
 
 @receiver(post_delete, sender=Transaction)
 def update_account_balance_on_transaction_delete(sender, instance, **kwargs):
-    """Atualiza o saldo da conta quando uma transação é excluída"""
-    if instance.status == 'completed':
-        # Atualizar conta de origem (se existir)
-        if hasattr(instance, 'account') and instance.account:
-            instance.account.update_balance()
-        
-        # Para transferências, atualizar também a conta de destino
-        if instance.transaction_type == 'transfer' and instance.transfer_to_account:
-            instance.transfer_to_account.update_balance()
-        
-        # Atualizar progresso das metas relacionadas à categoria desta transação
-        if instance.category:
-            related_goals = Goal.objects.filter(
-                company=instance.company,
-                category=instance.category,
-                is_active=True
-            )
-            for goal in related_goals:
-                goal.update_progress()
\ No newline at end of file
+    """Estorna o efeito da transação excluída nos saldos e consolidados e agenda o recálculo das metas"""
+    # Vale também para exclusões em cascata (conta ou transação pai removidas)
+    state = instance._tracked_state()
+    instance._apply_balance_change(state, None)
+    DailyRollup.apply_change(state, None)
+    side_effects.transaction_changed(state, None)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def discard_declarations_on_category_change(sender, instance, created=False, **kwargs):
+    """Nomes de categoria entram nas declarações gravadas (receitas e despesas dedutíveis)"""
+    if not created:
+        side_effects.mark_all_declarations(instance.company_id)
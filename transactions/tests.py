@@ -1,3 +1,396 @@
+"""
+Testes das transações: saldos, consolidados, recorrências, busca e paginação
+"""
+import base64
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from accounts.models import Company
+from .models import Account, Category, DailyRollup, Transaction
+from . import recurrence as recurrences
+from .pagination import KeysetPage, decode_cursor, encode_cursor
+from .search import search_transactions
+
+User = get_user_model()
+
+
+class TransactionTestCase(TestCase):
+    """Empresa com duas contas e uma categoria de despesa"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='financeiro', email='financeiro@example.com', password='senha-teste'
+        )
+        self.company = Company.objects.create(name='Empresa Teste', owner=self.user)
+        self.account = Account.objects.create(
+            name='Conta Corrente', account_type='checking', company=self.company,
+            initial_balance=Decimal('1000.00')
+        )
+        self.savings = Account.objects.create(
+            name='Poupança', account_type='savings', company=self.company
+        )
+        self.category = Category.objects.create(
+            name='Aluguel', category_type='expense', company=self.company
+        )
+
+    def _transaction(self, **fields):
+        values = {
+            'description': 'Lançamento',
+            'amount': Decimal('100.00'),
+            'transaction_type': 'expense',
+            'status': 'completed',
+            'company': self.company,
+            'account': self.account,
+            'category': self.category,
+            'created_by': self.user,
+        }
+        values.update(fields)
+        return Transaction.objects.create(**values)
+
+
+class BalanceTests(TransactionTestCase):
+    """Os deltas aplicados a cada escrita devem bater com o recálculo completo"""
+
+    def _assert_balances(self, account, savings):
+        self.account.refresh_from_db()
+        self.savings.refresh_from_db()
+        self.assertEqual(self.account.current_balance, Decimal(account))
+        self.assertEqual(self.savings.current_balance, Decimal(savings))
+        self.assertEqual(
+            Account.reconcile_balances(Account.objects.filter(company=self.company), dry_run=True), []
+        )
+
+    def test_create(self):
+        self._transaction(amount=Decimal('100.00'))
+        self._transaction(amount=Decimal('250.00'), transaction_type='income', category=None)
+        self._transaction(amount=Decimal('40.00'), status='pending')
+
+        self._assert_balances('1150.00', '0')
+
+    def test_edit_amount(self):
+        transaction = self._transaction(amount=Decimal('100.00'))
+
+        transaction.amount = Decimal('80.00')
+        transaction.save()
+
+        self._assert_balances('920.00', '0')
+
+    def test_status_change(self):
+        transaction = self._transaction(status='pending')
+        self._assert_balances('1000.00', '0')
+
+        transaction.status = 'completed'
+        transaction.save()
+        self._assert_balances('900.00', '0')
+
+        transaction.status = 'cancelled'
+        transaction.save()
+        self._assert_balances('1000.00', '0')
+
+    def test_account_move(self):
+        transaction = self._transaction(amount=Decimal('100.00'))
+
+        transaction.account = self.savings
+        transaction.save()
+
+        self._assert_balances('1000.00', '-100.00')
+
+    def test_transfer(self):
+        transfer = self._transaction(
+            amount=Decimal('300.00'), transaction_type='transfer', category=None,
+            transfer_to_account=self.savings
+        )
+        self._assert_balances('700.00', '300.00')
+
+        transfer.amount = Decimal('200.00')
+        transfer.save()
+        self._assert_balances('800.00', '200.00')
+
+        # Inverter a direção da transferência
+        transfer.account, transfer.transfer_to_account = self.savings, self.account
+        transfer.save()
+        self._assert_balances('1200.00', '-200.00')
+
+    def test_delete(self):
+        transaction = self._transaction(amount=Decimal('100.00'))
+        transfer = self._transaction(
+            amount=Decimal('300.00'), transaction_type='transfer', category=None,
+            transfer_to_account=self.savings
+        )
+
+        transaction.delete()
+        self._assert_balances('700.00', '300.00')
+
+        transfer.delete()
+        self._assert_balances('1000.00', '0')
+
+    def test_delete_uses_stored_state(self):
+        transaction = self._transaction(amount=Decimal('100.00'))
+
+        # Valor alterado em memória e não gravado não deve afetar o estorno
+        transaction.amount = Decimal('999.00')
+        transaction.delete()
+
+        self._assert_balances('1000.00', '0')
+
+    def test_cascade_delete_of_parent(self):
+        rule = self._transaction(amount=Decimal('100.00'))
+        self._transaction(amount=Decimal('100.00'), parent_transaction=rule)
+        self._assert_balances('800.00', '0')
+
+        rule.delete()
+
+        self.assertFalse(Transaction.objects.filter(company=self.company).exists())
+        self._assert_balances('1000.00', '0')
+
+    def test_cascade_delete_of_account(self):
+        self._transaction(
+            amount=Decimal('300.00'), transaction_type='transfer', category=None,
+            transfer_to_account=self.savings
+        )
+        self._transaction(amount=Decimal('100.00'))
+        self._assert_balances('600.00', '300.00')
+
+        self.account.delete()
+
+        self.savings.refresh_from_db()
+        self.assertEqual(self.savings.current_balance, Decimal('0'))
+        self.assertEqual(
+            Account.reconcile_balances(Account.objects.filter(company=self.company), dry_run=True), []
+        )
+
+
+class DailyRollupTests(TransactionTestCase):
+    """Os consolidados mantidos por deltas devem bater com DailyRollup.rebuild"""
+
+    def _rollups(self):
+        return sorted(
+            DailyRollup.objects.filter(company=self.company).values_list(
+                *DailyRollup.KEY_FIELDS, 'total_amount', 'transaction_count'
+            ),
+            key=repr
+        )
+
+    def _assert_matches_rebuild(self):
+        maintained = self._rollups()
+        DailyRollup.rebuild(self.company)
+        self.assertEqual(maintained, self._rollups())
+
+    def test_create(self):
+        today = timezone.localdate()
+        self._transaction(transaction_date=today)
+        self._transaction(transaction_date=today, amount=Decimal('50.00'))
+        self._transaction(transaction_date=today - timedelta(days=1), status='pending')
+
+        self.assertEqual(DailyRollup.objects.filter(company=self.company).count(), 2)
+        self._assert_matches_rebuild()
+
+    def test_edits(self):
+        today = timezone.localdate()
+        other_category = Category.objects.create(
+            name='Energia', category_type='expense', company=self.company
+        )
+        transaction = self._transaction(transaction_date=today)
+        self._transaction(transaction_date=today)
+
+        transaction.amount = Decimal('75.00')
+        transaction.save()
+        self._assert_matches_rebuild()
+
+        transaction.transaction_date = today - timedelta(days=3)
+        transaction.category = other_category
+        transaction.save()
+        self._assert_matches_rebuild()
+
+        transaction.account = self.savings
+        transaction.transaction_type = 'income'
+        transaction.save()
+        self._assert_matches_rebuild()
+
+    def test_status_flips(self):
+        transaction = self._transaction(transaction_date=timezone.localdate(), status='pending')
+
+        for status in ('completed', 'cancelled', 'pending'):
+            transaction.status = status
+            transaction.save()
+            self._assert_matches_rebuild()
+
+    def test_deletes(self):
+        today = timezone.localdate()
+        transaction = self._transaction(transaction_date=today)
+        self._transaction(transaction_date=today)
+        rule = self._transaction(
+            description='Aluguel', status='pending', recurrence='monthly', transaction_date=today
+        )
+        self.assertTrue(rule.recurring_transactions.exists())
+        self._assert_matches_rebuild()
+
+        transaction.delete()
+        self._assert_matches_rebuild()
+
+        # Exclusão em cascata das ocorrências da regra
+        rule.delete()
+        self._assert_matches_rebuild()
+
+        self.account.delete()
+        self.assertFalse(DailyRollup.objects.filter(company=self.company).exists())
+
+
+class RecurrenceTests(TransactionTestCase):
+
+    def test_rule_created_without_date_materializes_occurrences(self):
+        # Sem transaction_date, o default (timezone.now) deixa um datetime na regra
+        rule = self._transaction(description='Aluguel', status='pending', recurrence='monthly')
+
+        today = timezone.localdate()
+        until = today + timedelta(days=recurrences.horizon_days())
+        expected = recurrences.occurrence_dates(rule, today, until)
+        dates = list(rule.recurring_transactions.order_by('transaction_date').values_list(
+            'transaction_date', flat=True
+        ))
+        self.assertTrue(expected)
+        self.assertEqual(dates, expected)
+
+    def test_status_only_edit_keeps_occurrences(self):
+        rule = self._transaction(
+            description='Aluguel', status='pending', recurrence='monthly',
+            transaction_date=timezone.localdate()
+        )
+        before = set(rule.recurring_transactions.values_list('uuid', flat=True))
+        self.assertTrue(before)
+
+        rule.status = 'completed'
+        rule.save()
+
+        self.assertEqual(set(rule.recurring_transactions.values_list('uuid', flat=True)), before)
+
+    def test_schedule_edit_regenerates_pending_occurrences(self):
+        rule = self._transaction(
+            description='Aluguel', status='pending', recurrence='monthly',
+            transaction_date=timezone.localdate()
+        )
+
+        rule.amount = Decimal('150.00')
+        rule.save()
+
+        amounts = set(rule.recurring_transactions.values_list('amount', flat=True))
+        self.assertEqual(amounts, {Decimal('150.00')})
+
+
+class SearchTests(TransactionTestCase):
+
+    def _search(self, query):
+        queryset = Transaction.objects.filter(company=self.company)
+        return set(search_transactions(queryset, self.company, query).values_list('description', flat=True))
+
+    def test_terms_match_by_prefix(self):
+        self._transaction(description='Padaria São João')
+        self._transaction(description='Mercado Central')
+
+        self.assertEqual(self._search('joa'), {'Padaria São João'})
+        self.assertEqual(self._search('MERC central'), {'Mercado Central'})
+
+    def test_stopword_only_query_falls_back_to_text(self):
+        self._transaction(description='Conta de luz')
+        self._transaction(description='Aluguel')
+
+        self.assertEqual(self._search('de'), {'Conta de luz'})
+
+    def test_status_edit_keeps_index(self):
+        transaction = self._transaction(description='Mercado Central', status='pending', tags='Casa')
+        token_ids = set(transaction.search_tokens.values_list('pk', flat=True))
+        tag_ids = set(transaction.transaction_tags.values_list('pk', flat=True))
+
+        transaction.status = 'completed'
+        transaction.save()
+
+        self.assertEqual(set(transaction.search_tokens.values_list('pk', flat=True)), token_ids)
+        self.assertEqual(set(transaction.transaction_tags.values_list('pk', flat=True)), tag_ids)
+
+    def test_description_edit_reindexes(self):
+        transaction = self._transaction(description='Mercado Central')
+
+        transaction.description = 'Padaria'
+        transaction.save()
+
+        self.assertEqual(self._search('merc'), set())
+        self.assertEqual(self._search('pada'), {'Padaria'})
+
+
+class KeysetPageTests(TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        today = timezone.localdate()
+        for index in range(5):
+            self._transaction(description=f'Mesmo instante {index}', transaction_date=today)
+        self._transaction(description='Ontem', transaction_date=today - timedelta(days=1))
+        # Empate em transaction_date e created_at: só o id desempata
+        Transaction.objects.filter(transaction_date=today).update(created_at=timezone.now())
+
+        self.queryset = Transaction.objects.filter(company=self.company)
+        self.expected = list(self.queryset.order_by('-transaction_date', '-created_at', '-id'))
+
+    def test_after_cursor_walks_ties_without_gaps(self):
+        seen = []
+        page = KeysetPage(self.queryset, per_page=2)
+        self.assertFalse(page.has_previous)
+        pages = [page]
+        while page.next_cursor:
+            page = KeysetPage(self.queryset, after=page.next_cursor, per_page=2)
+            pages.append(page)
+        for page in pages:
+            seen.extend(page)
+
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+        self.assertFalse(pages[-1].has_next)
+        self.assertTrue(pages[-1].has_previous)
+
+    def test_before_cursor_returns_previous_page(self):
+        first = KeysetPage(self.queryset, per_page=2)
+        second = KeysetPage(self.queryset, after=first.next_cursor, per_page=2)
+        third = KeysetPage(self.queryset, after=second.next_cursor, per_page=2)
+
+        back = KeysetPage(self.queryset, before=third.previous_cursor, per_page=2)
+        self.assertEqual(list(back), list(second))
+        self.assertTrue(back.has_previous)
+        self.assertTrue(back.has_next)
+
+        back = KeysetPage(self.queryset, before=back.previous_cursor, per_page=2)
+        self.assertEqual(list(back), self.expected[:2])
+        self.assertFalse(back.has_previous)
+        self.assertIsNone(back.previous_cursor)
+
+    def test_cursor_round_trip(self):
+        transaction = self.expected[2]
+
+        self.assertEqual(
+            decode_cursor(encode_cursor(transaction)),
+            (transaction.transaction_date, transaction.created_at, transaction.pk)
+        )
+
+    def test_malformed_cursors_start_from_first_page(self):
+        def encoded(raw):
+            return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+        cursors = [
+            '!!!',
+            'nao-e-base64',
+            encoded(b'2026-01-01|ontem|1'),
+            encoded(b'2026-01-01|2026-01-01T00:00:00'),
+            encoded(b'2026-01-01|2026-01-01T00:00:00|um'),
+            encoded(b'\xff\xfe'),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+                for page in (
+                    KeysetPage(self.queryset, after=cursor, per_page=2),
+                    KeysetPage(self.queryset, before=cursor, per_page=2),
+                ):
+                    self.assertEqual(list(page), self.expected[:2])
+                    self.assertFalse(page.has_previous)
@@ -1,30 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 from .models import Transaction, Category, Account, Goal
 from .forms import TransactionForm, CategoryForm, AccountForm, GoalForm
+from . import side_effects
+from .pagination import KeysetPage
+from .search import search_transactions
 
 
 @login_required
 def transaction_list_view(request):
     """Lista de transações"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
-    transactions = Transaction.objects.filter(company=current_company)
+    transactions = Transaction.objects.filter(
+        company=current_company
+    ).select_related('account', 'category')
     
     # Filtros
+    # Busca pelo índice de termos (sem acentos, por prefixo) e por tags
     search = request.GET.get('search')
-    if search:
-        transactions = transactions.filter(
-            Q(description__icontains=search) |
-            Q(notes__icontains=search)
-        )
+    tags = [tag for tag in request.GET.getlist('tag') if tag]
+    if search or tags:
+        transactions = search_transactions(transactions, current_company, query=search, tags=tags)
     
     transaction_type = request.GET.get('type')
     if transaction_type:
@@ -34,17 +36,27 @@ def transaction_list_view(request):
     if category_id:
         transactions = transactions.filter(category_id=category_id)
     
-    # Paginação
-    paginator = Paginator(transactions.order_by('-transaction_date', '-created_at'), 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginação por cursor (sem OFFSET); total contado até 1000 linhas
+    page_obj = KeysetPage(
+        transactions,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        per_page=20,
+        count_limit=1000
+    )
+    
+    # Filtros sem os cursores, para montar os links de navegação
+    current_filters = request.GET.copy()
+    current_filters.pop('after', None)
+    current_filters.pop('before', None)
+    current_filters.pop('page', None)
     
     categories = Category.objects.filter(company=current_company, is_active=True)
     
     context = {
         'page_obj': page_obj,
         'categories': categories,
-        'current_filters': request.GET,
+        'current_filters': current_filters,
     }
     return render(request, 'transactions/list.html', context)
 
@@ -52,7 +64,7 @@ def transaction_list_view(request):
 @login_required
 def transaction_create_view(request):
     """Criar nova transação"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -76,7 +88,7 @@ def transaction_detail_view(request, uuid):
     """Detalhes da transação"""
     from datetime import date
     
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     transaction = get_object_or_404(Transaction, uuid=uuid, company=current_company)
     
     return render(request, 'transactions/detail.html', {
@@ -88,7 +100,7 @@ def transaction_detail_view(request, uuid):
 @login_required
 def transaction_update_view(request, uuid):
     """Editar transação"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     transaction = get_object_or_404(Transaction, uuid=uuid, company=current_company)
     
     if request.method == 'POST':
@@ -106,7 +118,7 @@ def transaction_update_view(request, uuid):
 @login_required
 def transaction_delete_view(request, uuid):
     """Excluir transação"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     transaction = get_object_or_404(Transaction, uuid=uuid, company=current_company)
     
     if request.method == 'POST':
@@ -120,7 +132,7 @@ def transaction_delete_view(request, uuid):
 @login_required
 def transaction_update_status_view(request, uuid):
     """Atualizar status da transação"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     transaction = get_object_or_404(Transaction, uuid=uuid, company=current_company)
     
     if request.method == 'POST':
@@ -150,7 +162,7 @@ def transaction_update_status_view(request, uuid):
 @require_POST
 def transaction_bulk_update_status_view(request):
     """Atualizar status de múltiplas transações de uma vez"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return JsonResponse({'success': False, 'error': 'Empresa não encontrada'}, status=400)
     
@@ -165,11 +177,14 @@ def transaction_bulk_update_status_view(request):
         messages.error(request, 'Status inválido!')
         return redirect('transactions:list')
     
-    # Atualiza todas as transações selecionadas
-    updated_count = Transaction.objects.filter(
-        uuid__in=transaction_ids,
-        company=current_company
-    ).update(status=new_status)
+    # Atualiza cada transação pelo save() para que os saldos recebam o delta;
+    # metas e orçamentos afetados são recalculados uma única vez no commit
+    updated_count = 0
+    with side_effects.batch():
+        for transaction in Transaction.objects.filter(uuid__in=transaction_ids, company=current_company):
+            transaction.status = new_status
+            transaction.save()
+            updated_count += 1
     
     status_labels = {
         'pending': 'Pendente',
@@ -189,7 +204,7 @@ def transaction_bulk_update_status_view(request):
 @login_required
 def category_list_view(request):
     """Lista de categorias"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -200,7 +215,7 @@ def category_list_view(request):
 @login_required
 def category_create_view(request):
     """Criar categoria"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -221,7 +236,7 @@ def category_create_view(request):
 @login_required
 def category_update_view(request, pk):
     """Editar categoria"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     category = get_object_or_404(Category, pk=pk, company=current_company)
     
     if request.method == 'POST':
@@ -239,7 +254,7 @@ def category_update_view(request, pk):
 @login_required
 def category_delete_view(request, pk):
     """Excluir categoria"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     category = get_object_or_404(Category, pk=pk, company=current_company)
     
     if request.method == 'POST':
@@ -254,7 +269,7 @@ def category_delete_view(request, pk):
 @login_required
 def account_list_view(request):
     """Lista de contas"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -265,7 +280,7 @@ def account_list_view(request):
 @login_required
 def account_create_view(request):
     """Criar conta"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -287,7 +302,7 @@ def account_create_view(request):
 @login_required
 def account_update_view(request, pk):
     """Editar conta"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     account = get_object_or_404(Account, pk=pk, company=current_company)
     
     if request.method == 'POST':
@@ -305,7 +320,7 @@ def account_update_view(request, pk):
 @login_required
 def account_delete_view(request, pk):
     """Excluir conta"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     account = get_object_or_404(Account, pk=pk, company=current_company)
     
     if request.method == 'POST':
@@ -320,7 +335,7 @@ def account_delete_view(request, pk):
 @login_required
 def goal_list_view(request):
     """Lista de metas"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -331,7 +346,7 @@ def goal_list_view(request):
 @login_required
 def goal_create_view(request):
     """Criar meta"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     if not current_company:
         return redirect('accounts:company_setup')
     
@@ -353,7 +368,7 @@ def goal_create_view(request):
 @login_required
 def goal_update_view(request, pk):
     """Editar meta"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     goal = get_object_or_404(Goal, pk=pk, company=current_company)
     
     if request.method == 'POST':
@@ -371,7 +386,7 @@ def goal_update_view(request, pk):
 @login_required
 def goal_delete_view(request, pk):
     """Excluir meta"""
-    current_company = request.user.companies.first()
+    current_company = request.current_company
     goal = get_object_or_404(Goal, pk=pk, company=current_company)
     
     if request.method == 'POST':